@@ -0,0 +1,176 @@
+# Benchmarks the feed -> order-book -> callback hot path, driven by a synthetic feed with no network connection.
+#
+# Results are written as json so runs can be compared across versions.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py [--output results.json] [--label v0.0.1] [--quick]
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+# So the benchmarks run from a checkout, without installing zcoins.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zcoins.exchanges import CoinbaseExchange, TickerTimeFormat
+from zcoins.feeds import LocalWebsocket
+from zcoins.order_books import CoinbaseMultiProductOrderBook
+
+from synthetic_feed import SyntheticFeed, make_products, make_public_client
+
+BACKENDS = {'zcoinbase': False, 'array': True}
+
+
+def _make_exchange(products, array_backed):
+  websocket = LocalWebsocket()
+  exchange = CoinbaseExchange(product_ids=[product['id'] for product in products], websocket=websocket,
+                              client=make_public_client(products), array_backed_order_books=array_backed)
+  return exchange, websocket
+
+
+def _percentiles(samples):
+  samples = sorted(samples)
+  return {'p50_us': samples[len(samples) // 2] * 1e6,
+          'p90_us': samples[int(len(samples) * 0.9)] * 1e6,
+          'p99_us': samples[int(len(samples) * 0.99)] * 1e6,
+          'max_us': samples[-1] * 1e6,
+          'mean_us': statistics.fmean(samples) * 1e6}
+
+
+def bench_ticker_throughput(n_products, n_ticks, callback_counts, time_format):
+  """Ticks/sec through CoinbaseExchange._call_ticker_callbacks, with each callback matching a single product."""
+  products = make_products(n_products)
+  results = []
+  for n_callbacks in callback_counts:
+    exchange, websocket = _make_exchange(products, array_backed=True)
+    for idx in range(n_callbacks):
+      product = exchange.get_product(products[idx % n_products]['id'])
+      exchange.add_ticker_callback(lambda e, m: None, product_matcher=product, time_format=time_format)
+    ticks = SyntheticFeed([product['id'] for product in products], seed=1).tickers(n_ticks)
+    start = time.perf_counter()
+    for tick in ticks:
+      exchange._call_ticker_callbacks(tick)
+    elapsed = time.perf_counter() - start
+    results.append({'callbacks': n_callbacks, 'time_format': time_format.value, 'ticks': n_ticks,
+                    'ticks_per_sec': n_ticks / elapsed})
+  return results
+
+
+def bench_get_book_latency(depths, top_ns, queries):
+  """Latency percentiles of get_book(top_n), with books of various depths receiving updates between queries."""
+  results = []
+  products = make_products(4)
+  product_ids = [product['id'] for product in products]
+  for backend, array_backed in BACKENDS.items():
+    for depth in depths:
+      exchange, websocket = _make_exchange(products, array_backed)
+      feed = SyntheticFeed(product_ids, depth=depth, seed=2)
+      for snapshot in feed.snapshots():
+        websocket.publish(snapshot)
+      order_book = exchange.get_order_book(product_ids[0])
+      for top_n in top_ns:
+        samples = []
+        for update in feed.l2updates(queries):
+          websocket.publish(update)
+          start = time.perf_counter()
+          order_book.get_book(top_n)
+          samples.append(time.perf_counter() - start)
+        result = {'backend': backend, 'depth': depth, 'top_n': top_n, 'queries': queries}
+        result.update(_percentiles(samples))
+        results.append(result)
+  return results
+
+
+def bench_update_throughput(depth, n_products, n_updates):
+  """l2updates/sec applied by CoinbaseMultiProductOrderBook."""
+  results = []
+  products = make_products(n_products)
+  product_ids = [product['id'] for product in products]
+  for backend, array_backed in BACKENDS.items():
+    exchange, websocket = _make_exchange(products, array_backed)
+    feed = SyntheticFeed(product_ids, depth=depth, seed=3)
+    for snapshot in feed.snapshots():
+      websocket.publish(snapshot)
+    updates = feed.l2updates(n_updates)
+    start = time.perf_counter()
+    for update in updates:
+      websocket.publish(update)
+    elapsed = time.perf_counter() - start
+    results.append({'backend': backend, 'depth': depth, 'products': n_products, 'updates': n_updates,
+                    'updates_per_sec': n_updates / elapsed})
+  return results
+
+
+def bench_memory_per_product(n_products, depth):
+  """Bytes allocated per tracked product, for books of the given depth."""
+  results = []
+  products = make_products(n_products)
+  product_ids = [product['id'] for product in products]
+  snapshots = SyntheticFeed(product_ids, depth=depth, seed=4).snapshots()
+  for backend, array_backed in BACKENDS.items():
+    gc.collect()
+    tracemalloc.start()
+    exchange, websocket = _make_exchange(products, array_backed)
+    for snapshot in snapshots:
+      websocket.publish(snapshot)
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results.append({'backend': backend, 'products': n_products, 'depth': depth,
+                    'bytes_per_product': allocated / n_products})
+    del exchange, websocket
+  return results
+
+
+def bench_startup(product_counts):
+  """Time to construct a CoinbaseMultiProductOrderBook tracking N products."""
+  results = []
+  for n_products in product_counts:
+    products = make_products(n_products)
+    product_ids = [product['id'] for product in products]
+    for backend, array_backed in BACKENDS.items():
+      exchange, _ = _make_exchange(products[:1], array_backed)
+      exchange.client = make_public_client(products)
+      exchange.clear_cache()
+      start = time.perf_counter()
+      CoinbaseMultiProductOrderBook(exchange, websocket=LocalWebsocket(), product_ids=list(product_ids),
+                                    array_backed=array_backed)
+      elapsed = time.perf_counter() - start
+      results.append({'backend': backend, 'products': n_products, 'startup_ms': elapsed * 1e3})
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmarks the feed -> order-book -> callback hot path.')
+  parser.add_argument('--output', default=None, help='Write json results here instead of stdout.')
+  parser.add_argument('--label', default=None, help='A label (e.g. a version or commit) stored with the results.')
+  parser.add_argument('--quick', action='store_true', help='Run smaller benchmarks, for smoke testing.')
+  args = parser.parse_args()
+  scale = 10 if args.quick else 1
+  results = {
+    'label': args.label,
+    'python': sys.version.split()[0],
+    'platform': platform.platform(),
+    'timestamp': time.time(),
+    'ticker_throughput': bench_ticker_throughput(100, 100000 // scale, [1, 100, 1000], TickerTimeFormat.DATETIME) +
+                         bench_ticker_throughput(100, 100000 // scale, [100], TickerTimeFormat.EPOCH),
+    'get_book_latency': bench_get_book_latency([10, 100, 1000], [1, 10, 50, None], 5000 // scale),
+    'update_throughput': bench_update_throughput(100, 20, 50000 // scale),
+    'memory_per_product': bench_memory_per_product(100 // scale, 200),
+    'startup': bench_startup([10, 100, 300]),
+  }
+  output = json.dumps(results, indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(output)
+  else:
+    print(output)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,90 @@
+# A deterministic, synthetic Coinbase feed used to benchmark exchanges and order-books without a network connection.
+import random
+
+from zcoins.feeds import LocalPublicClient
+
+BASE_CURRENCIES = ['BTC', 'ETH', 'LTC', 'XLM', 'ADA', 'SOL', 'DOT', 'UNI', 'LINK', 'ATOM', 'ALGO', 'AAVE', 'COMP',
+                   'MKR', 'SNX', 'YFI', 'GRT', 'FIL', 'BAT', 'ZRX', 'BCH', 'EOS', 'XTZ', 'DASH', 'ETC', 'OMG', 'KNC',
+                   'BAND', 'NMR', 'CGLD', 'LRC', 'REN', 'BAL', 'NU', 'UMA', 'SKL', 'CRV', 'ANKR', 'STORJ', 'MATIC']
+QUOTE_CURRENCIES = ['USD', 'EUR', 'GBP', 'USDC', 'BTC', 'ETH', 'USDT', 'DAI']
+
+
+def make_products(n: int) -> list:
+  """Returns json for n distinct products, in the format of Coinbase's /products endpoint."""
+  products = []
+  for quote in QUOTE_CURRENCIES:
+    for base in BASE_CURRENCIES:
+      if base != quote:
+        products.append({'id': '{}-{}'.format(base, quote), 'base_currency': base, 'quote_currency': quote})
+        if len(products) == n:
+          return products
+  raise ValueError('can make at most {} products.'.format(len(products)))
+
+
+def make_public_client(products: list) -> LocalPublicClient:
+  return LocalPublicClient(products)
+
+
+class SyntheticFeed:
+  """Generates level2 snapshots, l2updates and tickers for a set of products, deterministically from a seed.
+
+  Like the real feed, l2updates only remove price levels that exist in the book.
+  """
+
+  def __init__(self, product_ids: list, depth: int = 100, seed: int = 0):
+    self.product_ids = product_ids
+    self.depth = depth
+    self._rng = random.Random(seed)
+    self._mid = {product_id: self._rng.uniform(1, 1000) for product_id in product_ids}
+    self._sequence = 0
+    self._levels = {(product_id, side): set() for product_id in product_ids for side in ('buy', 'sell')}
+
+  def _tick_size(self, product_id):
+    return self._mid[product_id] / 10000
+
+  def _price(self, product_id, side, level):
+    offset = level * self._tick_size(product_id)
+    return '{:.8f}'.format(self._mid[product_id] - offset if side == 'buy' else self._mid[product_id] + offset)
+
+  def snapshot(self, product_id) -> dict:
+    message = {'type': 'snapshot', 'product_id': product_id}
+    for side, key in (('buy', 'bids'), ('sell', 'asks')):
+      prices = [self._price(product_id, side, level + 1) for level in range(self.depth)]
+      self._levels[(product_id, side)] = set(prices)
+      message[key] = [[price, '{:.8f}'.format(self._rng.uniform(0.01, 10))] for price in prices]
+    return message
+
+  def snapshots(self):
+    return [self.snapshot(product_id) for product_id in self.product_ids]
+
+  def l2update(self) -> dict:
+    product_id = self._rng.choice(self.product_ids)
+    side = self._rng.choice(('buy', 'sell'))
+    levels = self._levels[(product_id, side)]
+    if levels and self._rng.random() < 0.2:
+      price, size = self._rng.choice(sorted(levels)), '0'
+      levels.discard(price)
+    else:
+      price, size = self._price(product_id, side, self._rng.randint(1, self.depth)), \
+          '{:.8f}'.format(self._rng.uniform(0.01, 10))
+      levels.add(price)
+    return {'type': 'l2update', 'product_id': product_id, 'time': '2021-03-01T12:34:56.123456Z',
+            'changes': [[side, price, size]]}
+
+  def ticker(self) -> dict:
+    product_id = self._rng.choice(self.product_ids)
+    mid, tick = self._mid[product_id], self._tick_size(product_id)
+    self._sequence += 1
+    return {'type': 'ticker', 'sequence': self._sequence, 'product_id': product_id,
+            'price': '{:.8f}'.format(mid), 'best_bid': '{:.8f}'.format(mid - tick),
+            'best_ask': '{:.8f}'.format(mid + tick), 'side': self._rng.choice(('buy', 'sell')),
+            'time': '2021-03-01T12:{:02d}:{:02d}.{:06d}Z'.format(self._sequence // 60000 % 60,
+                                                                self._sequence // 1000 % 60,
+                                                                self._sequence % 1000 * 1000),
+            'trade_id': self._sequence, 'last_size': '{:.8f}'.format(self._rng.uniform(0.001, 1))}
+
+  def tickers(self, n: int) -> list:
+    return [self.ticker() for _ in range(n)]
+
+  def l2updates(self, n: int) -> list:
+    return [self.l2update() for _ in range(n)]
@@ -0,0 +1,85 @@
+# Measures the cost of decoding a raw Coinbase ticker message into a TickerMessage.
+#
+# Compares the original dateutil-based decoder against the fast decoders in zcoins.exchanges.coinbase_decoding.
+#
+# Usage:
+#   python benchmarks/ticker_decode_benchmark.py
+import os
+import sys
+import timeit
+
+# So the benchmarks run from a checkout, without installing zcoins.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil import parser
+
+from zcoins.exchanges import OrderSide, Product, TickerMessage
+from zcoins.exchanges.coinbase_decoding import decode_epoch, decode_order_side, decode_time
+
+RAW_TICKER_MESSAGE = {
+  'type': 'ticker',
+  'sequence': 23453245,
+  'product_id': 'BTC-USD',
+  'price': '58431.12',
+  'open_24h': '57000.00',
+  'volume_24h': '12345.6789',
+  'low_24h': '56000.00',
+  'high_24h': '59000.00',
+  'volume_30d': '345678.90',
+  'best_bid': '58431.11',
+  'best_ask': '58431.12',
+  'side': 'buy',
+  'time': '2021-03-01T12:34:56.123456Z',
+  'trade_id': 123456789,
+  'last_size': '0.01234567'
+}
+PRODUCT = Product(product_id='BTC-USD', base_currency='BTC', quote_currency='USD')
+NUMBER = 100000
+
+
+def decode_with_dateutil(raw):
+  return TickerMessage(product=PRODUCT,
+                       time=parser.parse(raw['time']),
+                       order_side=OrderSide[raw['side'].upper()],
+                       last_size=float(raw['last_size']),
+                       price=float(raw['price']),
+                       best_bid=float(raw['best_bid']),
+                       best_ask=float(raw['best_ask']))
+
+
+def decode_with_datetime(raw):
+  return TickerMessage(product=PRODUCT,
+                       time=decode_time(raw['time']),
+                       order_side=decode_order_side(raw['side']),
+                       last_size=float(raw['last_size']),
+                       price=float(raw['price']),
+                       best_bid=float(raw['best_bid']),
+                       best_ask=float(raw['best_ask']))
+
+
+def decode_with_epoch(raw):
+  return TickerMessage(product=PRODUCT,
+                       time=None,
+                       order_side=decode_order_side(raw['side']),
+                       last_size=float(raw['last_size']),
+                       price=float(raw['price']),
+                       best_bid=float(raw['best_bid']),
+                       best_ask=float(raw['best_ask']),
+                       epoch_time=decode_epoch(raw['time']))
+
+
+def main():
+  assert decode_with_dateutil(RAW_TICKER_MESSAGE).time == decode_with_datetime(RAW_TICKER_MESSAGE).time
+  assert decode_with_dateutil(RAW_TICKER_MESSAGE).time.timestamp() == \
+         decode_with_epoch(RAW_TICKER_MESSAGE).epoch_time
+  baseline = None
+  for name, decoder in [('dateutil', decode_with_dateutil),
+                        ('fast datetime', decode_with_datetime),
+                        ('fast epoch', decode_with_epoch)]:
+    seconds = min(timeit.repeat(lambda: decoder(RAW_TICKER_MESSAGE), number=NUMBER, repeat=3))
+    baseline = baseline or seconds
+    print('{:>14}: {:>7.3f} us/msg ({:.1f}x)'.format(name, seconds / NUMBER * 1e6, baseline / seconds))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,82 @@
+# Measures the cost of routing a ticker message to its callbacks as the number of callbacks grows.
+#
+# Compares the indexed TickerCallbackRouter against the linear partial_match scan it replaced.
+#
+# Usage:
+#   python benchmarks/ticker_dispatch_benchmark.py
+import os
+import random
+import sys
+import timeit
+
+# So the benchmarks run from a checkout, without installing zcoins.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zcoins.exchanges import Exchange, Product
+from zcoins.exchanges.ticker_router import TickerCallbackRouter
+
+CURRENCIES = ['BTC', 'ETH', 'LTC', 'XLM', 'ADA', 'SOL', 'DOT', 'UNI', 'LINK', 'ATOM', 'ALGO', 'AAVE', 'COMP', 'MKR',
+              'SNX', 'YFI', 'GRT', 'FIL', 'BAT', 'ZRX']
+QUOTE_CURRENCIES = ['USD', 'EUR', 'GBP', 'USDC', 'BTC']
+CALLBACK_COUNTS = [10, 100, 500, 1000, 5000]
+MESSAGES = 20000
+
+
+def _make_products():
+  return [Product(product_id='{}-{}'.format(base, quote), base_currency=base, quote_currency=quote)
+          for base in CURRENCIES for quote in QUOTE_CURRENCIES if base != quote]
+
+
+def _make_callbacks(products, n, rng):
+  def noop(exchange, message):
+    pass
+
+  callbacks = []
+  for _ in range(n):
+    product = rng.choice(products)
+    kind = rng.random()
+    if kind < 0.8:
+      matcher = Product(product_id=product.product_id)
+    elif kind < 0.9:
+      matcher = Product(base_currency=product.base_currency)
+    elif kind < 0.99:
+      matcher = Product(quote_currency=product.quote_currency)
+    else:
+      matcher = None
+    callbacks.append(Exchange._TickerCallback(callback=noop, product_matcher=matcher))
+  return callbacks
+
+
+def _linear_dispatch(callbacks, products):
+  for product in products:
+    for callback in callbacks:
+      if callback.product_matcher:
+        if callback.product_matcher.partial_match(product):
+          callback.callback(None, product)
+      else:
+        callback.callback(None, product)
+
+
+def _indexed_dispatch(router, products):
+  for product in products:
+    for callback in router.get_callbacks(product):
+      callback.callback(None, product)
+
+
+def main():
+  rng = random.Random(0)
+  products = _make_products()
+  feed = [rng.choice(products) for _ in range(MESSAGES)]
+  print('{:>10} {:>16} {:>16} {:>9}'.format('callbacks', 'linear us/msg', 'indexed us/msg', 'speedup'))
+  for n in CALLBACK_COUNTS:
+    callbacks = _make_callbacks(products, n, rng)
+    router = TickerCallbackRouter()
+    for idx, callback in enumerate(callbacks):
+      router.add(str(idx), callback)
+    linear = min(timeit.repeat(lambda: _linear_dispatch(callbacks, feed), number=1, repeat=3)) / MESSAGES * 1e6
+    indexed = min(timeit.repeat(lambda: _indexed_dispatch(router, feed), number=1, repeat=3)) / MESSAGES * 1e6
+    print('{:>10} {:>16.2f} {:>16.2f} {:>8.1f}x'.format(n, linear, indexed, linear / indexed))
+
+
+if __name__ == '__main__':
+  main()
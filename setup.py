@@ -12,6 +12,8 @@ setup(
   author='chris',
   author_email='chris@zbots.org',
   description='A generic crypto-market API.',
-  install_requires=['zcoinbase',
+  python_requires='>=3.10',
+  install_requires=['numpy',
+                    'zcoinbase',
                     'python-binance']
 )
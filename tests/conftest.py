@@ -0,0 +1,25 @@
+# Shared helpers for the tests, which run against the checkout (python -m pytest tests).
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zcoins.order_books.array_order_book import ArraySingleProductOrderBook
+from zcoins.order_books.order_book import MultiProductOrderBook
+
+
+class StaticMultiProductOrderBook(MultiProductOrderBook):
+  """Array-backed order-books that are only updated by the test, each starts with a bid at 1 and an ask at 2."""
+
+  def __init__(self, product_ids):
+    super().__init__(product_ids=product_ids)
+    self._post_subclass_init()
+
+  def make_single_product_order_book(self, product_id):
+    base_currency, quote_currency = product_id.split('-')
+    order_book = ArraySingleProductOrderBook(product_id, base_currency, quote_currency)
+    order_book.set_book(bids=[(1.0, 1.0)], asks=[(2.0, 1.0)])
+    return order_book
+
+  def make_multiple_product_order_book(self, product_ids):
+    return [self.make_single_product_order_book(product_id) for product_id in product_ids]
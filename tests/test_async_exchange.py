@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+from zcoins.exchanges import AsyncAuthenticatedExchange, CoinbaseAuthenticatedExchange
+from zcoins.feeds import LocalAuthenticatedClient, LocalWebsocket
+
+PRODUCTS = [{'id': 'BTC-USD', 'base_currency': 'BTC', 'quote_currency': 'USD'}]
+
+
+class _SlowExchange(CoinbaseAuthenticatedExchange):
+  ORDER_REQUESTS_PER_SECOND = 2
+  ORDER_REQUEST_BURST = 1
+
+
+def _read_accounts(use_account_ledger):
+  """Returns the USD account, all the accounts and how long reading them took, once the rate limiter is empty."""
+  client = LocalAuthenticatedClient(PRODUCTS, balances={'USD': 100, 'BTC': 1})
+  exchange = _SlowExchange(product_ids=['BTC-USD'], authenticated_client=client, websocket=LocalWebsocket(),
+                           use_account_ledger=use_account_ledger, account_reconcile_interval=None)
+  # Use up the only token, each further rate limited request waits half a second for the next one.
+  exchange._order_rate_limiter.acquire()
+
+  async def read_accounts():
+    async_exchange = AsyncAuthenticatedExchange(exchange)
+    return await async_exchange.get_account(currency='USD'), await async_exchange.get_all_accounts()
+
+  start = time.monotonic()
+  account, accounts = asyncio.run(read_accounts())
+  return account, accounts, time.monotonic() - start
+
+
+def test_ledger_accounts_skip_the_rate_limiter():
+  account, accounts, elapsed = _read_accounts(use_account_ledger=True)
+  assert account.balance == 100
+  assert sorted(account.currency for account in accounts) == ['BTC', 'USD']
+  assert elapsed < 0.25
+
+
+def test_rest_accounts_are_rate_limited():
+  account, accounts, elapsed = _read_accounts(use_account_ledger=False)
+  assert account.balance == 100
+  assert len(accounts) == 2
+  assert elapsed >= 0.9
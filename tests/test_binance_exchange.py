@@ -0,0 +1,71 @@
+import time
+
+from zcoins.exchanges import BinanceExchange, OrderSide, Product
+from zcoins.feeds import LocalBinanceClient, LocalBinanceWebsocketManager
+
+SYMBOLS = [{'symbol': 'BTCUSDT', 'baseAsset': 'BTC', 'quoteAsset': 'USDT'},
+           {'symbol': 'ETHUSDT', 'baseAsset': 'ETH', 'quoteAsset': 'USDT'}]
+
+
+def _make_exchange():
+  websocket_manager = LocalBinanceWebsocketManager()
+  exchange = BinanceExchange(product_ids=['BTCUSDT', 'ETHUSDT'], client=LocalBinanceClient(SYMBOLS),
+                             websocket_manager=websocket_manager)
+  websocket_manager.publish_depth('BTCUSDT', bids=[['100.0', '1.0']], asks=[['101.0', '2.0']])
+  return exchange, websocket_manager
+
+
+def _trade(websocket_manager, symbol, price='100.5', trade_time=None):
+  trade_time = trade_time if trade_time is not None else int(time.time() * 1000)
+  websocket_manager.publish_trade(symbol, price=price, quantity='0.5', trade_time=trade_time, buyer_is_maker=True)
+
+
+def test_ticker_messages():
+  exchange, websocket_manager = _make_exchange()
+  messages = []
+  exchange.add_ticker_callback(lambda exchange, message: messages.append(message))
+  _trade(websocket_manager, 'BTCUSDT')
+  assert len(messages) == 1
+  message = messages[0]
+  assert message.product.product_id == 'BTCUSDT' and message.order_side is OrderSide.SELL
+  assert (message.price, message.last_size, message.best_bid, message.best_ask) == (100.5, 0.5, 100.0, 101.0)
+
+
+def test_trade_streams_follow_callbacks():
+  exchange, websocket_manager = _make_exchange()
+  assert not any(name.endswith('@trade') for name in websocket_manager._sockets)
+  btc_id = exchange.add_ticker_callback(lambda exchange, message: None, product_matcher=Product(product_id='BTCUSDT'))
+  assert set(exchange._trade_streams) == {'BTCUSDT'}
+  usdt_id = exchange.add_ticker_callback(lambda exchange, message: None, product_matcher=Product(quote_currency='USDT'))
+  assert set(exchange._trade_streams) == {'BTCUSDT', 'ETHUSDT'}
+  exchange.remove_ticker_callback(usdt_id)
+  assert set(exchange._trade_streams) == {'BTCUSDT'}
+  assert 'ethusdt@trade' not in websocket_manager._sockets
+  exchange.remove_ticker_callback(btc_id)
+  assert exchange._trade_streams == {}
+  assert not any(name.endswith('@trade') for name in websocket_manager._sockets)
+
+
+def test_metrics():
+  exchange, websocket_manager = _make_exchange()
+  assert exchange.get_stats() is None
+
+  def failing_callback(exchange, message):
+    raise RuntimeError('callback failed')
+
+  ok_id = exchange.add_ticker_callback(lambda exchange, message: None)
+  exchange.enable_metrics()
+  _trade(websocket_manager, 'BTCUSDT', trade_time=int(time.time() * 1000) - 2000)
+  failing_id = exchange.add_ticker_callback(failing_callback, product_matcher=Product(product_id='ETHUSDT'))
+  try:
+    _trade(websocket_manager, 'ETHUSDT')
+  except RuntimeError:
+    pass
+  stats = exchange.get_stats()
+  assert stats['products']['BTCUSDT']['messages'] == 1
+  assert stats['products']['BTCUSDT']['lag']['max'] >= 2.0
+  assert stats['products']['BTCUSDT']['decode']['count'] == 1
+  assert stats['products']['ETHUSDT']['messages'] == 1
+  assert stats['callbacks'][ok_id]['calls'] == 2
+  assert stats['callbacks'][failing_id]['name'].endswith('failing_callback')
+  assert (stats['callbacks'][failing_id]['calls'], stats['callbacks'][failing_id]['errors']) == (1, 1)
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from websocket import WebSocketConnectionClosedException
+
+from zcoins.exchanges import CoinbaseExchange
+from zcoins.feeds import LocalPublicClient, LocalWebsocket
+
+PRODUCTS = [{'id': product_id, 'base_currency': product_id[:3], 'quote_currency': 'USD'}
+            for product_id in ('BTC-USD', 'ETH-USD', 'LTC-USD')]
+
+
+def _snapshot(product_id, bid='1', ask='2'):
+  return {'type': 'snapshot', 'product_id': product_id, 'bids': [[bid, '1']], 'asks': [[ask, '1']]}
+
+
+def _ticker(product_id):
+  return {'type': 'ticker', 'product_id': product_id, 'time': '2021-03-01T12:00:00.000000Z', 'side': 'buy',
+          'last_size': '1', 'price': '1.5', 'best_bid': '1', 'best_ask': '2'}
+
+
+class _StandInSocket:
+  """Stands in for the websocket-client WebSocketApp at CoinbaseWebsocket.ws, recording the frames sent."""
+
+  def __init__(self):
+    self.connected = True
+    self.sent = []
+
+  def send(self, frame):
+    if not self.connected:
+      raise WebSocketConnectionClosedException('socket is already closed.')
+    self.sent.append(json.loads(frame))
+
+
+class _RawFrameWebsocket(LocalWebsocket):
+  """A LocalWebsocket that, like CoinbaseWebsocket, can't unsubscribe, so unsubscribes are sent as raw frames."""
+  unsubscribe = None
+
+  def __init__(self, products_to_listen=None):
+    super().__init__(products_to_listen)
+    self.ws = _StandInSocket()
+
+  def reopen(self):
+    self.ws.connected = True
+    self.subscribe()
+    for function in self.channels_to_function.get('open_websocket', []):
+      function(self.ws)
+
+
+def _make_exchange(websocket, array_backed):
+  return CoinbaseExchange(product_ids=['BTC-USD', 'ETH-USD'], websocket=websocket,
+                          client=LocalPublicClient(PRODUCTS), array_backed_order_books=array_backed)
+
+
+@pytest.mark.parametrize('array_backed', [False, True])
+def test_removing_an_order_book_keeps_the_products_other_channels(array_backed):
+  websocket = LocalWebsocket()
+  exchange = _make_exchange(websocket, array_backed)
+  ticks = []
+  exchange.add_ticker_callback(lambda _, tick: ticks.append(tick.product.product_id))
+  order_books = exchange.get_all_order_books()
+  websocket.publish(_snapshot('ETH-USD'))
+  removed = order_books.remove_order_book('ETH-USD')
+
+  assert 'ETH-USD' in websocket.products_to_listen
+  websocket.publish(_ticker('ETH-USD'))
+  assert ticks == ['ETH-USD']
+  order_books.add_order_book('LTC-USD')  # Resubscribes every product.
+  websocket.publish({'type': 'l2update', 'product_id': 'ETH-USD', 'changes': [['buy', '1.5', '1']]})
+  assert 'ETH-USD' not in order_books.get_tracked_products()
+  assert removed.get_version() == 1
+  websocket.publish(_ticker('ETH-USD'))
+  assert ticks == ['ETH-USD', 'ETH-USD']
+
+
+@pytest.mark.parametrize('array_backed', [False, True])
+def test_readding_a_removed_order_book_resubscribes_it(array_backed):
+  websocket = LocalWebsocket()
+  order_books = _make_exchange(websocket, array_backed).get_all_order_books()
+  order_books.remove_order_book('ETH-USD')
+  order_book = order_books.add_order_book('ETH-USD')
+  websocket.publish(_snapshot('ETH-USD', bid='3', ask='4'))
+  assert float(order_book.get_best_bid()[0]) == 3.0
+
+
+def test_removing_an_order_book_while_the_socket_is_closed():
+  websocket = _RawFrameWebsocket()
+  order_books = _make_exchange(websocket, array_backed=True).get_all_order_books()
+  websocket.ws.connected = False
+  order_books.remove_order_book('ETH-USD')  # Doesn't raise.
+  assert websocket.ws.sent == []
+
+  websocket.reopen()
+  assert websocket.ws.sent == [{'type': 'unsubscribe', 'product_ids': ['ETH-USD'], 'channels': ['level2']}]
+  assert 'ETH-USD' in websocket.products_to_listen
+
+
+def test_removing_an_order_book_sends_a_level2_unsubscribe():
+  websocket = _RawFrameWebsocket()
+  order_books = _make_exchange(websocket, array_backed=False).get_all_order_books()
+  order_books.remove_order_book('BTC-USD')
+  assert websocket.ws.sent == [{'type': 'unsubscribe', 'product_ids': ['BTC-USD'], 'channels': ['level2']}]
+  assert 'BTC-USD' not in order_books.internal_order_book.get_tracked_products()
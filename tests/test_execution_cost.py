@@ -0,0 +1,44 @@
+import pytest
+
+from zcoins.exchanges import OrderSide
+from zcoins.order_books.array_order_book import ArraySingleProductOrderBook
+from zcoins.order_books.execution_cost import ExecutionCostEstimator
+
+ASKS = [(10.0, 1.0), (11.0, 2.0), (12.0, 0.5)]
+
+
+def _make_books():
+  books = []
+  for idx, asks in enumerate([ASKS, [], ASKS[:1], [(price + 1, size * 2) for price, size in ASKS]]):
+    order_book = ArraySingleProductOrderBook('C{}-USD'.format(idx), 'C{}'.format(idx), 'USD')
+    order_book.set_book(bids=[(price - 5, size) for price, size in asks], asks=asks)
+    books.append(order_book)
+  return books
+
+
+# Includes orders that end exactly on a level, that fill nothing and that the books aren't deep enough for.
+@pytest.mark.parametrize('side', list(OrderSide))
+@pytest.mark.parametrize('order', [{'size': 1.0}, {'size': 2.5}, {'size': 3.0}, {'size': 10.0}, {'size': 0.0},
+                                   {'funds': 10.0}, {'funds': 25.0}, {'funds': 1000.0}])
+def test_estimate_many_matches_estimate(side, order):
+  books = _make_books()
+  estimates = ExecutionCostEstimator().estimate_many(books, side, **order)
+  assert list(estimates) == [order_book.product_id for order_book in books]
+  estimator = ExecutionCostEstimator()
+  for order_book in books:
+    assert estimates[order_book.product_id] == estimator.estimate(order_book, side, **order)
+
+
+def test_estimate_many_updates_changed_books():
+  books = _make_books()
+  estimator = ExecutionCostEstimator()
+  estimator.estimate_many(books, OrderSide.BUY, size=2.0)
+  books[0].set_book(bids=[], asks=[(10.0, 1.0), (10.5, 5.0)])
+  estimate = estimator.estimate_many(books, OrderSide.BUY, size=2.0)[books[0].product_id]
+  assert estimate.funds == 20.5 and estimate.worst_price == 10.5 and estimate.levels_consumed == 2
+
+
+def test_estimate_many_requires_size_or_funds():
+  with pytest.raises(ValueError):
+    ExecutionCostEstimator().estimate_many(_make_books(), OrderSide.BUY)
+  assert ExecutionCostEstimator().estimate_many([], OrderSide.BUY, size=1.0) == {}
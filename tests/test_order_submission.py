@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from zcoins.exchanges import CoinbaseAuthenticatedExchange, CoinbaseRequestError, OrderRequest, OrderSide, OrderType
+from zcoins.feeds import LocalAuthenticatedClient, LocalWebsocket
+
+PRODUCTS = [{'id': 'BTC-USD', 'base_currency': 'BTC', 'quote_currency': 'USD'}]
+
+
+class _FastExchange(CoinbaseAuthenticatedExchange):
+  ORDER_REQUESTS_PER_SECOND = 50
+  ORDER_REQUEST_BURST = 5
+
+
+def _make_exchange(client, exchange_class=CoinbaseAuthenticatedExchange, **kwargs):
+  return exchange_class(product_ids=['BTC-USD'], authenticated_client=client, websocket=LocalWebsocket(), **kwargs)
+
+
+def _limit_buy(price, size=1.0):
+  return OrderRequest(product_id='BTC-USD', order_side=OrderSide.BUY, order_type=OrderType.LIMIT, price=price,
+                      size=size)
+
+
+def test_place_orders_resolves_futures_in_order():
+  client = LocalAuthenticatedClient(PRODUCTS, balances={'USD': 1000, 'BTC': 1}, request_latency=0.01)
+  exchange = _make_exchange(client, max_order_workers=4)
+  prices = [float(price) for price in range(10, 20)]
+  reports = [future.result(timeout=10) for future in exchange.place_orders([_limit_buy(price) for price in prices])]
+  assert [report.price for report in reports] == prices
+  assert all(report.order_side is OrderSide.BUY for report in reports)
+  assert len(client.get_open_orders()) == len(prices)
+
+
+def test_place_orders_partial_failure():
+  client = LocalAuthenticatedClient(PRODUCTS, balances={'USD': 100, 'BTC': 1})
+  exchange = _make_exchange(client, max_order_workers=1)  # One worker, so the orders are placed in order.
+  futures = exchange.place_orders([_limit_buy(60), _limit_buy(60), _limit_buy(30)])
+  assert futures[0].result(timeout=10).price == 60
+  with pytest.raises(CoinbaseRequestError) as error:
+    futures[1].result(timeout=10)
+  assert error.value.http_code == 400 and error.value.message == 'Insufficient funds'
+  assert futures[2].result(timeout=10).price == 30
+  assert exchange.get_account(currency='USD').hold == 90
+
+
+def test_cancel_orders_partial_failure():
+  client = LocalAuthenticatedClient(PRODUCTS, balances={'USD': 100, 'BTC': 1})
+  exchange = _make_exchange(client)
+  report = exchange.limit_order('BTC-USD', OrderSide.SELL, price=50, size=0.5)
+  futures = exchange.cancel_orders([report.order_id, 'unknown-order'])
+  assert futures[0].result(timeout=10) == report.order_id
+  with pytest.raises(CoinbaseRequestError) as error:
+    futures[1].result(timeout=10)
+  assert error.value.http_code == 404
+  assert client.get_open_orders() == []
+  assert exchange.get_account(currency='BTC').hold == 0
+
+
+def test_order_requests_are_rate_limited():
+  client = LocalAuthenticatedClient(PRODUCTS, balances={'USD': 1000, 'BTC': 1})
+  exchange = _make_exchange(client, exchange_class=_FastExchange, max_order_workers=8)
+  rate, burst = _FastExchange.ORDER_REQUESTS_PER_SECOND, _FastExchange.ORDER_REQUEST_BURST
+  start = time.monotonic()
+  futures = exchange.place_orders([_limit_buy(1.0) for _ in range(15)])
+  futures += exchange.cancel_orders(['unknown-order'] * 10)
+  for future in futures:
+    future.exception(timeout=10)
+  times = sorted(request_time for request_time, _, _ in client.requests)
+  assert len(times) == 25
+  # The bucket starts full, after burst requests they're spaced 1 / rate seconds apart.
+  for idx, request_time in enumerate(times):
+    assert request_time - start >= (idx + 1 - burst) / rate - 0.005
+  assert times[-1] - start >= (25 - burst) / rate - 0.005
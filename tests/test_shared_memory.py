@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from zcoins.order_books import shared_memory
+from zcoins.order_books.shared_memory import SharedMemoryBookPublisher, SharedMemoryMultiProductOrderBook
+
+from conftest import StaticMultiProductOrderBook
+
+
+def _run(script: str) -> subprocess.CompletedProcess:
+  """Runs script in a new interpreter, the resource tracker's output ends up in the result's stderr."""
+  tests_dir = os.path.dirname(os.path.abspath(__file__))
+  env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(tests_dir), tests_dir]))
+  return subprocess.run([sys.executable, '-c', textwrap.dedent(script)], capture_output=True, text=True, timeout=60,
+                        env=env)
+
+
+def test_publish_and_read_in_one_process_has_no_tracker_warnings():
+  result = _run('''
+    from conftest import StaticMultiProductOrderBook
+    from zcoins.order_books.shared_memory import SharedMemoryBookPublisher, SharedMemoryMultiProductOrderBook
+    publisher = SharedMemoryBookPublisher(StaticMultiProductOrderBook(['BTC-USD']))
+    reader = SharedMemoryMultiProductOrderBook(publisher.name)
+    print(reader.get_order_book('BTC-USD').get_bids())
+    reader.close()
+    publisher.close()
+  ''')
+  assert result.returncode == 0, result.stderr
+  assert result.stdout.strip() == '[(1.0, 1.0)]'
+  assert result.stderr == ''
+
+
+def test_reader_in_another_process_does_not_unlink_the_segment():
+  publisher = SharedMemoryBookPublisher(StaticMultiProductOrderBook(['BTC-USD']))
+  try:
+    result = _run('''
+      from zcoins.order_books.shared_memory import SharedMemoryMultiProductOrderBook
+      reader = SharedMemoryMultiProductOrderBook({!r})
+      print(reader.get_order_book('BTC-USD').get_asks())
+      reader.close()
+    '''.format(publisher.name))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[(2.0, 1.0)]'
+    reader = SharedMemoryMultiProductOrderBook(publisher.name)  # Still there after the other process exited.
+    assert reader.get_order_book('BTC-USD').get_asks() == [(2.0, 1.0)]
+    reader.close()
+  finally:
+    publisher.close()
+
+
+def test_ids_longer_than_the_directory_fields_are_rejected():
+  with pytest.raises(ValueError):
+    SharedMemoryBookPublisher(StaticMultiProductOrderBook(['BTC-' + 'X' * 17]))
+
+
+def test_read_of_a_slot_left_mid_write_times_out(monkeypatch):
+  monkeypatch.setattr(shared_memory, '_READ_TIMEOUT', 0.05)
+  publisher = SharedMemoryBookPublisher(StaticMultiProductOrderBook(['BTC-USD']))
+  reader = SharedMemoryMultiProductOrderBook(publisher.name)
+  try:
+    publisher._slot_by_product['BTC-USD']['sequence'] += 1  # As if the publisher died mid-write.
+    with pytest.raises(TimeoutError):
+      reader.get_order_book('BTC-USD').get_bids()
+  finally:
+    reader.close()
+    publisher.close()
@@ -1,5 +1,39 @@
-from zcoins.exchanges.exchange_data import Product, OrderSide, OrderReport, OrderType, TickerMessage
+import importlib
+
+from zcoins.exchanges.exchange_data import Product, OrderSide, OrderReport, OrderRequest, OrderType, TickerMessage, \
+  TickerTimeFormat
 from zcoins.exchanges.account_data import Account
+from zcoins.exchanges.account_ledger import AccountLedger
+from zcoins.exchanges.ticker_dispatch import DispatchMode, OverflowPolicy
+from zcoins.exchanges.metrics import ExchangeMetrics, LatencyHistogram
+from zcoins.exchanges.rate_limiter import TokenBucket
+from zcoins.exchanges.bars import Bar, BarAggregator
 from zcoins.exchanges.exchange import ExchangeProductInfo, Exchange, AuthenticatedExchange
-from zcoins.exchanges.coinbase_exchange import CoinbaseAuthenticatedExchange, CoinbaseExchange, \
-  CoinbaseExchangeProductInfo
+from zcoins.exchanges.async_exchange import AsyncStream, AsyncExchange, AsyncAuthenticatedExchange
+from zcoins.exchanges.simulated_exchange import InsufficientFundsError, SimulatedExchange
+
+# Exchange adapters (and modules with heavy dependencies) are only imported when one of their names is first used, so
+# importing this package doesn't import zcoinbase, dateutil or numpy.
+_LAZY_NAMES = {
+  'BinanceExchange': 'zcoins.exchanges.binance_exchange',
+  'BinanceExchangeProductInfo': 'zcoins.exchanges.binance_exchange',
+  'CoinbaseAuthenticatedExchange': 'zcoins.exchanges.coinbase_exchange',
+  'CoinbaseExchange': 'zcoins.exchanges.coinbase_exchange',
+  'CoinbaseExchangeProductInfo': 'zcoins.exchanges.coinbase_exchange',
+  'CoinbaseRequestError': 'zcoins.exchanges.coinbase_exchange',
+  'TickColumns': 'zcoins.exchanges.tick_history',
+  'TickHistory': 'zcoins.exchanges.tick_history',
+  'TickRecorder': 'zcoins.exchanges.tick_history',
+}
+
+
+def __getattr__(name):
+  if name not in _LAZY_NAMES:
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+  value = getattr(importlib.import_module(_LAZY_NAMES[name]), name)
+  globals()[name] = value
+  return value
+
+
+def __dir__():
+  return sorted(list(globals()) + list(_LAZY_NAMES))
@@ -11,4 +11,5 @@ class Account:
   currency: Text  # The currency of the account.
   balance: float  # Current balance of the account.
   hold: float  # The balance that is unavailable due to holds (usually means the funds are already in an order)
-  available: float  # The
+  available: float  # The balance that can be used (balance - hold).
+  updated_at: float = None  # When (seconds since the epoch) this data was last known to be accurate.
@@ -0,0 +1,202 @@
+# This file contains a local ledger of account balances, kept up to date from the Coinbase user channel.
+from __future__ import annotations
+
+import dataclasses
+import logging
+import time
+
+from threading import Event, RLock, Thread
+from typing import Callable, Text
+
+from zcoins.exchanges.account_data import Account
+
+# Fields that only messages of the authenticated user channel have, the user channel is the full channel filtered to the
+# user's orders and adds these to each message. Match messages have the taker_ or maker_ fields of the user's side.
+_USER_FIELDS = ('user_id', 'profile_id', 'taker_user_id', 'taker_profile_id', 'maker_user_id', 'maker_profile_id')
+_TAKER_FIELDS = ('taker_user_id', 'taker_profile_id')
+_MAKER_FIELDS = ('maker_user_id', 'maker_profile_id')
+
+
+@dataclasses.dataclass
+class _TrackedOrder:
+  base_currency: Text
+  quote_currency: Text
+  side: Text  # 'buy' or 'sell'.
+  price: float  # None for market orders.
+  hold: float  # The hold remaining on the order, in quote_currency for buys and base_currency for sells.
+
+
+class AccountLedger:
+  """Keeps account balances in memory, so they can be read without a REST request.
+
+  The ledger is seeded from REST, then applies the order lifecycle messages (received, match, change, done) of the
+  authenticated 'user' channel: holds are placed when orders are received and released as they fill or finish, and
+  fills move balances between the base and quote currency. Fees that aren't reported in match messages, and orders on
+  products the websocket isn't subscribed to, are picked up by reconciling against REST every reconcile_interval.
+
+  The websocket must be authenticated (see CoinbaseWebsocket.add_authentication) to receive the user channel. Messages
+  without the user channel's user_id/profile_id fields (e.g. public full or matches channel messages on the same
+  websocket) are ignored.
+  """
+
+  def __init__(self, product_info, fetch_accounts: Callable[[], list[Account]], websocket=None,
+               reconcile_interval: float = 60.0):
+    """
+    Args:
+      product_info: An ExchangeProductInfo, used to look up the currencies of products.
+      fetch_accounts: Requests all accounts from REST.
+      websocket: The websocket to receive the user channel from, if None the ledger must be fed with consume_message.
+      reconcile_interval: Seconds between reconciliations against REST, None disables periodic reconciliation.
+    """
+    self.product_info = product_info
+    self.fetch_accounts = fetch_accounts
+    self.reconcile_interval = reconcile_interval
+    self._lock = RLock()
+    self._accounts = {}  # Keyed by currency.
+    self._account_id_to_currency = {}
+    self._orders = {}  # order_id -> _TrackedOrder, for orders received since the ledger started.
+    self._stop = Event()
+    self._thread = None
+    self.reconcile()
+    if websocket is not None:
+      if 'user' not in websocket.extra_channels:
+        websocket.add_channel('user', refresh_subscriptions=False)
+      websocket.add_channel_function('all_messages', self.consume_message)
+
+  def start(self):
+    """Starts reconciling against REST every reconcile_interval, on a background thread."""
+    if self.reconcile_interval is None or self._thread is not None:
+      return
+    self._stop.clear()
+    self._thread = Thread(target=self._reconcile_periodically, daemon=True, name='AccountLedger-reconcile')
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def _reconcile_periodically(self):
+    while not self._stop.wait(self.reconcile_interval):
+      try:
+        self.reconcile()
+      except Exception:
+        logging.exception('Failed to reconcile account balances.')
+
+  def reconcile(self):
+    """Replaces the ledger's balances with the balances from REST."""
+    accounts = self.fetch_accounts()
+    now = time.time()
+    with self._lock:
+      for account in accounts:
+        self._accounts[account.currency] = dataclasses.replace(account, updated_at=now)
+        self._account_id_to_currency[account.account_id] = account.currency
+
+  def get_account(self, currency: Text = None, account_id: Text = None) -> Account:
+    """Returns a copy of the Account for a currency (or account_id), raises ValueError if there isn't one."""
+    with self._lock:
+      if account_id is not None:
+        currency = self._account_id_to_currency.get(account_id)
+      account = self._accounts.get(currency)
+      if account is None:
+        raise ValueError('no account for currency: {} account_id: {}.'.format(currency, account_id))
+      return dataclasses.replace(account)
+
+  def get_all_accounts(self) -> list[Account]:
+    with self._lock:
+      return [dataclasses.replace(account) for account in self._accounts.values()]
+
+  def _adjust(self, currency: Text, balance: float = 0.0, hold: float = 0.0, now: float = None):
+    account = self._accounts.get(currency)
+    if account is None:
+      return  # Accounts for new currencies are picked up by the next reconciliation.
+    account.balance += balance
+    account.hold += hold
+    account.available = account.balance - account.hold
+    account.updated_at = now
+
+  def _release_hold(self, order: _TrackedOrder, amount: float, now: float):
+    amount = min(amount, order.hold)
+    order.hold -= amount
+    self._adjust(order.quote_currency if order.side == 'buy' else order.base_currency, hold=-amount, now=now)
+
+  def consume_message(self, message: dict):
+    """Applies a message from the user channel, other messages are ignored."""
+    if not isinstance(message, dict) or not any(field in message for field in _USER_FIELDS):
+      return
+    message_type = message.get('type')
+    if message_type == 'received':
+      self._on_received(message)
+    elif message_type == 'match':
+      self._on_match(message)
+    elif message_type == 'change':
+      self._on_change(message)
+    elif message_type == 'done':
+      with self._lock:
+        order = self._orders.pop(message.get('order_id'), None)
+        if order is not None:
+          self._release_hold(order, order.hold, time.time())
+
+  def _on_received(self, message: dict):
+    product = self.product_info.get_product(message['product_id'])
+    side = message['side']
+    price = float(message['price']) if message.get('price') is not None else None
+    size = float(message['size']) if message.get('size') is not None else None
+    if side == 'buy':
+      if message.get('funds') is not None:
+        hold = float(message['funds'])
+      else:
+        hold = price * size if price is not None and size is not None else 0.0
+    else:
+      hold = size if size is not None else 0.0
+    with self._lock:
+      self._orders[message['order_id']] = _TrackedOrder(product.base_currency, product.quote_currency, side, price,
+                                                        hold)
+      self._adjust(product.quote_currency if side == 'buy' else product.base_currency, hold=hold, now=time.time())
+
+  def _on_match(self, message: dict):
+    # The side of a match message is the maker's side. The user's order is the taker if the message has taker fields,
+    # or the maker if it has maker fields; matches involving neither a user field nor a known order are ignored.
+    if any(field in message for field in _TAKER_FIELDS) or message.get('taker_order_id') in self._orders:
+      order_id, fee_rate = message['taker_order_id'], message.get('taker_fee_rate')
+      side = 'sell' if message['side'] == 'buy' else 'buy'
+    elif any(field in message for field in _MAKER_FIELDS) or message.get('maker_order_id') in self._orders:
+      order_id, fee_rate = message['maker_order_id'], message.get('maker_fee_rate')
+      side = message['side']
+    else:
+      return
+    product = self.product_info.get_product(message['product_id'])
+    size, price = float(message['size']), float(message['price'])
+    value = size * price
+    fee = value * float(fee_rate) if fee_rate is not None else 0.0
+    now = time.time()
+    with self._lock:
+      order = self._orders.get(order_id)
+      if order is not None:
+        if side == 'buy':
+          self._release_hold(order, size * order.price if order.price is not None else value, now)
+        else:
+          self._release_hold(order, size, now)
+      if side == 'buy':
+        self._adjust(product.base_currency, balance=size, now=now)
+        self._adjust(product.quote_currency, balance=-value - fee, now=now)
+      else:
+        self._adjust(product.base_currency, balance=-size, now=now)
+        self._adjust(product.quote_currency, balance=value - fee, now=now)
+
+  def _on_change(self, message: dict):
+    with self._lock:
+      order = self._orders.get(message.get('order_id'))
+      if order is None:
+        return
+      if message.get('new_size') is not None:
+        delta = float(message['new_size']) - float(message['old_size'])
+        if order.side == 'buy':
+          delta *= float(message['price']) if message.get('price') is not None else order.price
+      elif message.get('new_funds') is not None:
+        delta = float(message['new_funds']) - float(message['old_funds'])
+      else:
+        return
+      order.hold += delta
+      self._adjust(order.quote_currency if order.side == 'buy' else order.base_currency, hold=delta, now=time.time())
@@ -0,0 +1,279 @@
+# This file contains an asyncio interface to the (thread-based) exchanges.
+from __future__ import annotations
+
+import asyncio
+
+from collections import deque, OrderedDict
+from threading import Condition, get_ident
+from typing import Callable, Text
+
+from zcoins.exchanges import OrderRequest, OrderReport, OrderSide, Product, TickerTimeFormat
+from zcoins.exchanges import Account
+from zcoins.exchanges.exchange import Exchange, AuthenticatedExchange
+from zcoins.exchanges.ticker_dispatch import OverflowPolicy
+
+
+class AsyncStream:
+  """An async iterator over items put from any thread.
+
+  Items are queued without touching the event loop, the loop is only woken (with a single call_soon_threadsafe) when
+  the consumer is waiting on an empty queue; so a consumer that keeps up costs at most one cross-thread wakeup per
+  batch of items, rather than one per item. Items put from the event loop's own thread wake the consumer directly.
+
+  Must be created on the event loop it is consumed on. Close it (or use it with `async with`) to stop receiving items.
+  """
+
+  def __init__(self, max_queue_size: int = 1000, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+               key: Callable = None, on_close: Callable[[], None] = None):
+    """
+    Args:
+      max_queue_size: The number of items that can be queued.
+      overflow_policy: What happens when the queue is full, see OverflowPolicy. BLOCK only blocks threads other than
+        the event loop's, items put from the event loop when the queue is full replace the oldest item.
+      key: Returns the conflation key of an item, required for OverflowPolicy.CONFLATE.
+      on_close: Called once, when the stream is closed.
+    """
+    if max_queue_size < 1:
+      raise ValueError('max_queue_size must be at least 1.')
+    if overflow_policy is OverflowPolicy.CONFLATE and key is None:
+      raise ValueError('key must be specified to conflate items.')
+    self.max_queue_size = max_queue_size
+    self.overflow_policy = overflow_policy
+    self.key = key
+    self.dropped = 0  # Number of items discarded by DROP_OLDEST or replaced by CONFLATE.
+    self._on_close = on_close
+    self._loop = asyncio.get_running_loop()
+    self._loop_thread_id = get_ident()
+    self._condition = Condition()
+    self._queue = OrderedDict() if overflow_policy is OverflowPolicy.CONFLATE else deque()
+    self._waiter = None  # The future the consumer awaits while the queue is empty.
+    self._wakeup_scheduled = False
+    self._closed = False
+
+  def __len__(self):
+    return len(self._queue)
+
+  def put(self, item):
+    """Queues an item, applying the overflow policy if the queue is full. Can be called from any thread."""
+    on_loop = get_ident() == self._loop_thread_id
+    with self._condition:
+      if self._closed:
+        return
+      if self.overflow_policy is OverflowPolicy.CONFLATE:
+        key = self.key(item)
+        if key in self._queue:
+          self._queue[key] = item
+          self.dropped += 1
+          return
+        if not self._make_room(on_loop):
+          return
+        self._queue[key] = item
+      else:
+        if not self._make_room(on_loop):
+          return
+        self._queue.append(item)
+      if self._waiter is None or self._wakeup_scheduled:
+        return
+      self._wakeup_scheduled = True
+    if on_loop:
+      self._wake()
+    else:
+      self._loop.call_soon_threadsafe(self._wake)
+
+  def _make_room(self, on_loop: bool) -> bool:
+    """Makes room in a full queue, returns False if the stream was closed while waiting for room."""
+    if len(self._queue) < self.max_queue_size:
+      return True
+    if self.overflow_policy is OverflowPolicy.BLOCK and not on_loop:
+      while len(self._queue) >= self.max_queue_size and not self._closed:
+        self._condition.wait()
+      return not self._closed
+    if self.overflow_policy is OverflowPolicy.CONFLATE:
+      self._queue.popitem(last=False)
+    else:
+      self._queue.popleft()
+    self.dropped += 1
+    return True
+
+  def _wake(self):
+    with self._condition:
+      self._wakeup_scheduled = False
+      waiter, self._waiter = self._waiter, None
+    if waiter is not None and not waiter.done():
+      waiter.set_result(None)
+
+  def _pop_all(self, max_items: int = None) -> list:
+    """Pops up to max_items (all if None) queued items, must be called holding self._condition."""
+    count = len(self._queue) if max_items is None else min(max_items, len(self._queue))
+    if self.overflow_policy is OverflowPolicy.CONFLATE:
+      items = [self._queue.popitem(last=False)[1] for _ in range(count)]
+    else:
+      items = [self._queue.popleft() for _ in range(count)]
+    if items:
+      self._condition.notify_all()
+    return items
+
+  async def get_batch(self, max_items: int = None) -> list:
+    """Waits for at least one item, then returns up to max_items (all if None) queued items, in order.
+
+    Raises StopAsyncIteration once the stream is closed.
+    """
+    while True:
+      with self._condition:
+        if self._closed:
+          raise StopAsyncIteration
+        if self._queue:
+          return self._pop_all(max_items)
+        waiter = self._waiter = self._loop.create_future()
+      await waiter
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    return (await self.get_batch(1))[0]
+
+  def close(self):
+    """Stops the stream, discarding queued items. Consumers waiting on the stream stop iterating."""
+    with self._condition:
+      if self._closed:
+        return
+      self._closed = True
+      self._queue.clear()
+      self._condition.notify_all()
+      waiter = self._waiter
+    if self._on_close is not None:
+      self._on_close()  # Before waking the consumer, so it sees the stream fully closed.
+    if waiter is not None:
+      if get_ident() == self._loop_thread_id:
+        self._wake()
+      else:
+        self._loop.call_soon_threadsafe(self._wake)
+
+  async def aclose(self):
+    self.close()
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, exc_type, exc_val, exc_tb):
+    self.close()
+
+
+class AsyncExchange:
+  """An asyncio interface to an Exchange.
+
+  Ticks and order-book updates are delivered as AsyncStreams, fed inline from the thread that receives them (usually
+  the websocket thread), so there is no thread hop before an item is queued. Everything else is forwarded to the
+  wrapped exchange.
+
+  Usage:
+    exchange = AsyncExchange(CoinbaseExchange(product_ids=['BTC-USD'], background_init=True))
+    await exchange.wait_until_ready()
+    async with exchange.ticks() as ticks:
+      async for tick in ticks:
+        ...
+  """
+
+  def __init__(self, exchange: Exchange):
+    self.exchange = exchange
+
+  def __getattr__(self, name):
+    return getattr(self.exchange, name)
+
+  async def wait_until_ready(self):
+    """Waits for an exchange created with background_init to finish initializing."""
+    ready = getattr(self.exchange, 'ready', None)
+    if ready is not None:
+      await asyncio.wrap_future(ready)
+    return self
+
+  def ticks(self, product_matcher: Product = None, time_format: TickerTimeFormat = TickerTimeFormat.DATETIME,
+            max_queue_size: int = 1000, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST) -> AsyncStream:
+    """Returns an AsyncStream of the TickerMessages of products that partially match product_matcher.
+
+    Must be called on the event loop the stream is consumed on. CONFLATE keeps only the latest tick per product.
+    """
+    ticker_id = None
+
+    def remove_ticker_callback():
+      if ticker_id is not None:
+        self.exchange.remove_ticker_callback(ticker_id)
+
+    stream = AsyncStream(max_queue_size=max_queue_size, overflow_policy=overflow_policy,
+                         key=lambda tick: tick.product.product_id, on_close=remove_ticker_callback)
+    ticker_id = self.exchange.add_ticker_callback(lambda exchange, tick: stream.put(tick),
+                                                  product_matcher=product_matcher, time_format=time_format)
+    return stream
+
+  def book_updates(self, product_ids: list[Text] = None, snapshot_depth: int = None, max_queue_size: int = 1000,
+                   overflow_policy: OverflowPolicy = OverflowPolicy.CONFLATE) -> AsyncStream:
+    """Returns an AsyncStream of the order-books of product_ids (all tracked products if None) as they update.
+
+    By default updates are conflated, so the stream holds at most one pending update per product and a slow consumer
+    only sees the latest state.
+
+    Args:
+      snapshot_depth: If set, items are OrderBookSnapshots of the top snapshot_depth levels taken as each update is
+        applied, otherwise items are the SingleProductOrderBooks themselves (read when the item is consumed).
+    """
+    order_books = self.exchange.get_all_order_books()
+    if product_ids is None:
+      product_ids = list(order_books.get_tracked_products())
+    books = [order_books.get_order_book(product_id) for product_id in product_ids]
+    callback_ids = []
+
+    def remove_update_callbacks():
+      for order_book, callback_id in zip(books, callback_ids):
+        order_book.remove_update_callback(callback_id)
+
+    stream = AsyncStream(max_queue_size=max_queue_size, overflow_policy=overflow_policy,
+                         key=lambda order_book: order_book.product_id, on_close=remove_update_callbacks)
+    if snapshot_depth is None:
+      callback = stream.put
+    else:
+      callback = lambda order_book: stream.put(order_book.get_snapshot(top_n=snapshot_depth))
+    callback_ids.extend(order_book.add_update_callback(callback) for order_book in books)
+    return stream
+
+
+class AsyncAuthenticatedExchange(AsyncExchange):
+  """An asyncio interface to an AuthenticatedExchange.
+
+  Requests run on the exchange's order executor, within its request rate limits, so they share the exchange's pooled
+  HTTP session; awaiting them doesn't block the event loop. Accounts are read directly when the exchange keeps them in
+  an account_ledger, since that doesn't make a request.
+  """
+
+  def __init__(self, exchange: AuthenticatedExchange):
+    super().__init__(exchange)
+
+  async def _request(self, function: Callable, *args, **kwargs):
+    return await asyncio.wrap_future(self.exchange._submit_order_request(function, *args, **kwargs))
+
+  async def limit_order(self, product_id: Text, side: OrderSide, price, size) -> OrderReport:
+    return await self._request(self.exchange.limit_order, product_id, side, price=price, size=size)
+
+  async def market_order(self, product_id: Text, side: OrderSide, size=None, funds=None) -> OrderReport:
+    return await self._request(self.exchange.market_order, product_id, side, size=size, funds=funds)
+
+  async def cancel_order(self, order_id: Text, product_id: Text = None):
+    return await self._request(self.exchange.cancel_order, order_id, product_id=product_id)
+
+  async def place_orders(self, orders: list[OrderRequest]) -> list:
+    """Places orders concurrently, returns an OrderReport (or the exception raised placing it) per order."""
+    return await asyncio.gather(*(asyncio.wrap_future(future) for future in self.exchange.place_orders(orders)),
+                                return_exceptions=True)
+
+  def _has_account_ledger(self) -> bool:
+    return getattr(self.exchange, 'account_ledger', None) is not None
+
+  async def get_account(self, currency: Text = None, account_id: Text = None) -> Account:
+    if self._has_account_ledger():
+      return self.exchange.get_account(currency=currency, account_id=account_id)
+    return await self._request(self.exchange.get_account, currency=currency, account_id=account_id)
+
+  async def get_all_accounts(self) -> list[Account]:
+    if self._has_account_ledger():
+      return self.exchange.get_all_accounts()
+    return await self._request(self.exchange.get_all_accounts)
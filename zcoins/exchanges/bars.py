@@ -0,0 +1,228 @@
+# This file contains a streaming aggregator of ticks into OHLCV bars.
+from __future__ import annotations
+
+import logging
+import math
+import time
+import uuid
+
+from collections import deque
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from typing import Callable, Text
+
+from zcoins.exchanges.exchange_data import Product, TickerMessage, TickerTimeFormat
+
+
+@dataclass(slots=True)
+class Bar:
+  product_id: Text
+  interval: float  # The length of the bar, in seconds.
+  start: float  # Seconds since the epoch, a multiple of interval.
+  open: float
+  high: float
+  low: float
+  close: float
+  volume: float = 0.0  # In base_currency.
+  notional: float = 0.0  # Sum of price * size, in quote_currency.
+  trade_count: int = 0
+
+  @property
+  def end(self) -> float:
+    return self.start + self.interval
+
+  @property
+  def vwap(self) -> float:
+    return self.notional / self.volume if self.volume else self.close
+
+  def merge(self, other: Bar):
+    """Extends this bar with a later bar."""
+    self.high = max(self.high, other.high)
+    self.low = min(self.low, other.low)
+    self.close = other.close
+    self.volume += other.volume
+    self.notional += other.notional
+    self.trade_count += other.trade_count
+
+
+class _ProductBars:
+  __slots__ = ['current', 'rollups', 'history']
+
+  def __init__(self, n_intervals: int, history_size: int):
+    self.current = None  # The in-progress bar of the base interval.
+    self.rollups = [None] * (n_intervals - 1)  # The in-progress bars of the coarser intervals.
+    self.history = [deque(maxlen=history_size) for _ in range(n_intervals)]  # Closed bars, per interval.
+
+
+class BarAggregator:
+  """Aggregates ticks into OHLCV bars of several intervals, for many products.
+
+  Ticks only update the in-progress bar of the smallest (base) interval, when a base bar closes it is rolled up into
+  the bars of the coarser intervals. So the cost of a tick doesn't depend on the number of intervals. Every interval
+  must be a multiple of the base interval.
+
+  Bars close when the first tick of a later bar arrives, or when flush() is called after the bar's end (start() calls
+  it periodically). Intervals without ticks produce no bars.
+
+  Usage:
+    aggregator = BarAggregator(exchange, intervals=(1, 60, 300))
+    aggregator.subscribe(lambda bar: print(bar), interval=60)
+    aggregator.start()
+  """
+
+  def __init__(self, exchange=None, intervals: tuple = (1, 60, 300), history_size: int = 1000,
+               product_matcher: Product = None):
+    """
+    Args:
+      exchange: The Exchange to aggregate ticks from, if None ticks must be passed to add_tick.
+      intervals: The bar intervals, in seconds.
+      history_size: The number of closed bars kept per product and interval.
+      product_matcher: Only ticks of products partially matching this Product are aggregated, None matches all products.
+    """
+    self.intervals = tuple(sorted(set(intervals)))
+    base = self.intervals[0]
+    if base <= 0 or any(not math.isclose(interval / base, round(interval / base)) for interval in self.intervals):
+      raise ValueError('intervals must be positive multiples of the smallest interval.')
+    self.history_size = history_size
+    self.exchange = exchange
+    self._products = {}
+    self._subscribers = {}  # id -> (callback, interval, product_id)
+    self._lock = Lock()
+    self._stop = Event()
+    self._thread = None
+    self._ticker_id = None
+    if exchange is not None:
+      self._ticker_id = exchange.add_ticker_callback(self._on_tick, product_matcher=product_matcher,
+                                                     time_format=TickerTimeFormat.EPOCH)
+
+  def subscribe(self, callback: Callable[[Bar], None], interval: float = None, product_id: Text = None) -> Text:
+    """Calls callback with every closed bar of interval (all intervals if None) and product_id (all if None)."""
+    subscription_id = str(uuid.uuid4())
+    self._subscribers[subscription_id] = (callback, interval, product_id)
+    return subscription_id
+
+  def unsubscribe(self, subscription_id: Text):
+    self._subscribers.pop(subscription_id, None)
+
+  def _on_tick(self, exchange, ticker_message: TickerMessage):
+    self.add_tick(ticker_message.product.product_id, ticker_message.epoch_time, ticker_message.price,
+                  ticker_message.last_size)
+
+  def add_tick(self, product_id: Text, epoch_time: float, price: float, size: float):
+    closed = []
+    with self._lock:
+      bars = self._products.get(product_id)
+      if bars is None:
+        bars = self._products[product_id] = _ProductBars(len(self.intervals), self.history_size)
+      current = bars.current
+      if current is None or epoch_time >= current.end:
+        if current is not None:
+          self._close_base_bar(bars, closed)
+        base = self.intervals[0]
+        current = bars.current = Bar(product_id, base, epoch_time - epoch_time % base, price, price, price, price)
+      elif price > current.high:
+        current.high = price
+      elif price < current.low:
+        current.low = price
+      current.close = price
+      current.volume += size
+      current.notional += price * size
+      current.trade_count += 1
+    if closed:
+      self._publish(closed)
+
+  def _close_base_bar(self, bars: _ProductBars, closed: list):
+    base_bar, bars.current = bars.current, None
+    bars.history[0].append(base_bar)
+    closed.append(base_bar)
+    for idx, interval in enumerate(self.intervals[1:]):
+      rollup = bars.rollups[idx]
+      if rollup is not None and base_bar.start >= rollup.end:
+        self._close_rollup(bars, idx, closed)
+        rollup = None
+      if rollup is None:
+        rollup = bars.rollups[idx] = Bar(base_bar.product_id, interval, base_bar.start - base_bar.start % interval,
+                                         base_bar.open, base_bar.high, base_bar.low, base_bar.close, base_bar.volume,
+                                         base_bar.notional, base_bar.trade_count)
+      else:
+        rollup.merge(base_bar)
+      if base_bar.end >= rollup.end:
+        self._close_rollup(bars, idx, closed)
+
+  @staticmethod
+  def _close_rollup(bars: _ProductBars, idx: int, closed: list):
+    rollup, bars.rollups[idx] = bars.rollups[idx], None
+    bars.history[idx + 1].append(rollup)
+    closed.append(rollup)
+
+  def flush(self, now: float):
+    """Closes the bars (of all products) that ended at or before now."""
+    closed = []
+    with self._lock:
+      for bars in self._products.values():
+        if bars.current is not None and now >= bars.current.end:
+          self._close_base_bar(bars, closed)
+        for idx, rollup in enumerate(bars.rollups):
+          if rollup is not None and now >= rollup.end:
+            self._close_rollup(bars, idx, closed)
+    if closed:
+      self._publish(closed)
+
+  def _publish(self, closed: list[Bar]):
+    for bar in closed:
+      for callback, interval, product_id in list(self._subscribers.values()):
+        if (interval is None or interval == bar.interval) and (product_id is None or product_id == bar.product_id):
+          try:
+            callback(bar)
+          except Exception:
+            logging.exception('Bar subscriber raised an exception.')
+
+  def get_bars(self, product_id: Text, interval: float, n: int = None) -> list[Bar]:
+    """Returns the last n (all retained if None) closed bars of product_id and interval, oldest first."""
+    history = self._products[product_id].history[self.intervals.index(interval)] \
+      if product_id in self._products else ()
+    bars = list(history)
+    return bars if n is None else bars[-n:]
+
+  def get_current_bar(self, product_id: Text, interval: float) -> Bar:
+    """Returns the in-progress bar of product_id and interval, None if there isn't one.
+
+    The in-progress bars of coarser intervals don't include the in-progress base bar.
+    """
+    bars = self._products.get(product_id)
+    if bars is None:
+      return None
+    idx = self.intervals.index(interval)
+    return bars.current if idx == 0 else bars.rollups[idx - 1]
+
+  def start(self, clock: Callable[[], float] = None, delay: float = 0.0):
+    """Starts calling flush every base interval on a background thread, so bars close even when ticks stop.
+
+    Args:
+      clock: Returns the current time in seconds since the epoch, defaults to time.time.
+      delay: Bars are flushed this many seconds after they end, to allow for late ticks.
+    """
+    if self._thread is not None:
+      return
+    clock = clock or time.time
+    self._stop.clear()
+
+    def flush_periodically():
+      while not self._stop.wait(self.intervals[0]):
+        self.flush(clock() - delay)
+
+    self._thread = Thread(target=flush_periodically, daemon=True, name='BarAggregator-flush')
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def close(self):
+    """Stops aggregating ticks from the exchange."""
+    self.stop()
+    if self._ticker_id is not None:
+      self.exchange.remove_ticker_callback(self._ticker_id)
+      self._ticker_id = None
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import sys
+import time
+import uuid
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Text, Callable, Union
+
+from zcoins.exchanges import ExchangeProductInfo, Exchange, AuthenticatedExchange
+from .exchange_data import OrderSide, TickerMessage, TickerTimeFormat, Product
+from .metrics import callback_name
+from .ticker_router import TickerCallbackRouter
+
+
+class BinanceExchangeProductInfo(ExchangeProductInfo):
+  def __init__(self, client):
+    """Looks up (and caches) Binance symbol metadata.
+
+    Args:
+      client: A binance.Client (or stand-in, like zcoins.feeds.LocalBinanceClient).
+    """
+    self.client = client
+    self.has_requested_all_products = False
+    self.product_cache = {}
+    self._product_lock = Lock()
+
+  @classmethod
+  def make_product_id(cls, base_currency: Text, quote_currency: Text) -> Text:
+    return '{}{}'.format(base_currency, quote_currency)
+
+  @staticmethod
+  def _make_product_from_json(json_message: dict) -> Product:
+    return Product(product_id=sys.intern(json_message['symbol']), quote_currency=sys.intern(json_message['quoteAsset']),
+                   base_currency=sys.intern(json_message['baseAsset']))
+
+  def get_product(self, product_id: Text) -> Product:
+    product = self.product_cache.get(product_id)
+    if product is not None:
+      return product
+    symbol = self.client.get_symbol_info(product_id)
+    if symbol is None:
+      raise ValueError('{} is not a Binance symbol.'.format(product_id))
+    product = self.product_cache[product_id] = BinanceExchangeProductInfo._make_product_from_json(symbol)
+    return product
+
+  def get_products(self, product_ids: list[Text]) -> list[Product]:
+    """Returns the Products for product_ids, requesting all symbols at once if more than one is missing."""
+    if sum(product_id not in self.product_cache for product_id in product_ids) > 1:
+      self.get_all_products()
+    return [self.get_product(product_id) for product_id in product_ids]
+
+  def get_all_products(self) -> list[Product]:
+    """Requests all symbols from the REST client, the result is cached after the first call."""
+    with self._product_lock:
+      if not self.has_requested_all_products:
+        self.product_cache.update((symbol['symbol'], BinanceExchangeProductInfo._make_product_from_json(symbol))
+                                  for symbol in self.client.get_exchange_info()['symbols'])
+        self.has_requested_all_products = True
+    return list(self.product_cache.values())
+
+  def clear_cache(self):
+    with self._product_lock:
+      self.has_requested_all_products = False
+      self.product_cache.clear()
+
+
+class BinanceExchange(BinanceExchangeProductInfo, Exchange):
+  def __init__(self, product_ids: list[Text] = None, client=None, websocket_manager=None, depth: int = 20,
+               api_key: Text = None, api_secret: Text = None):
+    """Initializes the BinanceExchange.
+
+    client and websocket_manager default to a new binance.Client and ThreadedWebsocketManager, they can be replaced
+    with stand-ins such as zcoins.feeds.LocalBinanceClient and LocalBinanceWebsocketManager to drive the exchange
+    without a network connection.
+
+    Ticker messages are built from each symbol's trade stream, with best_bid and best_ask taken from its order-book. A
+    symbol's trade stream only runs while a ticker callback matches it.
+
+    Args:
+      product_ids: The symbols (e.g. 'BTCUSDT') to track.
+      depth: The number of levels of each side of the order-books, see BinanceMultiProductOrderBook.
+    """
+    from zcoins.order_books.binance_order_book import BinanceMultiProductOrderBook
+    if client is None or websocket_manager is None:
+      import binance  # python-binance is only needed when connecting to Binance.
+      if client is None:
+        client = binance.Client(api_key, api_secret)
+      if websocket_manager is None:
+        websocket_manager = binance.ThreadedWebsocketManager(api_key=api_key, api_secret=api_secret)
+        websocket_manager.start()
+    self.websocket_manager = websocket_manager
+    self.ticker_callbacks = {}
+    self._ticker_router = TickerCallbackRouter()
+    self._trade_streams = {}  # product_id -> trade stream name, of the tracked products that have ticker callbacks.
+    self._trade_stream_lock = Lock()
+    BinanceExchangeProductInfo.__init__(self, client)
+    Exchange.__init__(self, 'Binance',
+                      BinanceMultiProductOrderBook(self, websocket_manager=websocket_manager,
+                                                   product_ids=product_ids if product_ids is not None else [],
+                                                   depth=depth))
+
+  def add_ticker_callback(self,
+                          callback: Callable[[Union[Exchange, AuthenticatedExchange], TickerMessage], None],
+                          product_matcher: Product = None,
+                          time_format: TickerTimeFormat = TickerTimeFormat.DATETIME) -> Text:
+    """Adds a ticker callback, called with each trade of the tracked symbols that partially match product_matcher."""
+    ticker_id = str(uuid.uuid4())
+    ticker_callback = Exchange._TickerCallback(callback=callback, product_matcher=product_matcher,
+                                               time_format=time_format, ticker_id=ticker_id)
+    self.ticker_callbacks[ticker_id] = ticker_callback
+    self._ticker_router.add(ticker_id, ticker_callback)
+    self._update_trade_streams()
+    return ticker_id
+
+  def _update_trade_streams(self):
+    """Starts the trade streams of tracked products that ticker callbacks match, and stops those no callback matches."""
+    with self._trade_stream_lock:
+      for product_id in list(self.order_books.get_tracked_products()):
+        has_callbacks = bool(self._ticker_router.get_route(self.get_product(product_id)).callbacks)
+        if has_callbacks and product_id not in self._trade_streams:
+          self._trade_streams[product_id] = self.websocket_manager.start_trade_socket(
+            callback=self._call_ticker_callbacks, symbol=product_id)
+        elif not has_callbacks and product_id in self._trade_streams:
+          self.websocket_manager.stop_socket(self._trade_streams.pop(product_id))
+
+  def add_order_book(self, product_id: Text):
+    order_book = super().add_order_book(product_id)
+    if self.ticker_callbacks:
+      self._update_trade_streams()
+    return order_book
+
+  def remove_order_books(self, product_ids: list[Text]):
+    removed = super().remove_order_books(product_ids)
+    with self._trade_stream_lock:
+      for order_book in removed:
+        stream = self._trade_streams.pop(order_book.product_id, None)
+        if stream is not None:
+          self.websocket_manager.stop_socket(stream)
+    return removed
+
+  def remove_ticker_callback(self, ticker_id: Text):
+    self._ticker_router.remove(ticker_id)
+    self.ticker_callbacks.pop(ticker_id, None)
+    self._update_trade_streams()
+
+  def _make_ticker_message(self, raw_trade_message: dict, product: Product, order_book,
+                           time_formats: frozenset) -> TickerMessage:
+    epoch_time = raw_trade_message['T'] / 1000
+    best_bid, best_ask = order_book.get_best_bid(), order_book.get_best_ask()
+    return TickerMessage(product=product,
+                         time=datetime.fromtimestamp(epoch_time, timezone.utc)
+                         if TickerTimeFormat.DATETIME in time_formats else None,
+                         # The buyer is the maker when the trade was a sell into the bids.
+                         order_side=OrderSide.SELL if raw_trade_message['m'] else OrderSide.BUY,
+                         last_size=float(raw_trade_message['q']),
+                         price=float(raw_trade_message['p']),
+                         best_bid=best_bid[0] if best_bid else None,
+                         best_ask=best_ask[0] if best_ask else None,
+                         epoch_time=epoch_time if TickerTimeFormat.EPOCH in time_formats else None)
+
+  def _call_ticker_callbacks(self, raw_trade_message: dict):
+    if raw_trade_message.get('e') != 'trade':
+      return  # Errors are reported on the same callback.
+    product_id = raw_trade_message['s']
+    order_book = self.order_books.find_order_book(product_id)
+    if order_book is None:  # The order-book was removed (or evicted), so its trade stream is no longer needed.
+      stream = self._trade_streams.pop(product_id, None)
+      if stream is not None:
+        self.websocket_manager.stop_socket(stream)
+      return
+    metrics = self._metrics
+    if metrics is not None:
+      return self._call_ticker_callbacks_with_metrics(raw_trade_message, order_book, metrics)
+    product = self.get_product(product_id)
+    route = self._ticker_router.get_route(product)
+    if not route.callbacks:
+      return
+    ticker_message = self._make_ticker_message(raw_trade_message, product, order_book, route.time_formats)
+    for callback in route.callbacks:
+      callback.dispatch(self, ticker_message)
+
+  def _call_ticker_callbacks_with_metrics(self, raw_trade_message: dict, order_book, metrics):
+    """Same as _call_ticker_callbacks, but records the lag (from the trade time), decode time and callback times."""
+    receive_time = time.time()
+    product = self.get_product(raw_trade_message['s'])
+    route = self._ticker_router.get_route(product)
+    decode_start = time.perf_counter()
+    ticker_message = self._make_ticker_message(raw_trade_message, product, order_book, route.time_formats) \
+        if route.callbacks else None
+    decode_time = time.perf_counter() - decode_start if route.callbacks else None
+    metrics.record_message(product.product_id, lag=receive_time - raw_trade_message['T'] / 1000,
+                           decode_time=decode_time)
+    for callback in route.callbacks:
+      if callback.mailbox is not None:
+        callback.dispatch(self, ticker_message)
+        continue
+      start = time.perf_counter()
+      try:
+        callback.dispatch(self, ticker_message)
+      except Exception:
+        metrics.record_callback(callback.ticker_id, callback_name(callback.callback), time.perf_counter() - start,
+                                error=True)
+        raise
+      metrics.record_callback(callback.ticker_id, callback_name(callback.callback), time.perf_counter() - start)
@@ -0,0 +1,77 @@
+# This file contains fast decoders for the fields of Coinbase websocket messages.
+from __future__ import annotations
+
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Text
+
+from dateutil import parser
+
+from .exchange_data import OrderSide
+
+# Coinbase sends lower-case sides, this avoids an upper() and an Enum lookup per message.
+ORDER_SIDES = {side.value: side for side in OrderSide}
+
+
+def decode_order_side(side: Text) -> OrderSide:
+  order_side = ORDER_SIDES.get(side)
+  if order_side is None:
+    return OrderSide[side.upper()]
+  return order_side
+
+
+def _split_time(text: Text):
+  """Splits a timestamp in Coinbase's format (2021-03-01T12:34:56.123456Z) into its integer fields.
+
+  Returns None if the timestamp is in any other format.
+  """
+  if len(text) < 20 or text[-1] != 'Z' or text[4] != '-' or text[7] != '-' or text[10] != 'T' or text[13] != ':' \
+      or text[16] != ':':
+    return None
+  try:
+    microsecond = 0
+    if len(text) > 20:
+      if text[19] != '.':
+        return None
+      fraction = text[20:-1]
+      if not fraction.isdigit():
+        return None
+      microsecond = int(fraction[:6].ljust(6, '0'))
+    return int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]), int(text[17:19]), \
+        microsecond
+  except ValueError:
+    return None
+
+
+def decode_time(text: Text) -> datetime:
+  """Decodes a Coinbase timestamp into a timezone-aware datetime, falling back to dateutil for unusual formats."""
+  fields = _split_time(text)
+  if fields is None:
+    return parser.parse(text)
+  try:
+    return datetime(*fields, tzinfo=timezone.utc)
+  except ValueError:
+    return parser.parse(text)
+
+
+@lru_cache(maxsize=16)
+def _midnight_epoch(year: int, month: int, day: int) -> int:
+  """Returns the epoch time of midnight UTC on a date, None if the date doesn't exist (e.g. February 30th)."""
+  try:
+    datetime(year, month, day)
+  except ValueError:
+    return None
+  return timegm((year, month, day, 0, 0, 0))
+
+
+def decode_epoch(text: Text) -> float:
+  """Decodes a Coinbase timestamp into seconds since the epoch, without building a datetime."""
+  fields = _split_time(text)
+  if fields is None or fields[3] > 23 or fields[4] > 59 or fields[5] > 60:
+    return parser.parse(text).timestamp()
+  year, month, day, hour, minute, second, microsecond = fields
+  midnight = _midnight_epoch(year, month, day)
+  if midnight is None:
+    return parser.parse(text).timestamp()  # Raises for dates that don't exist, as decode_time does.
+  return midnight + hour * 3600 + minute * 60 + second + microsecond / 1e6
@@ -1,23 +1,76 @@
 from __future__ import annotations
 
-from dateutil import parser
+import asyncio
+import json
+import os
+import sys
+import time
 import uuid
 
-from threading import Event
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
 from typing import Text, Callable, Union
 from zcoinbase import PublicClient, AuthenticatedClient, CoinbaseWebsocket
 from zcoinbase import OrderSide as CoinbaseOrderSide
 
 from zcoins.order_books import CoinbaseMultiProductOrderBook
 from zcoins.exchanges import ExchangeProductInfo, Exchange, AuthenticatedExchange, Account
-from .exchange_data import OrderSide, OrderReport, OrderType, TickerMessage, Product
+from .account_ledger import AccountLedger
+from .coinbase_decoding import decode_epoch, decode_order_side, decode_time
+from .exchange_data import OrderSide, OrderReport, OrderType, TickerMessage, TickerTimeFormat, Product
+from .metrics import callback_name
+from .ticker_dispatch import DispatchMode, OverflowPolicy, TickerMailbox
+from .ticker_router import TickerCallbackRouter
+
+_DATETIME_ONLY = frozenset([TickerTimeFormat.DATETIME])
+DEFAULT_PRODUCT_CACHE_TTL = 24 * 60 * 60  # Products are rarely listed or delisted, so a day old list is fine.
+
+
+class CoinbaseRequestError(RuntimeError):
+  """Raised when Coinbase rejects a request, e.g. an order with insufficient funds."""
+
+  def __init__(self, http_code: int, message: Text):
+    super().__init__('Coinbase request failed, ErrorCode: {} Message: {}'.format(http_code, message))
+    self.http_code = http_code
+    self.message = message
+
+
+def _check_response(json_response, required_key: Text = None):
+  """Raises CoinbaseRequestError if json_response is an error, zcoinbase returns error bodies instead of raising.
+
+  Args:
+    json_response: The response, zcoinbase adds the http_code to responses that are dicts.
+    required_key: A key every successful response has, e.g. 'id' for orders.
+  """
+  if isinstance(json_response, dict):
+    http_code = json_response.get('http_code')
+    if ((http_code is not None and not 200 <= http_code < 300) or 'message' in json_response or
+        (required_key is not None and required_key not in json_response)):
+      raise CoinbaseRequestError(http_code, json_response.get('message'))
+  return json_response
 
 
 class CoinbaseExchangeProductInfo(ExchangeProductInfo):
-  def __init__(self, client: PublicClient):
+  def __init__(self, client: PublicClient, product_cache_path: Text = None,
+               product_cache_ttl: float = DEFAULT_PRODUCT_CACHE_TTL):
+    """Looks up (and caches) Coinbase product metadata.
+
+    Args:
+      client: The REST client products are requested from.
+      product_cache_path: If set, the product list is also cached in this json file, so it doesn't need to be requested
+        again on restart.
+      product_cache_ttl: The number of seconds the file at product_cache_path is used for before being refreshed.
+    """
     self.client = client
+    self.product_cache_path = product_cache_path
+    self.product_cache_ttl = product_cache_ttl
     self.has_requested_all_products = Event()
     self.product_cache = {}
+    self._product_lock = Lock()  # Guards _product_requests.
+    self._product_requests = {}  # product_id -> Future, for product requests that are in-flight.
+    self._all_products_lock = Lock()  # Held while requesting the product list.
+    if product_cache_path is not None:
+      self._load_product_cache_file()
 
   @classmethod
   def make_from_url(cls, rest_url: Text = PublicClient.PROD_URL) -> CoinbaseExchangeProductInfo:
@@ -29,8 +82,9 @@ class CoinbaseExchangeProductInfo(ExchangeProductInfo):
 
   @staticmethod
   def _make_product_from_json(json_message: dict) -> Product:
-    return Product(product_id=json_message['id'], quote_currency=json_message['quote_currency'],
-                   base_currency=json_message['base_currency'])
+    # Interning keeps a single copy of each id, however many order-books, indexes and snapshots refer to it.
+    return Product(product_id=sys.intern(json_message['id']), quote_currency=sys.intern(json_message['quote_currency']),
+                   base_currency=sys.intern(json_message['base_currency']))
 
   def product_matches(self, product_id: Text, product: Product, full_match=False):
     if full_match:
@@ -40,124 +94,390 @@ class CoinbaseExchangeProductInfo(ExchangeProductInfo):
 
   def get_product(self, product_id: Text) -> Product:
     # Get the product from the cache if we have already looked it up.
-    if product_id in self.product_cache:
-      return self.product_cache[product_id]
-    # Populate the cache with the lookup value if we haven't already.
-    product = CoinbaseExchangeProductInfo._make_product_from_json(self.client.get_product(product_id))
-    self.product_cache[product_id] = product
+    product = self.product_cache.get(product_id)
+    if product is not None:
+      return product
+    # Otherwise, request it, unless another thread is already requesting it, in which case wait for that request.
+    with self._product_lock:
+      product = self.product_cache.get(product_id)
+      if product is not None:
+        return product
+      request = self._product_requests.get(product_id)
+      is_requester = request is None
+      if is_requester:
+        request = self._product_requests[product_id] = Future()
+    if not is_requester:
+      return request.result()
+    try:
+      product = CoinbaseExchangeProductInfo._make_product_from_json(self.client.get_product(product_id))
+    except Exception as e:
+      with self._product_lock:
+        del self._product_requests[product_id]
+      request.set_exception(e)
+      raise
+    with self._product_lock:
+      self.product_cache[product_id] = product
+      del self._product_requests[product_id]
+    request.set_result(product)
     return product
 
+  def get_products(self, product_ids: list[Text]) -> list[Product]:
+    """Returns the Products for product_ids, requesting the whole product list at once if more than one is missing."""
+    missing = [product_id for product_id in product_ids if product_id not in self.product_cache]
+    if len(missing) > 1:
+      self.load_all_products()
+    return [self.get_product(product_id) for product_id in product_ids]
+
+  def load_all_products(self, force: bool = False):
+    """Populates the cache with a single request for all products, does nothing if that's already been done.
+
+    Args:
+      force: Request the product list even if it has already been requested.
+    """
+    with self._all_products_lock:
+      if self.has_requested_all_products.is_set() and not force:
+        return
+      products = self.client.get_products()
+      self._cache_products(products)
+      if self.product_cache_path is not None:
+        self._write_product_cache_file(products)
+
+  def _cache_products(self, products: list[dict]):
+    self.product_cache.update((product['id'], CoinbaseExchangeProductInfo._make_product_from_json(product))
+                              for product in products)
+    self.has_requested_all_products.set()
+
+  def _load_product_cache_file(self):
+    """Populates the cache from product_cache_path, if it exists and is younger than product_cache_ttl."""
+    try:
+      with open(self.product_cache_path) as f:
+        cached = json.load(f)
+    except (OSError, ValueError):
+      return
+    if time.time() - cached.get('time', 0) < self.product_cache_ttl:
+      self._cache_products(cached['products'])
+
+  def _write_product_cache_file(self, products: list[dict]):
+    # Write to a temporary file first, so a concurrent reader never sees a partial file.
+    temp_path = '{}.{}.tmp'.format(self.product_cache_path, os.getpid())
+    with open(temp_path, 'w') as f:
+      json.dump({'time': time.time(), 'products': products}, f)
+    os.replace(temp_path, self.product_cache_path)
+
   def get_all_products(self) -> list[Product]:
-    """Requests all products from REST client."""
-    if not self.has_requested_all_products.is_set():
-      self.has_requested_all_products.set()
-      products = []
-      for product in self.client.get_products():
-        self.product_cache[product['product_id']] = CoinbaseExchangeProductInfo._make_product_from_json(product)
-        products.append(product)
-      return products
-    else:
-      return list(self.product_cache.values())
+    """Requests all products from REST client, the result is cached after the first call."""
+    self.load_all_products()
+    return list(self.product_cache.values())
 
   def clear_cache(self):
-    self.has_requested_all_products.clear()
-    self.product_cache.clear()
+    with self._all_products_lock:
+      self.has_requested_all_products.clear()
+      self.product_cache.clear()
 
 
 class CoinbaseExchange(CoinbaseExchangeProductInfo, Exchange):
   def __init__(self, product_ids: list[Text] = None,
                rest_url: Text = PublicClient.PROD_URL,
-               websocket_addr: Text = CoinbaseWebsocket.PROD_ADDRESS):
+               websocket_addr: Text = CoinbaseWebsocket.PROD_ADDRESS,
+               array_backed_order_books: bool = False,
+               websocket: CoinbaseWebsocket = None,
+               client: PublicClient = None,
+               max_book_depth: int = None,
+               product_cache_path: Text = None,
+               product_cache_ttl: float = DEFAULT_PRODUCT_CACHE_TTL,
+               background_init: bool = False):
+    """Initializes the CoinbaseExchange.
+
+    websocket and client default to a new CoinbaseWebsocket and PublicClient, they can be replaced with stand-ins such
+    as zcoins.feeds.FeedReplayer and LocalPublicClient to drive the exchange without a network connection.
+
+    product_cache_path and product_cache_ttl control the on-disk product cache, see CoinbaseExchangeProductInfo.
+
+    max_book_depth caps the number of levels each order-book keeps, see CoinbaseMultiProductOrderBook.
+
+    Initialization waits for the websocket to open and looks up product metadata concurrently. If background_init is
+    True, that happens on a background thread and the constructor returns immediately; the exchange can't be used
+    until self.ready (a concurrent.futures.Future, resolving to the exchange) is done, see wait_until_ready. Asyncio
+    code can await asyncio.wrap_future(exchange.ready).
+    """
+    self.ready = Future()
     self.ticker_callbacks = {}  # This will contain all ticker callbacks by their id.
-    if not hasattr(self, 'client'):
+    self._ticker_router = TickerCallbackRouter()  # Indexes ticker_callbacks by the products they match.
+    self._ticker_executor = None  # Shared by THREAD_POOL ticker callbacks, created on first use.
+    self._ticker_executor_lock = Lock()
+    if client is not None:
+      self.client = client
+    elif not hasattr(self, 'client'):
       self.client = PublicClient(rest_url=rest_url)
-    if not hasattr(self, 'websocket'):
+    if websocket is not None:
+      self.websocket = websocket
+    elif not hasattr(self, 'websocket'):
       self.websocket = CoinbaseWebsocket(websocket_addr=websocket_addr)
     self.websocket.add_channel_function('ticker', lambda msg: self._call_ticker_callbacks(msg))
-    CoinbaseExchangeProductInfo.__init__(self, client=self.client)
+    CoinbaseExchangeProductInfo.__init__(self, client=self.client, product_cache_path=product_cache_path,
+                                         product_cache_ttl=product_cache_ttl)
     if product_ids is None:
       product_ids = []
-    Exchange.__init__(self, 'Coinbase',
-                      CoinbaseMultiProductOrderBook(self, websocket=self.websocket, product_ids=product_ids))
+    Exchange.__init__(self, 'Coinbase', None)  # The order-books are created by _initialize.
+    if background_init:
+      Thread(target=self._initialize, args=(product_ids, array_backed_order_books, max_book_depth),
+             name='{}-init'.format(type(self).__name__), daemon=True).start()
+    else:
+      self._initialize(product_ids, array_backed_order_books, max_book_depth)
+      self.ready.result()  # Raises any error from initialization.
+
+  def _get_init_steps(self, product_ids: list[Text]) -> list[Callable]:
+    """Returns the (independent) initialization steps that are run concurrently before the order-books are created."""
+    return [self.websocket.wait_for_open, lambda: self.get_products(product_ids)]
+
+  def _finish_init(self):
+    """Called once the order-books have been created, before the exchange is ready."""
+
+  def _initialize(self, product_ids: list[Text], array_backed_order_books: bool, max_book_depth: int = None):
+    try:
+      steps = self._get_init_steps(product_ids)
+      with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix='{}-init'.format(type(self).__name__)) \
+          as executor:
+        for future in [executor.submit(step) for step in steps]:
+          future.result()
+      self.order_books = CoinbaseMultiProductOrderBook(self, websocket=self.websocket, product_ids=product_ids,
+                                                       array_backed=array_backed_order_books,
+                                                       max_depth=max_book_depth)
+      self._finish_init()
+    except BaseException as e:
+      self.ready.set_exception(e)
+    else:
+      self.ready.set_result(self)
+
+  def wait_until_ready(self, timeout: float = None):
+    """Blocks until initialization has finished, returns the exchange or raises the error that initialization raised."""
+    return self.ready.result(timeout)
 
   def add_ticker_callback(self,
                           callback: Callable[[Union[Exchange, AuthenticatedExchange], TickerMessage], None],
-                          product_matcher: Product = None) -> Text:
+                          product_matcher: Product = None,
+                          time_format: TickerTimeFormat = TickerTimeFormat.DATETIME,
+                          dispatch_mode: DispatchMode = DispatchMode.INLINE,
+                          max_queue_size: int = 1000,
+                          overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+                          event_loop: asyncio.AbstractEventLoop = None) -> Text:
+    """Adds a ticker callback.
+
+    Args:
+      callback: Called with this exchange and each TickerMessage matching product_matcher.
+      product_matcher: Only products partially matching this Product are delivered, None matches all products.
+      time_format: Controls which time field of the TickerMessage is populated.
+      dispatch_mode: INLINE runs the callback on the websocket thread, THREAD_POOL and ASYNCIO run it off the websocket
+        thread, fed by a queue of at most max_queue_size messages. Either way the callback sees the ticks of each
+        product in order.
+      max_queue_size: The size of the queue used by THREAD_POOL and ASYNCIO callbacks.
+      overflow_policy: What to do when the queue of a THREAD_POOL or ASYNCIO callback is full.
+      event_loop: The loop ASYNCIO callbacks run on, defaults to the running loop.
+    """
     ticker_id = str(uuid.uuid4())
-    self.ticker_callbacks[ticker_id] = Exchange._TickerCallback(callback=callback,
-                                                                product_matcher=product_matcher)
+    mailbox = None
+    if dispatch_mode is DispatchMode.THREAD_POOL:
+      mailbox = TickerMailbox(callback, max_queue_size=max_queue_size, overflow_policy=overflow_policy,
+                              executor=self._get_ticker_executor(), ticker_id=ticker_id)
+    elif dispatch_mode is DispatchMode.ASYNCIO:
+      mailbox = TickerMailbox(callback, max_queue_size=max_queue_size, overflow_policy=overflow_policy,
+                              event_loop=event_loop if event_loop else asyncio.get_running_loop(), ticker_id=ticker_id)
+    ticker_callback = Exchange._TickerCallback(callback=callback, product_matcher=product_matcher,
+                                               time_format=time_format, mailbox=mailbox, ticker_id=ticker_id)
+    self.ticker_callbacks[ticker_id] = ticker_callback
+    self._ticker_router.add(ticker_id, ticker_callback)
     return ticker_id
 
   def remove_ticker_callback(self, ticker_id: Text):
-    if ticker_id in self.ticker_callbacks:
-      del self.ticker_callbacks[ticker_id]
+    self._ticker_router.remove(ticker_id)
+    ticker_callback = self.ticker_callbacks.pop(ticker_id, None)
+    if ticker_callback and ticker_callback.mailbox:
+      ticker_callback.mailbox.close()
 
   def remove_all_ticker_callbacks(self):
+    self._ticker_router.clear()
+    for ticker_callback in self.ticker_callbacks.values():
+      if ticker_callback.mailbox:
+        ticker_callback.mailbox.close()
     self.ticker_callbacks.clear()
 
-  def _make_ticker_message(self, raw_ticker_message: dict) -> TickerMessage:
-    return TickerMessage(product=self.get_product(raw_ticker_message['product_id']),
-                         time=parser.parse(raw_ticker_message['time']),
-                         order_side=OrderSide[raw_ticker_message['side'].upper()],
+  def _get_ticker_executor(self) -> ThreadPoolExecutor:
+    with self._ticker_executor_lock:
+      if self._ticker_executor is None:
+        self._ticker_executor = ThreadPoolExecutor(thread_name_prefix='{}-ticker'.format(type(self).__name__))
+      return self._ticker_executor
+
+  def _make_ticker_message(self, raw_ticker_message: dict, product: Product = None,
+                           time_formats: frozenset = _DATETIME_ONLY) -> TickerMessage:
+    """Decodes a raw ticker message, only the time fields in time_formats are decoded."""
+    if product is None:
+      product = self.get_product(raw_ticker_message['product_id'])
+    raw_time = raw_ticker_message['time']
+    return TickerMessage(product=product,
+                         time=decode_time(raw_time) if TickerTimeFormat.DATETIME in time_formats else None,
+                         order_side=decode_order_side(raw_ticker_message['side']),
                          last_size=float(raw_ticker_message['last_size']),
                          price=float(raw_ticker_message['price']),
                          best_bid=float(raw_ticker_message['best_bid']),
-                         best_ask=float(raw_ticker_message['best_ask']))
+                         best_ask=float(raw_ticker_message['best_ask']),
+                         epoch_time=decode_epoch(raw_time) if TickerTimeFormat.EPOCH in time_formats else None)
 
   def _call_ticker_callbacks(self, raw_ticker_message: dict):
-    ticker_message = self._make_ticker_message(raw_ticker_message)
-    for callback in self.ticker_callbacks.values():
-      if callback.product_matcher:
-        if callback.product_matcher.partial_match(ticker_message.product):
-          callback.callback(self, ticker_message)
-      else:
-        callback.callback(self, ticker_message)
+    metrics = self._metrics
+    if metrics is not None:
+      return self._call_ticker_callbacks_with_metrics(raw_ticker_message, metrics)
+    product = self.get_product(raw_ticker_message['product_id'])
+    route = self._ticker_router.get_route(product)
+    if not route.callbacks:
+      return  # Nobody is listening to this product, so don't bother decoding the message.
+    ticker_message = self._make_ticker_message(raw_ticker_message, product, route.time_formats)
+    for callback in route.callbacks:
+      callback.dispatch(self, ticker_message)
+
+  def _call_ticker_callbacks_with_metrics(self, raw_ticker_message: dict, metrics):
+    """Same as _call_ticker_callbacks, but records the lag, decode time and callback times of the message.
+
+    Only INLINE callbacks are timed here, queued callbacks are timed by their TickerMailbox as they run.
+    """
+    receive_time = time.time()
+    product = self.get_product(raw_ticker_message['product_id'])
+    route = self._ticker_router.get_route(product)
+    decode_start = time.perf_counter()
+    ticker_message = self._make_ticker_message(raw_ticker_message, product, route.time_formats) \
+        if route.callbacks else None
+    decode_time = time.perf_counter() - decode_start if route.callbacks else None
+    exchange_time = ticker_message.epoch_time if ticker_message is not None else None
+    if exchange_time is None:
+      exchange_time = decode_epoch(raw_ticker_message['time'])
+    metrics.record_message(product.product_id, lag=receive_time - exchange_time, decode_time=decode_time)
+    for callback in route.callbacks:
+      if callback.mailbox is not None:
+        callback.dispatch(self, ticker_message)
+        continue
+      start = time.perf_counter()
+      try:
+        callback.dispatch(self, ticker_message)
+      except Exception:
+        metrics.record_callback(callback.ticker_id, callback_name(callback.callback), time.perf_counter() - start,
+                                error=True)
+        raise
+      metrics.record_callback(callback.ticker_id, callback_name(callback.callback), time.perf_counter() - start)
 
 
 class CoinbaseAuthenticatedExchange(CoinbaseExchange, AuthenticatedExchange):
+  # Coinbase Pro limits private endpoints to 15 requests per second, with bursts of up to 30.
+  ORDER_REQUESTS_PER_SECOND = 15
+  ORDER_REQUEST_BURST = 30
+
   def __init__(self, product_ids: list[Text] = None,
                rest_url: Text = PublicClient.PROD_URL,
                websocket_addr: Text = CoinbaseWebsocket.PROD_ADDRESS,
                authenticated_client: AuthenticatedClient = None,
                websocket: CoinbaseWebsocket = None,
-               api_key=None, api_secret=None, passphrase=None):
-    if authenticated_client:
+               api_key=None, api_secret=None, passphrase=None,
+               array_backed_order_books: bool = False,
+               max_book_depth: int = None,
+               product_cache_path: Text = None,
+               product_cache_ttl: float = DEFAULT_PRODUCT_CACHE_TTL,
+               max_order_workers: int = 8,
+               use_account_ledger: bool = False,
+               account_reconcile_interval: float = 60.0,
+               background_init: bool = False):
+    """Initializes the CoinbaseAuthenticatedExchange.
+
+    max_order_workers is the number of requests place_orders and cancel_orders make concurrently, the default fits in
+    the connection pool of the client's requests.Session.
+
+    If use_account_ledger is True, get_account and get_all_accounts are served from an AccountLedger kept up to date
+    from the user channel and reconciled against REST every account_reconcile_interval seconds. The websocket is
+    authenticated with api_key, api_secret and passphrase; if they aren't given, a supplied websocket must already be
+    authenticated.
+
+    Accounts are requested concurrently with the rest of initialization, see CoinbaseExchange for background_init.
+    """
+    if authenticated_client is not None:
       self.client = authenticated_client
     else:
       self.client = AuthenticatedClient(rest_url=rest_url, api_key=api_key, api_secret=api_secret,
                                         passphrase=passphrase)
-    if websocket:
+    if websocket is not None:
       self.websocket = websocket
     else:
       self.websocket = CoinbaseWebsocket(websocket_addr=websocket_addr, products_to_listen=product_ids, autostart=False)
     self.websocket.start_websocket_in_thread()
     # Account IDs don't typically change in a session, so we can cache them when a request is made for an account in
-    # a currency.
-    self._account_id_by_currency = {account['currency']: account['id'] for account in self.client.get_all_accounts()}
-    super().__init__(product_ids)
+    # a currency. They are requested during initialization.
+    self._account_id_by_currency = {}
+    self._use_account_ledger = use_account_ledger
+    self._account_reconcile_interval = account_reconcile_interval
+    self._websocket_credentials = (api_key, api_secret, passphrase) if api_key and api_secret and passphrase else None
+    self.account_ledger = None
+    self._init_order_submission(max_workers=max_order_workers, requests_per_second=self.ORDER_REQUESTS_PER_SECOND,
+                                burst=self.ORDER_REQUEST_BURST)
+    super().__init__(product_ids, array_backed_order_books=array_backed_order_books, max_book_depth=max_book_depth,
+                     product_cache_path=product_cache_path, product_cache_ttl=product_cache_ttl,
+                     background_init=background_init)
+
+  def _get_init_steps(self, product_ids: list[Text]) -> list[Callable]:
+    return super()._get_init_steps(product_ids) + [self._init_accounts]
+
+  def _init_accounts(self):
+    if self._use_account_ledger:
+      self.websocket.wait_for_open()
+      if self._websocket_credentials is not None:
+        self.websocket.add_authentication(*self._websocket_credentials)
+      self.account_ledger = AccountLedger(self, self._request_all_accounts, websocket=self.websocket,
+                                          reconcile_interval=self._account_reconcile_interval)
+      accounts = self.account_ledger.get_all_accounts()
+    else:
+      accounts = self._request_all_accounts()
+    self._account_id_by_currency = {account.currency: account.account_id for account in accounts}
+
+  def _finish_init(self):
+    if self.account_ledger is not None:
+      self.account_ledger.start()
 
   @staticmethod
   def _translate_order_side(side: OrderSide):
     return CoinbaseOrderSide.BUY if side is OrderSide.BUY else CoinbaseOrderSide.SELL
 
   def cancel_order(self, order_id: Text, product_id: Text = None):
-    return self.client.cancel_order(order_id=order_id, product_id=product_id)
+    """Cancels an order, raises CoinbaseRequestError if Coinbase rejects the cancel (e.g. the order is done)."""
+    return _check_response(self.client.cancel_order(order_id=order_id, product_id=product_id))
 
   @staticmethod
-  def _translate_to_order_report(json_response) -> OrderReport:
-    pass
+  def _optional_float(json_response: dict, key: Text):
+    value = json_response.get(key)
+    return float(value) if value is not None else None
+
+  def _translate_to_order_report(self, json_response: dict) -> OrderReport:
+    """Translates an order response, raises CoinbaseRequestError if the order was rejected."""
+    _check_response(json_response, required_key='id')
+    optional_float = CoinbaseAuthenticatedExchange._optional_float
+    return OrderReport(order_id=json_response['id'],
+                       product=self.get_product(json_response['product_id']),
+                       order_side=decode_order_side(json_response['side']),
+                       order_type=OrderType(json_response['type']),
+                       size=optional_float(json_response, 'size'),
+                       price=optional_float(json_response, 'price'),
+                       funds=optional_float(json_response, 'specified_funds'),
+                       status=json_response.get('status'),
+                       filled_size=optional_float(json_response, 'filled_size'),
+                       executed_value=optional_float(json_response, 'executed_value'),
+                       fill_fees=optional_float(json_response, 'fill_fees'),
+                       created_at=decode_time(json_response['created_at']) if 'created_at' in json_response else None,
+                       client_order_id=json_response.get('client_oid'))
 
   def limit_order(self, product_id: Text, side: OrderSide, price, size) -> OrderReport:
-    order_response = self.client.limit_order(product_id=product_id,
-                              side=CoinbaseAuthenticatedExchange._translate_order_side(
-                                side), price=price,
-                              size=size)
+    return self._translate_to_order_report(
+      self.client.limit_order(product_id=product_id,
+                              side=CoinbaseAuthenticatedExchange._translate_order_side(side),
+                              price=price, size=size))
 
   def market_order(self, product_id: Text, side: OrderSide, size=None, funds=None) -> OrderReport:
-    return CoinbaseAuthenticatedExchange._translate_to_order_report(
+    return self._translate_to_order_report(
       self.client.market_order(product_id=product_id,
-                               side=CoinbaseAuthenticatedExchange._translate_order_side(
-                                 side),
+                               side=CoinbaseAuthenticatedExchange._translate_order_side(side),
                                size=size, funds=funds))
 
   @staticmethod
@@ -166,14 +486,22 @@ class CoinbaseAuthenticatedExchange(CoinbaseExchange, AuthenticatedExchange):
                    currency=json_response['currency'],
                    balance=float(json_response['balance']),
                    hold=float(json_response['hold']),
-                   available=float(json_response['available']))
+                   available=float(json_response['available']),
+                   updated_at=time.time())
 
-  def get_all_accounts(self) -> list[Account]:
+  def _request_all_accounts(self) -> list[Account]:
     return [CoinbaseAuthenticatedExchange._response_to_account(account) for account in self.client.get_all_accounts()]
 
+  def get_all_accounts(self) -> list[Account]:
+    if self.account_ledger is not None:
+      return self.account_ledger.get_all_accounts()
+    return self._request_all_accounts()
+
   def get_account(self, currency: Text = None, account_id: Text = None) -> Account:
     if currency and account_id:
       raise ValueError('it is invalid to specify both currency and account id.')
+    if self.account_ledger is not None:
+      return self.account_ledger.get_account(currency=currency, account_id=account_id)
     if currency:
       if currency in self._account_id_by_currency:
         account_id = self._account_id_by_currency[currency]
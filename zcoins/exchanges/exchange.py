@@ -1,12 +1,20 @@
 # This file contains the interface that should be implemented by an exchange.
 from __future__ import annotations
 
+import json
+import logging
+
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from threading import Event, Thread
 from typing import Text, Callable, Union
 
-from zcoins.exchanges import OrderSide, OrderReport, OrderType, Product, TickerMessage
+from zcoins.exchanges import OrderSide, OrderReport, OrderRequest, OrderType, Product, TickerMessage, TickerTimeFormat
 from zcoins.exchanges import Account
+from zcoins.exchanges.metrics import DEFAULT_BUCKET_BOUNDS, ExchangeMetrics
+from zcoins.exchanges.rate_limiter import TokenBucket
+from zcoins.exchanges.ticker_dispatch import TickerMailbox
 
 class ExchangeProductInfo(ABC):
   @classmethod
@@ -30,9 +38,14 @@ class ExchangeProductInfo(ABC):
   def get_product(self, product_id: Text) -> Product:
     pass
 
+  def get_products(self, product_ids: list[Text]) -> list[Product]:
+    """Returns the Product for each product_id, implementations may override this to look them up in bulk."""
+    return [self.get_product(product_id) for product_id in product_ids]
+
 
 class Exchange(ExchangeProductInfo, ABC):
   """Contains information about an exchange."""
+  _metrics: ExchangeMetrics = None  # Only set while metrics are enabled, so the hot path can check it cheaply.
 
   def __init__(self, name: Text, order_books):
     self.name = name
@@ -42,11 +55,68 @@ class Exchange(ExchangeProductInfo, ABC):
   class _TickerCallback:
     callback: Callable[[Union[Exchange, AuthenticatedExchange], TickerMessage], None]
     product_matcher: Product = None  # By Default, this matches all products.
+    time_format: TickerTimeFormat = TickerTimeFormat.DATETIME
+    mailbox: TickerMailbox = None  # If set, messages are queued here instead of calling the callback inline.
+    ticker_id: Text = None
+
+    def dispatch(self, exchange, ticker_message: TickerMessage):
+      if self.mailbox is None:
+        self.callback(exchange, ticker_message)
+      else:
+        self.mailbox.put(exchange, ticker_message)
 
   @abstractmethod
   def add_ticker_callback(self, callback: Callable[[Exchange, TickerMessage], None]) -> Text:
     """Adds a callback function to this exchange."""
 
+  def enable_metrics(self, bucket_bounds: tuple = DEFAULT_BUCKET_BOUNDS) -> ExchangeMetrics:
+    """Starts collecting latency and throughput metrics about ticker messages, see get_stats.
+
+    Metrics are off by default, and cost a single attribute check per message while off.
+
+    Args:
+      bucket_bounds: The upper bounds (in seconds) of the latency histogram buckets.
+    """
+    if self._metrics is None:
+      self._metrics = ExchangeMetrics(bucket_bounds)
+    return self._metrics
+
+  def disable_metrics(self):
+    """Stops collecting metrics and discards the collected metrics."""
+    self._metrics = None
+
+  def get_stats(self) -> dict:
+    """Returns the collected metrics as a dict, None if metrics aren't enabled.
+
+    The dict contains, per product: message counts and rates, a histogram of the lag between the exchange timestamp and
+    receipt of each message, and a histogram of decode times; and per ticker callback: call and error counts and a
+    histogram of call times (queued callbacks are timed where they run, off the websocket thread).
+    """
+    metrics = self._metrics
+    return metrics.get_stats() if metrics is not None else None
+
+  def dump_stats_periodically(self, interval: float, callback: Callable[[dict], None] = None) -> Event:
+    """Calls callback with get_stats() every interval seconds, while metrics are enabled.
+
+    Returns an Event, set it to stop dumping stats.
+
+    Args:
+      interval: Seconds between dumps.
+      callback: Called with the stats dict, defaults to logging the stats as json.
+    """
+    if callback is None:
+      callback = lambda stats: logging.info('%s stats: %s', self.name, json.dumps(stats))
+    stop = Event()
+
+    def dump():
+      while not stop.wait(interval):
+        stats = self.get_stats()
+        if stats is not None:
+          callback(stats)
+
+    Thread(target=dump, daemon=True, name='{}-stats'.format(type(self).__name__)).start()
+    return stop
+
   def get_product_ids(self):
     """Get all product ids available on this exchange, this is not necessarily all *available* products, but only the
     products that are being tracked by the MultiProductOrderBook contained in this Exchange."""
@@ -56,6 +126,15 @@ class Exchange(ExchangeProductInfo, ABC):
     """Adds an order book"""
     return self.order_books.add_order_book(product_id)
 
+  def remove_order_book(self, product_id: Text):
+    """Stops tracking the order-book of product_id, returns it or None if it wasn't tracked."""
+    removed = self.remove_order_books([product_id])
+    return removed[0] if removed else None
+
+  def remove_order_books(self, product_ids: list[Text]):
+    """Stops tracking the order-books of product_ids, see MultiProductOrderBook.remove_order_books."""
+    return self.order_books.remove_order_books(product_ids)
+
   def get_all_order_books(self):
     """Returns a MultiProductOrderBook representing all products that are currently being followed."""
     return self.order_books
@@ -82,6 +161,51 @@ class AuthenticatedExchange(Exchange, ABC):
 
   def __init__(self, name: Text, order_books):
     super().__init__(name, order_books)
+    self._init_order_submission()
+
+  def _init_order_submission(self, max_workers: int = 8, requests_per_second: float = None, burst: int = 1):
+    """Sets up the executor and rate limiter used by place_orders and cancel_orders.
+
+    Args:
+      max_workers: The number of order requests that can be in-flight at once.
+      requests_per_second: The sustained rate of order requests, None means order requests aren't rate limited.
+      burst: The number of order requests that can be made at once, see TokenBucket.
+    """
+    self._order_executor = ThreadPoolExecutor(max_workers=max_workers,
+                                              thread_name_prefix='{}-orders'.format(type(self).__name__))
+    self._order_rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+
+  def _submit_order_request(self, function: Callable, *args, **kwargs) -> Future:
+    rate_limiter = self._order_rate_limiter
+
+    def rate_limited_request():
+      if rate_limiter is not None:
+        rate_limiter.acquire()
+      return function(*args, **kwargs)
+
+    return self._order_executor.submit(rate_limited_request)
+
+  def place_order(self, order: OrderRequest) -> OrderReport:
+    """Places a single OrderRequest, blocking until the exchange responds."""
+    if order.order_type is OrderType.LIMIT:
+      return self.limit_order(order.product_id, order.order_side, price=order.price, size=order.size)
+    if order.order_type is OrderType.MARKET:
+      return self.market_order(order.product_id, order.order_side, size=order.size, funds=order.funds)
+    raise ValueError('{} orders are not supported.'.format(order.order_type.value))
+
+  def place_orders(self, orders: list[OrderRequest]) -> list[Future]:
+    """Places orders concurrently, within the exchange's request rate limits.
+
+    Returns a Future per order, in the same order, resolving to its OrderReport (or raising the error from placing it).
+    """
+    return [self._submit_order_request(self.place_order, order) for order in orders]
+
+  def cancel_orders(self, order_ids: list[Text], product_id: Text = None) -> list[Future]:
+    """Cancels orders concurrently, within the exchange's request rate limits.
+
+    Returns a Future per order_id, in the same order, resolving to the result of cancel_order.
+    """
+    return [self._submit_order_request(self.cancel_order, order_id, product_id=product_id) for order_id in order_ids]
 
   @abstractmethod
   def get_all_accounts(self) -> list[Account]:
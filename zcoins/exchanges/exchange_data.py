@@ -7,7 +7,7 @@ from enum import Enum
 from typing import Text
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
   product_id: Text = None
   quote_currency: Text = None
@@ -48,24 +48,49 @@ class OrderReport:
   product: Product
   order_side: OrderSide
   order_type: OrderType
-  size: float
-  # TODO: Finish this.
+  size: float  # None for market orders placed with funds.
+  price: float = None  # None for market orders.
+  funds: float = None  # The quote_currency to spend, for market orders placed with funds.
+  status: Text = None  # The exchange-specific status of the order (e.g. 'pending', 'open', 'done').
+  filled_size: float = None
+  executed_value: float = None  # The quote_currency value of the filled part of the order.
+  fill_fees: float = None
+  created_at: datetime = None
+  client_order_id: Text = None
 
 
 @dataclass
+class OrderRequest:
+  """An order to place with AuthenticatedExchange.place_orders."""
+  product_id: Text
+  order_side: OrderSide
+  order_type: OrderType = OrderType.LIMIT
+  size: float = None  # Required for limit orders, market orders need either size or funds.
+  price: float = None  # Required for limit orders.
+  funds: float = None
+
+
+class TickerTimeFormat(Enum):
+  """Controls how the time of a TickerMessage is decoded for a ticker callback."""
+  DATETIME = 'datetime'  # TickerMessage.time is a timezone-aware datetime.
+  EPOCH = 'epoch'  # TickerMessage.epoch_time is a float of seconds since the epoch.
+
+
+@dataclass(slots=True)
 class TickerMessage:
   product: Product
-  time: datetime
+  time: datetime  # None if no callback for this product asked for TickerTimeFormat.DATETIME.
   order_side: OrderSide
   last_size: float
   price: float
   best_bid: float
   best_ask: float
+  epoch_time: float = None  # None if no callback for this product asked for TickerTimeFormat.EPOCH.
 
   def __repr__(self):
     return '{product_id}: {time}: {side} {size} @ {price}' \
       .format(product_id=self.product.product_id,
-              time=self.time.isoformat(),
+              time=self.time.isoformat() if self.time is not None else self.epoch_time,
               side=self.order_side.value.upper(),
               size=self.last_size,
               price=self.price)
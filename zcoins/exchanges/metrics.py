@@ -0,0 +1,137 @@
+# This file contains the latency and throughput metrics an exchange can collect about its hot path.
+from __future__ import annotations
+
+import time
+
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+from typing import Text
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket holds everything slower.
+DEFAULT_BUCKET_BOUNDS = (1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1,
+                         0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class LatencyHistogram:
+  """A histogram of latencies (in seconds) with fixed bucket bounds, recording a sample is O(log buckets)."""
+  __slots__ = ['bounds', 'counts', 'count', 'total', 'max']
+
+  def __init__(self, bounds: tuple = DEFAULT_BUCKET_BOUNDS):
+    self.bounds = bounds
+    self.counts = [0] * (len(bounds) + 1)
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def record(self, seconds: float):
+    self.counts[bisect_left(self.bounds, seconds)] += 1
+    self.count += 1
+    self.total += seconds
+    if seconds > self.max:
+      self.max = seconds
+
+  def percentile(self, fraction: float):
+    """Returns the upper bound of the bucket containing the given percentile (0.0-1.0), None if there are no samples.
+
+    Samples in the overflow bucket are reported as the largest sample seen.
+    """
+    if not self.count:
+      return None
+    target = fraction * self.count
+    seen = 0
+    for idx, count in enumerate(self.counts):
+      seen += count
+      if seen >= target and count:
+        return self.bounds[idx] if idx < len(self.bounds) else self.max
+    return self.max
+
+  def to_dict(self) -> dict:
+    return {
+      'count': self.count,
+      'mean': self.total / self.count if self.count else None,
+      'p50': self.percentile(0.5),
+      'p90': self.percentile(0.9),
+      'p99': self.percentile(0.99),
+      'max': self.max if self.count else None,
+      'buckets': dict(zip([str(bound) for bound in self.bounds] + ['inf'], self.counts)),
+    }
+
+
+class _ProductStats:
+  __slots__ = ['messages', 'lag', 'decode']
+
+  def __init__(self, bounds: tuple):
+    self.messages = 0
+    self.lag = LatencyHistogram(bounds)  # Exchange time to local receive time.
+    self.decode = LatencyHistogram(bounds)  # Time spent decoding the raw message.
+
+
+class _CallbackStats:
+  __slots__ = ['name', 'calls', 'errors', 'latency']
+
+  def __init__(self, name: Text, bounds: tuple):
+    self.name = name
+    self.calls = 0
+    self.errors = 0
+    self.latency = LatencyHistogram(bounds)
+
+
+def callback_name(callback) -> Text:
+  """Returns the name callbacks are reported under."""
+  return getattr(callback, '__qualname__', None) or repr(callback)
+
+
+class ExchangeMetrics:
+  """Per-product and per-callback counters and latency histograms for an Exchange.
+
+  Metrics are only collected by exchanges that have had enable_metrics() called, see Exchange.get_stats.
+  """
+
+  def __init__(self, bucket_bounds: tuple = DEFAULT_BUCKET_BOUNDS):
+    self.bucket_bounds = tuple(bucket_bounds)
+    self._lock = Lock()
+    self.reset()
+
+  def reset(self):
+    with self._lock:
+      self.started = time.time()
+      self._products = defaultdict(lambda: _ProductStats(self.bucket_bounds))
+      self._callbacks = {}
+
+  def record_message(self, product_id: Text, lag: float = None, decode_time: float = None):
+    """Records a message for product_id, lag is the (local receive time - exchange time) of the message."""
+    stats = self._products[product_id]
+    stats.messages += 1
+    if lag is not None:
+      stats.lag.record(lag)
+    if decode_time is not None:
+      stats.decode.record(decode_time)
+
+  def record_callback(self, callback_id: Text, name: Text, seconds: float, error: bool = False):
+    stats = self._callbacks.get(callback_id)
+    if stats is None:
+      stats = self._callbacks.setdefault(callback_id, _CallbackStats(name, self.bucket_bounds))
+    stats.calls += 1
+    stats.latency.record(seconds)
+    if error:
+      stats.errors += 1
+
+  def get_stats(self) -> dict:
+    """Returns all metrics as a (json serializable) dict."""
+    with self._lock:
+      elapsed = max(time.time() - self.started, 1e-9)
+      return {
+        'started': self.started,
+        'elapsed': elapsed,
+        'products': {product_id: {'messages': stats.messages,
+                                  'messages_per_sec': stats.messages / elapsed,
+                                  'lag': stats.lag.to_dict(),
+                                  'decode': stats.decode.to_dict()}
+                     for product_id, stats in list(self._products.items())},
+        'callbacks': {callback_id: {'name': stats.name,
+                                    'calls': stats.calls,
+                                    'errors': stats.errors,
+                                    'latency': stats.latency.to_dict()}
+                      for callback_id, stats in list(self._callbacks.items())},
+      }
@@ -0,0 +1,56 @@
+# This file contains a client-side rate limiter, used to stay within an exchange's REST request limits.
+from __future__ import annotations
+
+import time
+
+from threading import Lock
+
+
+class TokenBucket:
+  """A thread-safe token-bucket rate limiter.
+
+  The bucket holds at most burst tokens and refills at rate tokens per second, each request takes a token.
+  """
+
+  def __init__(self, rate: float, burst: int = 1):
+    """
+    Args:
+      rate: The sustained number of requests per second.
+      burst: The number of requests that can be made at once, after the bucket has had time to refill.
+    """
+    if rate <= 0 or burst < 1:
+      raise ValueError('rate must be positive and burst must be at least 1.')
+    self.rate = rate
+    self.burst = burst
+    self._tokens = float(burst)
+    self._updated = time.monotonic()
+    self._lock = Lock()
+
+  def _refill(self, now: float):
+    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+    self._updated = now
+
+  def try_acquire(self, tokens: int = 1) -> bool:
+    """Takes tokens if they are available, returns False without waiting if they aren't."""
+    with self._lock:
+      self._refill(time.monotonic())
+      if self._tokens >= tokens:
+        self._tokens -= tokens
+        return True
+      return False
+
+  def acquire(self, tokens: int = 1):
+    """Takes tokens, waiting for the bucket to refill if necessary.
+
+    Tokens are reserved before waiting (the bucket can go negative), so concurrent callers are served in the order
+    they called acquire.
+    """
+    if tokens > self.burst:
+      raise ValueError('cannot acquire more than burst ({}) tokens.'.format(self.burst))
+    with self._lock:
+      now = time.monotonic()
+      self._refill(now)
+      self._tokens -= tokens
+      wait = -self._tokens / self.rate if self._tokens < 0 else 0
+    if wait:
+      time.sleep(wait)
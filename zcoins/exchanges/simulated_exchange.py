@@ -0,0 +1,440 @@
+# This file contains a paper-trading exchange, which matches orders locally against another exchange's order-books.
+from __future__ import annotations
+
+import heapq
+import math
+import time
+import uuid
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from itertools import count, islice
+from threading import RLock
+from typing import Callable, Text, Union
+
+from zcoins.exchanges import OrderReport, OrderSide, OrderType, Product, TickerMessage, TickerTimeFormat
+from zcoins.exchanges import Account
+from zcoins.exchanges.exchange import Exchange, AuthenticatedExchange
+from zcoins.exchanges.ticker_router import TickerCallbackRouter
+
+# Sizes at or below this are treated as zero, so float rounding doesn't leave dust orders resting in the book.
+_EPSILON = 1e-12
+
+
+class InsufficientFundsError(ValueError):
+  """Raised when an account can't cover the hold of a limit order."""
+
+
+@dataclass(slots=True)
+class _SimulatedOrder:
+  order_id: Text
+  product: Product
+  order_side: OrderSide
+  order_type: OrderType
+  sequence: int  # Breaks price ties in time priority.
+  created_at: float
+  size: float = None
+  price: float = None
+  funds: float = None
+  remaining: float = math.inf  # Size left to fill, infinite for market orders placed with funds.
+  funds_remaining: float = math.inf  # Funds left to spend, infinite unless placed with funds.
+  hold: float = 0.0  # The part of the account's hold belonging to this order.
+  filled_size: float = 0.0
+  executed_value: float = 0.0
+  fill_fees: float = 0.0
+  status: Text = 'pending'
+
+  def to_order_report(self) -> OrderReport:
+    return OrderReport(order_id=self.order_id, product=self.product, order_side=self.order_side,
+                       order_type=self.order_type, size=self.size, price=self.price, funds=self.funds,
+                       status=self.status, filled_size=self.filled_size, executed_value=self.executed_value,
+                       fill_fees=self.fill_fees, created_at=datetime.fromtimestamp(self.created_at, timezone.utc))
+
+
+class _RestingOrders:
+  """One side of a product's resting orders, in price-time priority.
+
+  A heap of (price key, sequence, order); cancelled orders are removed lazily, when they reach the top of the heap or
+  when they make up most of it, so insert, cancel and match are all O(log n) amortized.
+  """
+
+  def __init__(self, side: OrderSide):
+    self._sign = -1 if side is OrderSide.BUY else 1  # Bids are popped highest price first.
+    self._heap = []
+    self._dead = 0
+
+  def push(self, order: _SimulatedOrder):
+    heapq.heappush(self._heap, (self._sign * order.price, order.sequence, order))
+
+  def peek(self) -> _SimulatedOrder:
+    """Returns the best open order, None if there are none."""
+    heap = self._heap
+    while heap and heap[0][2].status != 'open':
+      heapq.heappop(heap)
+      self._dead -= 1
+    return heap[0][2] if heap else None
+
+  def discard(self):
+    """Records that an open order in the heap was closed, compacting the heap once it is mostly closed orders."""
+    self._dead += 1
+    if self._dead > 64 and self._dead * 2 > len(self._heap):
+      self._heap = [entry for entry in self._heap if entry[2].status == 'open']
+      heapq.heapify(self._heap)
+      self._dead = 0
+
+
+class _ProductEngine:
+  """The resting orders of a product, and the market liquidity they have already consumed."""
+
+  def __init__(self, product: Product, order_book):
+    self.product = product
+    self.order_book = order_book
+    self.bids = _RestingOrders(OrderSide.BUY)
+    self.asks = _RestingOrders(OrderSide.SELL)
+    self._consumed_version = None
+    self._consumed = ({}, {})  # (bids, asks) of the market's book: price -> size already filled against.
+
+  def get_consumed(self, book_side: OrderSide) -> dict:
+    """Returns the consumed sizes of one side of the market's book, forgotten whenever the book updates."""
+    version = self.order_book.get_version()
+    if version != self._consumed_version:
+      self._consumed_version = version
+      self._consumed = ({}, {})
+    return self._consumed[0 if book_side is OrderSide.BUY else 1]
+
+
+def _iter_levels(get_levels: Callable):
+  """Yields the (price, size) levels of one side of a book as floats, fetching more levels only as they're needed."""
+  top_n, start = 16, 0
+  while True:
+    levels = get_levels(top_n=top_n)
+    for price, size in islice(levels, start, None):
+      yield float(price), float(size)
+    if len(levels) < top_n:
+      return
+    start, top_n = top_n, top_n * 2
+
+
+class SimulatedExchange(AuthenticatedExchange):
+  """A paper-trading exchange, which matches orders against the order-books of another (market) exchange.
+
+  Incoming orders match, best price first, against the market's book and against resting simulated orders in
+  price-time priority (the market's liquidity goes first at equal prices). Unfilled limit orders rest until they are
+  cancelled, they fill at their limit price when the market's book crosses them (which is checked at the top of the
+  heap on every book update, so it's O(1) unless something fills). Market liquidity that has been filled against is
+  remembered until that book next updates.
+
+  The market exchange can be live, or be fed recorded or synthetic data (e.g. with zcoins.feeds.FeedReplayer).
+  Balances are held as Accounts in a single simulated account per currency. Ticker callbacks receive a TickerMessage
+  for every simulated fill, its order_side is the side of the taker.
+
+  Usage:
+    market = CoinbaseExchange(product_ids=['BTC-USD'])
+    exchange = SimulatedExchange(market, balances={'USD': 10000})
+    exchange.limit_order('BTC-USD', OrderSide.BUY, price=30000, size=0.1)
+  """
+
+  def __init__(self, market: Exchange, balances: dict = None, maker_fee_rate: float = 0.0,
+               taker_fee_rate: float = 0.0, clock: Callable[[], float] = time.time, name: Text = None):
+    """
+    Args:
+      market: The exchange whose order-books (and products) are simulated against.
+      balances: The starting balance of each currency.
+      maker_fee_rate: The fee (as a fraction of the executed value) charged on fills of resting orders.
+      taker_fee_rate: The fee charged on fills of incoming orders.
+      clock: Returns the current time in seconds since the epoch, replace it to simulate time when replaying data.
+      name: Defaults to 'Simulated{market.name}'.
+    """
+    self.market = market
+    self.maker_fee_rate = maker_fee_rate
+    self.taker_fee_rate = taker_fee_rate
+    self.clock = clock
+    self.ticker_callbacks = {}
+    self._ticker_router = TickerCallbackRouter()
+    self._lock = RLock()
+    self._sequence = count()
+    self._engines = {}  # product_id -> _ProductEngine, created when the product is first traded.
+    self._orders = {}  # order_id -> open _SimulatedOrder
+    self._accounts = {}  # currency -> Account
+    self._book_callback_ids = {}
+    for currency, balance in (balances or {}).items():
+      self._adjust(self._get_account(currency), balance=float(balance), now=clock())
+    super().__init__(name if name is not None else 'Simulated{}'.format(market.name), market.get_all_order_books())
+
+  def make_product_id(self, base_currency: Text, quote_currency: Text) -> Text:
+    return self.market.make_product_id(base_currency=base_currency, quote_currency=quote_currency)
+
+  def get_all_products(self) -> list[Product]:
+    return self.market.get_all_products()
+
+  def get_product(self, product_id: Text) -> Product:
+    return self.market.get_product(product_id)
+
+  def get_products(self, product_ids: list[Text]) -> list[Product]:
+    return self.market.get_products(product_ids)
+
+  def add_ticker_callback(self,
+                          callback: Callable[[Union[Exchange, AuthenticatedExchange], TickerMessage], None],
+                          product_matcher: Product = None,
+                          time_format: TickerTimeFormat = TickerTimeFormat.DATETIME) -> Text:
+    """Adds a ticker callback, called with each simulated fill of products that partially match product_matcher."""
+    ticker_id = str(uuid.uuid4())
+    ticker_callback = Exchange._TickerCallback(callback=callback, product_matcher=product_matcher,
+                                               time_format=time_format, ticker_id=ticker_id)
+    self.ticker_callbacks[ticker_id] = ticker_callback
+    self._ticker_router.add(ticker_id, ticker_callback)
+    return ticker_id
+
+  def remove_ticker_callback(self, ticker_id: Text):
+    self._ticker_router.remove(ticker_id)
+    self.ticker_callbacks.pop(ticker_id, None)
+
+  def close(self):
+    """Stops following the market's order-books, open orders stop filling."""
+    with self._lock:
+      for product_id, callback_id in self._book_callback_ids.items():
+        self._engines[product_id].order_book.remove_update_callback(callback_id)
+      self._book_callback_ids.clear()
+
+  # Accounts
+
+  def _get_account(self, currency: Text) -> Account:
+    account = self._accounts.get(currency)
+    if account is None:
+      account = self._accounts[currency] = Account(account_id=str(uuid.uuid4()), currency=currency, balance=0.0,
+                                                   hold=0.0, available=0.0, updated_at=self.clock())
+    return account
+
+  @staticmethod
+  def _adjust(account: Account, balance: float = 0.0, hold: float = 0.0, now: float = None):
+    account.balance += balance
+    account.hold += hold
+    account.available = account.balance - account.hold
+    account.updated_at = now
+
+  def get_all_accounts(self) -> list[Account]:
+    with self._lock:
+      return [replace(account) for account in self._accounts.values()]
+
+  def get_account(self, currency: Text = None, account_id: Text = None) -> Account:
+    if currency and account_id:
+      raise ValueError('it is invalid to specify both currency and account id.')
+    with self._lock:
+      if currency:
+        return replace(self._get_account(currency))
+      for account in self._accounts.values():
+        if account.account_id == account_id:
+          return replace(account)
+    raise ValueError('{} is not a valid account id.'.format(account_id))
+
+  # Orders
+
+  def _get_engine(self, product_id: Text) -> _ProductEngine:
+    engine = self._engines.get(product_id)
+    if engine is None:
+      order_book = self.market.get_order_book(product_id)
+      engine = self._engines[product_id] = _ProductEngine(self.get_product(product_id), order_book)
+      self._book_callback_ids[product_id] = order_book.add_update_callback(self._on_book_update)
+    return engine
+
+  def _new_order(self, product_id: Text, side: OrderSide, order_type: OrderType, **kwargs) -> _SimulatedOrder:
+    return _SimulatedOrder(order_id=str(uuid.uuid4()), product=self.get_product(product_id), order_side=side,
+                           order_type=order_type, sequence=next(self._sequence), created_at=self.clock(), **kwargs)
+
+  def limit_order(self, product_id: Text, side: OrderSide, price, size) -> OrderReport:
+    price, size = float(price), float(size)
+    if price <= 0 or size <= 0:
+      raise ValueError('price and size must be positive.')
+    order = self._new_order(product_id, side, OrderType.LIMIT, price=price, size=size, remaining=size)
+    fills = []
+    with self._lock:
+      engine = self._get_engine(product_id)
+      product = order.product
+      # Holds cover the worst case, the whole order filling at its price and paying the higher fee.
+      if side is OrderSide.BUY:
+        hold_account, order.hold = self._get_account(product.quote_currency), price * size * (1 + self._max_fee_rate())
+      else:
+        hold_account, order.hold = self._get_account(product.base_currency), size
+      if order.hold > hold_account.available + _EPSILON:
+        raise InsufficientFundsError('{} available, {} needed.'.format(hold_account.available, order.hold))
+      self._adjust(hold_account, hold=order.hold, now=order.created_at)
+      order.status = 'open'
+      self._match(engine, order, fills)
+      if order.remaining > _EPSILON:
+        self._orders[order.order_id] = order
+        (engine.bids if side is OrderSide.BUY else engine.asks).push(order)
+      else:
+        self._close_order(order)
+      report = order.to_order_report()
+    self._call_ticker_callbacks(fills)
+    return report
+
+  def market_order(self, product_id: Text, side: OrderSide, size=None, funds=None) -> OrderReport:
+    if (size is None) == (funds is None):
+      raise ValueError('exactly one of size and funds must be specified.')
+    if size is not None:
+      order = self._new_order(product_id, side, OrderType.MARKET, size=float(size), remaining=float(size))
+    else:
+      order = self._new_order(product_id, side, OrderType.MARKET, funds=float(funds), funds_remaining=float(funds))
+    fills = []
+    with self._lock:
+      order.status = 'open'
+      self._match(self._get_engine(product_id), order, fills)
+      self._close_order(order)  # Whatever didn't fill is cancelled.
+      report = order.to_order_report()
+    self._call_ticker_callbacks(fills)
+    return report
+
+  def cancel_order(self, order_id: Text, product_id: Text = None):
+    with self._lock:
+      order = self._orders.get(order_id)
+      if order is None or (product_id is not None and order.product.product_id != product_id):
+        raise ValueError('{} is not an open order.'.format(order_id))
+      engine = self._engines[order.product.product_id]
+      self._close_resting_order(engine.bids if order.order_side is OrderSide.BUY else engine.asks, order)
+    return order_id
+
+  def get_open_orders(self, product_id: Text = None) -> list[OrderReport]:
+    with self._lock:
+      return [order.to_order_report() for order in self._orders.values()
+              if product_id is None or order.product.product_id == product_id]
+
+  def _max_fee_rate(self) -> float:
+    return max(self.maker_fee_rate, self.taker_fee_rate)
+
+  def _close_order(self, order: _SimulatedOrder):
+    """Marks the order done and releases what's left of its hold."""
+    order.status = 'done'
+    self._orders.pop(order.order_id, None)
+    if order.hold:
+      product = order.product
+      currency = product.quote_currency if order.order_side is OrderSide.BUY else product.base_currency
+      self._adjust(self._get_account(currency), hold=-order.hold, now=self.clock())
+      order.hold = 0.0
+
+  def _close_resting_order(self, resting_orders: _RestingOrders, order: _SimulatedOrder):
+    self._close_order(order)
+    resting_orders.discard()
+
+  def _fill(self, order: _SimulatedOrder, price: float, size: float, fee_rate: float, now: float):
+    """Applies a fill of size at price to an order and its accounts."""
+    product = order.product
+    value = price * size
+    fee = value * fee_rate
+    quote, base = self._get_account(product.quote_currency), self._get_account(product.base_currency)
+    if order.order_side is OrderSide.BUY:
+      released = min(order.hold, size * order.price * (1 + self._max_fee_rate())) if order.hold else 0.0
+      self._adjust(quote, balance=-value - fee, hold=-released, now=now)
+      self._adjust(base, balance=size, now=now)
+    else:
+      released = min(order.hold, size)
+      self._adjust(base, balance=-size, hold=-released, now=now)
+      self._adjust(quote, balance=value - fee, now=now)
+    order.hold -= released
+    order.remaining -= size
+    order.funds_remaining -= value + fee
+    order.filled_size += size
+    order.executed_value += value
+    order.fill_fees += fee
+
+  def _fillable_size(self, order: _SimulatedOrder, price: float, size: float) -> float:
+    """Caps size by what's left of the order, and for market orders (which have no hold) by the available balance."""
+    size = min(size, order.remaining, order.funds_remaining / (price * (1 + self.taker_fee_rate)))
+    if order.order_type is OrderType.MARKET:
+      product = order.product
+      if order.order_side is OrderSide.BUY:
+        size = min(size, self._get_account(product.quote_currency).available / (price * (1 + self.taker_fee_rate)))
+      else:
+        size = min(size, self._get_account(product.base_currency).available)
+    return size
+
+  def _match(self, engine: _ProductEngine, order: _SimulatedOrder, fills: list):
+    """Fills an incoming order against the market's book and resting orders, best price first."""
+    buying = order.order_side is OrderSide.BUY
+    book = engine.order_book
+    book_side = OrderSide.SELL if buying else OrderSide.BUY
+    consumed = engine.get_consumed(book_side)
+    resting_orders = engine.asks if buying else engine.bids
+    levels = _iter_levels(book.get_asks if buying else book.get_bids)
+    level = next(levels, None)
+    now = self.clock()
+    while order.remaining > _EPSILON and order.funds_remaining > _EPSILON:
+      while level is not None and level[1] - consumed.get(level[0], 0.0) <= _EPSILON:
+        level = next(levels, None)
+      resting = resting_orders.peek()
+      if level is not None and (resting is None or
+                                (level[0] <= resting.price if buying else level[0] >= resting.price)):
+        maker, price, available = None, level[0], level[1] - consumed.get(level[0], 0.0)
+      elif resting is not None:
+        maker, price, available = resting, resting.price, resting.remaining
+      else:
+        break
+      if order.price is not None and (price > order.price if buying else price < order.price):
+        break
+      size = self._fillable_size(order, price, available)
+      if size <= _EPSILON:
+        break
+      self._fill(order, price, size, self.taker_fee_rate, now)
+      if maker is None:
+        consumed[price] = consumed.get(price, 0.0) + size
+      else:
+        self._fill(maker, price, size, self.maker_fee_rate, now)
+        if maker.remaining <= _EPSILON:
+          self._close_resting_order(resting_orders, maker)
+      fills.append((order.product, order.order_side, price, size, now, book))
+
+  def _fill_crossed(self, engine: _ProductEngine, side: OrderSide, fills: list):
+    """Fills resting orders of side that the market's book has crossed, at their limit prices."""
+    buying = side is OrderSide.BUY
+    resting_orders = engine.bids if buying else engine.asks
+    order = resting_orders.peek()
+    if order is None:
+      return
+    book = engine.order_book
+    best = book.get_best_ask() if buying else book.get_best_bid()
+    if best is None or (float(best[0]) > order.price if buying else float(best[0]) < order.price):
+      return
+    consumed = engine.get_consumed(OrderSide.SELL if buying else OrderSide.BUY)
+    now = self.clock()
+    for price, size in _iter_levels(book.get_asks if buying else book.get_bids):
+      size -= consumed.get(price, 0.0)
+      while size > _EPSILON:
+        order = resting_orders.peek()
+        if order is None or (order.price < price if buying else order.price > price):
+          return
+        fill_size = min(size, order.remaining)
+        self._fill(order, order.price, fill_size, self.maker_fee_rate, now)
+        consumed[price] = consumed.get(price, 0.0) + fill_size
+        size -= fill_size
+        # The market is the taker.
+        fills.append((order.product, OrderSide.SELL if buying else OrderSide.BUY, order.price, fill_size, now, book))
+        if order.remaining <= _EPSILON:
+          self._close_resting_order(resting_orders, order)
+
+  def _on_book_update(self, order_book):
+    fills = []
+    with self._lock:
+      engine = self._engines.get(order_book.product_id)
+      if engine is None:
+        return
+      self._fill_crossed(engine, OrderSide.BUY, fills)
+      self._fill_crossed(engine, OrderSide.SELL, fills)
+    self._call_ticker_callbacks(fills)
+
+  def _call_ticker_callbacks(self, fills: list):
+    for product, taker_side, price, size, epoch_time, book in fills:
+      route = self._ticker_router.get_route(product)
+      if not route.callbacks:
+        continue
+      best_bid, best_ask = book.get_best_bid(), book.get_best_ask()
+      ticker_message = TickerMessage(product=product,
+                                     time=datetime.fromtimestamp(epoch_time, timezone.utc)
+                                     if TickerTimeFormat.DATETIME in route.time_formats else None,
+                                     order_side=taker_side,
+                                     last_size=size,
+                                     price=price,
+                                     best_bid=float(best_bid[0]) if best_bid else None,
+                                     best_ask=float(best_ask[0]) if best_ask else None,
+                                     epoch_time=epoch_time if TickerTimeFormat.EPOCH in route.time_formats else None)
+      for callback in route.callbacks:
+        callback.dispatch(self, ticker_message)
@@ -0,0 +1,126 @@
+# This file contains a columnar ring buffer of recent ticks, per product.
+from __future__ import annotations
+
+import numpy as np
+
+from threading import Lock
+from typing import NamedTuple, Text
+
+from zcoins.exchanges.exchange_data import OrderSide, Product, TickerMessage, TickerTimeFormat
+
+SIDE_CODES = {OrderSide.BUY: 1, OrderSide.SELL: -1}  # How order sides are stored in TickColumns.side.
+
+
+class TickColumns(NamedTuple):
+  """Read-only, equal length numpy arrays of ticks, oldest first."""
+  epoch_time: np.ndarray  # float64 seconds since the epoch.
+  price: np.ndarray  # float64
+  size: np.ndarray  # float64
+  side: np.ndarray  # int8, see SIDE_CODES.
+  best_bid: np.ndarray  # float64
+  best_ask: np.ndarray  # float64
+
+  def __len__(self):
+    return len(self.epoch_time)
+
+
+class TickHistory:
+  """A fixed capacity ring buffer of the most recent ticks of a product, stored as contiguous numeric columns.
+
+  Every tick is written twice, capacity apart, into columns of length 2 * capacity. That way the most recent n ticks are
+  always a contiguous slice, so last() and window() return views of the columns without copying.
+
+  Views are only valid until another capacity - n ticks have been appended, copy them to keep them longer. Ticks must be
+  appended in time order for window() to be correct.
+  """
+
+  def __init__(self, capacity: int):
+    if capacity < 1:
+      raise ValueError('capacity must be at least 1.')
+    self.capacity = capacity
+    self._columns = TickColumns(epoch_time=np.zeros(2 * capacity), price=np.zeros(2 * capacity),
+                                size=np.zeros(2 * capacity), side=np.zeros(2 * capacity, dtype=np.int8),
+                                best_bid=np.zeros(2 * capacity), best_ask=np.zeros(2 * capacity))
+    self._count = 0  # Total number of ticks ever appended.
+
+  def __len__(self):
+    return min(self._count, self.capacity)
+
+  def append(self, epoch_time: float, price: float, size: float, side: int, best_bid: float, best_ask: float):
+    idx = self._count % self.capacity
+    for column, value in zip(self._columns, (epoch_time, price, size, side, best_bid, best_ask)):
+      column[idx] = column[idx + self.capacity] = value
+    self._count += 1
+
+  def append_message(self, ticker_message: TickerMessage):
+    """Appends a TickerMessage, it must have been decoded with TickerTimeFormat.EPOCH."""
+    self.append(ticker_message.epoch_time, ticker_message.price, ticker_message.last_size,
+                SIDE_CODES[ticker_message.order_side], ticker_message.best_bid, ticker_message.best_ask)
+
+  def last(self, n: int = None) -> TickColumns:
+    """Returns views of the last n ticks (all retained ticks if n is None), oldest first."""
+    available = len(self)
+    n = available if n is None else min(n, available)
+    end = self._count % self.capacity + self.capacity
+    return self._view(end - n, end)
+
+  def window(self, start_time: float, end_time: float = None) -> TickColumns:
+    """Returns views of the retained ticks with start_time <= epoch_time < end_time (end_time None means no limit)."""
+    times = self.last().epoch_time
+    first = self._count % self.capacity + self.capacity - len(times)  # The column index of times[0].
+    lo = int(np.searchsorted(times, start_time, side='left'))
+    hi = len(times) if end_time is None else int(np.searchsorted(times, end_time, side='left'))
+    return self._view(first + lo, first + max(lo, hi))
+
+  def _view(self, start: int, end: int) -> TickColumns:
+    views = []
+    for column in self._columns:
+      view = column[start:end]
+      view.flags.writeable = False
+      views.append(view)
+    return TickColumns(*views)
+
+
+class TickRecorder:
+  """Records the ticks of an exchange into a TickHistory per product.
+
+  Usage:
+    recorder = TickRecorder(exchange, capacity=10000)
+    ...
+    prices = recorder.get_history('BTC-USD').last(500).price
+  """
+
+  def __init__(self, exchange, capacity: int = 10000, product_matcher: Product = None):
+    """
+    Args:
+      exchange: The Exchange to record ticks from.
+      capacity: The number of ticks retained per product.
+      product_matcher: Only ticks of products partially matching this Product are recorded, None records all products.
+    """
+    self.exchange = exchange
+    self.capacity = capacity
+    self._histories = {}
+    self._lock = Lock()
+    self._ticker_id = exchange.add_ticker_callback(self._on_tick, product_matcher=product_matcher,
+                                                   time_format=TickerTimeFormat.EPOCH)
+
+  def _on_tick(self, exchange, ticker_message: TickerMessage):
+    history = self._histories.get(ticker_message.product.product_id)
+    if history is None:
+      history = self.get_history(ticker_message.product.product_id)
+    history.append_message(ticker_message)
+
+  def get_history(self, product_id: Text) -> TickHistory:
+    """Returns the TickHistory of product_id, which is empty if no ticks have been recorded for it."""
+    history = self._histories.get(product_id)
+    if history is None:
+      with self._lock:
+        history = self._histories.setdefault(product_id, TickHistory(self.capacity))
+    return history
+
+  def get_product_ids(self) -> list[Text]:
+    return list(self._histories)
+
+  def close(self):
+    """Stops recording ticks."""
+    self.exchange.remove_ticker_callback(self._ticker_id)
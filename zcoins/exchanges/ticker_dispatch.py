@@ -0,0 +1,170 @@
+# This file contains the queues used to run ticker callbacks off of the websocket thread.
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import time
+
+from collections import deque, OrderedDict
+from concurrent.futures import Executor
+from enum import Enum
+from threading import Condition
+from typing import Callable, Text
+
+from zcoins.exchanges.metrics import callback_name
+
+
+class DispatchMode(Enum):
+  """Controls where a ticker callback runs."""
+  INLINE = 'inline'  # On the thread that received the message (usually the websocket thread).
+  THREAD_POOL = 'thread_pool'  # On a thread pool, fed by a bounded queue.
+  ASYNCIO = 'asyncio'  # On an asyncio event loop, fed by a bounded queue. The callback may be a coroutine function.
+
+
+class OverflowPolicy(Enum):
+  """Controls what happens when a ticker callback's queue is full."""
+  BLOCK = 'block'  # The receiving thread waits for room in the queue.
+  DROP_OLDEST = 'drop_oldest'  # The oldest queued message is discarded.
+  # Only the latest message per product is queued, older ones for the same product are replaced. If the queue is full
+  # of other products, the receiving thread waits for room.
+  CONFLATE = 'conflate'
+
+
+class TickerMailbox:
+  """A bounded queue of ticker messages for a single callback.
+
+  Messages are delivered to the callback one at a time, so the callback sees the ticks of each product in the order
+  they were received. When the mailbox is non-empty a drain is scheduled on the executor (or event loop), drains
+  deliver at most DRAIN_BATCH messages before rescheduling themselves so a busy callback can't monopolize a worker.
+
+  If ticker_id is set, each call (and whether it raised) is recorded in the exchange's metrics while they're enabled,
+  see Exchange.enable_metrics.
+  """
+  DRAIN_BATCH = 64
+
+  def __init__(self, callback: Callable, max_queue_size: int = 1000,
+               overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+               executor: Executor = None, event_loop: asyncio.AbstractEventLoop = None, ticker_id: Text = None):
+    if max_queue_size < 1:
+      raise ValueError('max_queue_size must be at least 1.')
+    if (executor is None) == (event_loop is None):
+      raise ValueError('exactly one of executor and event_loop must be specified.')
+    self.callback = callback
+    self.max_queue_size = max_queue_size
+    self.overflow_policy = overflow_policy
+    self.executor = executor
+    self.event_loop = event_loop
+    self.ticker_id = ticker_id
+    self.dropped = 0  # Number of messages discarded by DROP_OLDEST or replaced by CONFLATE.
+    self._condition = Condition()
+    # Queued (exchange, message) pairs, CONFLATE keys them by product_id.
+    self._queue = OrderedDict() if overflow_policy is OverflowPolicy.CONFLATE else deque()
+    self._scheduled = False
+    self._closed = False
+
+  def __len__(self):
+    return len(self._queue)
+
+  def put(self, exchange, message):
+    """Queues a message for the callback, applying the overflow policy if the queue is full."""
+    with self._condition:
+      if self._closed:
+        return
+      if self.overflow_policy is OverflowPolicy.CONFLATE:
+        product_id = message.product.product_id
+        if product_id in self._queue:
+          self._queue[product_id] = (exchange, message)
+          self.dropped += 1
+          return
+        if not self._wait_for_room():
+          return
+        self._queue[product_id] = (exchange, message)
+      else:
+        if len(self._queue) >= self.max_queue_size and self.overflow_policy is OverflowPolicy.DROP_OLDEST:
+          self._queue.popleft()
+          self.dropped += 1
+        elif not self._wait_for_room():
+          return
+        self._queue.append((exchange, message))
+      if self._scheduled:
+        return
+      self._scheduled = True
+    self._schedule()
+
+  def close(self):
+    """Discards queued messages and stops delivering to the callback."""
+    with self._condition:
+      self._closed = True
+      self._queue.clear()
+      self._condition.notify_all()
+
+  def _wait_for_room(self) -> bool:
+    """Waits until the queue has room, returns False if the mailbox was closed while waiting."""
+    while len(self._queue) >= self.max_queue_size and not self._closed:
+      self._condition.wait()
+    return not self._closed
+
+  def _schedule(self):
+    if self.executor is not None:
+      self.executor.submit(self._drain)
+    else:
+      self.event_loop.call_soon_threadsafe(self._start_async_drain)
+
+  def _start_async_drain(self):
+    self.event_loop.create_task(self._async_drain())
+
+  def _pop(self):
+    """Returns the next (exchange, message) pair, or None (and unschedules the mailbox) if there isn't one."""
+    with self._condition:
+      if not self._queue or self._closed:
+        self._scheduled = False
+        return None
+      if self.overflow_policy is OverflowPolicy.CONFLATE:
+        item = self._queue.popitem(last=False)[1]
+      else:
+        item = self._queue.popleft()
+      self._condition.notify()
+      return item
+
+  def _get_metrics(self, exchange):
+    return exchange._metrics if self.ticker_id is not None else None
+
+  def _record_call(self, metrics, start: float, error: bool):
+    metrics.record_callback(self.ticker_id, callback_name(self.callback), time.perf_counter() - start, error=error)
+
+  def _drain(self):
+    for _ in range(TickerMailbox.DRAIN_BATCH):
+      item = self._pop()
+      if item is None:
+        return
+      metrics = self._get_metrics(item[0])
+      start = time.perf_counter() if metrics is not None else None
+      error = False
+      try:
+        self.callback(*item)
+      except Exception:
+        error = True
+        logging.exception('Ticker callback raised an exception.')
+      if metrics is not None:
+        self._record_call(metrics, start, error)
+    self._schedule()
+
+  async def _async_drain(self):
+    for _ in range(TickerMailbox.DRAIN_BATCH):
+      item = self._pop()
+      if item is None:
+        return
+      metrics = self._get_metrics(item[0])
+      start = time.perf_counter() if metrics is not None else None
+      error = False
+      try:
+        result = self.callback(*item)
+        if inspect.isawaitable(result):
+          await result
+      except Exception:
+        error = True
+        logging.exception('Ticker callback raised an exception.')
+      if metrics is not None:
+        self._record_call(metrics, start, error)  # Includes time the coroutine spent waiting on the event loop.
+    self._schedule()
@@ -0,0 +1,104 @@
+# This file contains an index used by exchanges to route ticker messages to their callbacks.
+from __future__ import annotations
+
+from collections import defaultdict
+from itertools import count
+from threading import Lock
+from typing import NamedTuple, Text
+
+from zcoins.exchanges.exchange_data import Product
+
+
+class TickerRoute(NamedTuple):
+  callbacks: tuple  # The callbacks matching a product, in the order they were added.
+  time_formats: frozenset  # The TickerTimeFormats requested by those callbacks.
+
+
+class TickerCallbackRouter:
+  """Routes ticker messages to the callbacks whose product_matcher partially matches the message's product.
+
+  Callbacks are indexed by the product_id, base_currency and quote_currency of their product_matcher, callbacks with no
+  product_matcher go into a "match all" bucket. The resolved list of callbacks is cached per product_id, so routing a
+  message costs O(matching callbacks) instead of O(all callbacks). Callbacks are always returned in the order they
+  were added. The route also records which TickerTimeFormats its callbacks want, so decoders can skip the rest.
+  """
+
+  def __init__(self):
+    self._lock = Lock()
+    self._sequence = count()
+    self._entries = {}  # ticker_id -> (sequence, callback)
+    self._match_all = {}
+    self._by_product_id = defaultdict(dict)
+    self._by_base_currency = defaultdict(dict)
+    self._by_quote_currency = defaultdict(dict)
+    # product_id -> TickerRoute, replaced (never mutated) whenever the index changes.
+    self._resolved = {}
+
+  def __len__(self):
+    return len(self._entries)
+
+  def add(self, ticker_id: Text, callback):
+    """Adds a callback to the index, callback must have a 'product_matcher' attribute."""
+    with self._lock:
+      entry = (next(self._sequence), callback)
+      self._entries[ticker_id] = entry
+      for bucket in self._buckets(callback.product_matcher):
+        bucket[ticker_id] = entry
+      self._resolved = {}
+
+  def remove(self, ticker_id: Text):
+    """Removes a callback from the index, does nothing if the ticker_id is unknown."""
+    with self._lock:
+      entry = self._entries.pop(ticker_id, None)
+      if entry is None:
+        return
+      for bucket in self._buckets(entry[1].product_matcher):
+        bucket.pop(ticker_id, None)
+      self._resolved = {}
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._match_all.clear()
+      self._by_product_id.clear()
+      self._by_base_currency.clear()
+      self._by_quote_currency.clear()
+      self._resolved = {}
+
+  def get_route(self, product: Product) -> TickerRoute:
+    """Returns the route of a ticker message for product."""
+    resolved = self._resolved
+    route = resolved.get(product.product_id)
+    if route is None:
+      route = self._resolve(product)
+      resolved[product.product_id] = route
+    return route
+
+  def get_callbacks(self, product: Product) -> tuple:
+    """Returns the callbacks that should receive a ticker message for product."""
+    return self.get_route(product).callbacks
+
+  def _resolve(self, product: Product) -> TickerRoute:
+    with self._lock:
+      matches = dict(self._match_all)
+      if product.product_id and product.product_id in self._by_product_id:
+        matches.update(self._by_product_id[product.product_id])
+      if product.base_currency and product.base_currency in self._by_base_currency:
+        matches.update(self._by_base_currency[product.base_currency])
+      if product.quote_currency and product.quote_currency in self._by_quote_currency:
+        matches.update(self._by_quote_currency[product.quote_currency])
+    callbacks = tuple(callback for _, callback in sorted(matches.values(), key=lambda entry: entry[0]))
+    return TickerRoute(callbacks=callbacks, time_formats=frozenset(callback.time_format for callback in callbacks))
+
+  def _buckets(self, product_matcher: Product):
+    """Yields every bucket a callback with the given product_matcher belongs in."""
+    if product_matcher is None:
+      yield self._match_all
+      return
+    # A matcher with no fields set never matches anything (see Product.partial_match), so it is not indexed.
+    if product_matcher.product_id:
+      yield self._by_product_id[product_matcher.product_id]
+    if product_matcher.base_currency:
+      yield self._by_base_currency[product_matcher.base_currency]
+    if product_matcher.quote_currency:
+      yield self._by_quote_currency[product_matcher.quote_currency]
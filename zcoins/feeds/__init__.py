@@ -0,0 +1,4 @@
+# This package contains local feeds that can stand in for an exchange's network connections.
+from zcoins.feeds.local_feed import LocalWebsocket, LocalPublicClient, LocalAuthenticatedClient
+from zcoins.feeds.recording import FeedRecorder, FeedReplayer
+from zcoins.feeds.binance_feed import LocalBinanceClient, LocalBinanceWebsocketManager
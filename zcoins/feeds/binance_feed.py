@@ -0,0 +1,74 @@
+# This file contains local stand-ins for python-binance's Client and ThreadedWebsocketManager, used to drive a
+# BinanceExchange without a network connection.
+from __future__ import annotations
+
+from typing import Callable, Text
+
+
+class LocalBinanceClient:
+  """A stand-in for binance.Client that serves symbol metadata from memory."""
+
+  def __init__(self, symbols: list[dict] = None):
+    """
+    Args:
+      symbols: Symbol json in the format of Binance's /exchangeInfo endpoint, at least 'symbol', 'baseAsset' and
+        'quoteAsset' are required.
+    """
+    self._symbols = {symbol['symbol']: symbol for symbol in symbols or []}
+
+  def add_symbol(self, symbol: dict):
+    self._symbols[symbol['symbol']] = symbol
+
+  def get_exchange_info(self):
+    return {'symbols': list(self._symbols.values())}
+
+  def get_symbol_info(self, symbol: Text):
+    return self._symbols.get(symbol)
+
+
+class LocalBinanceWebsocketManager:
+  """A stand-in for binance.ThreadedWebsocketManager that delivers messages passed to publish_depth and publish_trade.
+
+  Messages are delivered on the calling thread, and only to sockets that have been started and not stopped.
+  """
+
+  def __init__(self):
+    self._sockets = {}  # stream name -> callback
+
+  def start(self):
+    pass
+
+  def stop(self):
+    self._sockets.clear()
+
+  def join(self):
+    pass
+
+  def start_depth_socket(self, callback: Callable, symbol: Text, depth: int = None, interval: int = None) -> Text:
+    name = '{}@depth{}'.format(symbol.lower(), depth or '')
+    self._sockets[name] = callback
+    return name
+
+  def start_trade_socket(self, callback: Callable, symbol: Text) -> Text:
+    name = '{}@trade'.format(symbol.lower())
+    self._sockets[name] = callback
+    return name
+
+  def stop_socket(self, stream_name: Text):
+    self._sockets.pop(stream_name, None)
+
+  def _publish(self, prefix: Text, message: dict):
+    for name, callback in list(self._sockets.items()):
+      if name.startswith(prefix):
+        callback(message)
+
+  def publish_depth(self, symbol: Text, bids: list, asks: list, last_update_id: int = 0):
+    """Delivers a partial book depth message, bids and asks are lists of [price, quantity] strings, best first."""
+    self._publish('{}@depth'.format(symbol.lower()), {'lastUpdateId': last_update_id, 'bids': bids, 'asks': asks})
+
+  def publish_trade(self, symbol: Text, price: Text, quantity: Text, trade_time: int, buyer_is_maker: bool,
+                    trade_id: int = 0):
+    """Delivers a trade message, trade_time is in milliseconds since the epoch."""
+    self._publish('{}@trade'.format(symbol.lower()),
+                  {'e': 'trade', 'E': trade_time, 's': symbol, 't': trade_id, 'p': price, 'q': quantity,
+                   'T': trade_time, 'm': buyer_is_maker})
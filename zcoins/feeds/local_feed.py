@@ -0,0 +1,235 @@
+# This file contains local stand-ins for the Coinbase websocket and REST client, used to drive exchanges without a
+# network connection.
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+
+from datetime import datetime, timezone
+from typing import Callable, Text
+
+# Channels that are never sent in a subscribe message, mirrors zcoinbase.websocket_client.
+_UNSUBSCRIBABLE_CHANNELS = {'error', 'open_websocket', 'close_websocket', 'all_messages', 'subscriptions', 'snapshot',
+                            'l2update', 'open', 'received', 'match', 'change', 'activate'}
+_FULL_CHANNELS = {'open', 'received', 'match', 'change', 'activate'}
+# The message types delivered by channels whose messages aren't of the channel's own type, used by unsubscribe.
+_CHANNEL_MESSAGE_TYPES = {'level2': ('snapshot', 'l2update'), 'full': tuple(_FULL_CHANNELS) + ('done',),
+                          'user': tuple(_FULL_CHANNELS) + ('done',), 'matches': ('match', 'last_match')}
+
+
+class LocalWebsocket:
+  """A stand-in for zcoinbase's CoinbaseWebsocket that delivers messages passed to publish() instead of a network feed.
+
+  It supports the parts of the CoinbaseWebsocket API used by CoinbaseExchange and CoinbaseMultiProductOrderBook, and
+  dispatches messages to channel functions the same way. Like the real feed, messages for products that haven't been
+  subscribed to (added with add_product) are not delivered.
+  """
+
+  def __init__(self, products_to_listen: list[Text] = None):
+    self.products_to_listen = products_to_listen if products_to_listen is not None else []
+    self.channels_to_function = {}
+    self.extra_channels = []
+    self.subscribed_channels = []  # The channels that would have been subscribed to by the last subscribe().
+    self.api_key = self.api_secret = self.passphrase = None
+    self.ws_opened = threading.Event()
+    self.ws_opened.set()  # There's nothing to connect to, so the feed is always open.
+    self._listening = set(self.products_to_listen)
+    self._unsubscribed = {}  # message type -> product_ids unsubscribed from the channel delivering it.
+
+  def add_channel_function(self, channel: Text, function: Callable, refresh_subscriptions=None):
+    self.channels_to_function.setdefault(channel, []).append(function)
+    if refresh_subscriptions or refresh_subscriptions is None:
+      self.subscribe()
+
+  def add_channel(self, channel: Text, refresh_subscriptions=True):
+    self.extra_channels.append(channel)
+
+  def add_product(self, product: Text, refresh_subscriptions=True):
+    if product not in self.products_to_listen:
+      self.products_to_listen.append(product)
+      if refresh_subscriptions:
+        self.subscribe()
+
+  def remove_product(self, product: Text):
+    if product in self.products_to_listen:
+      self.products_to_listen.remove(product)
+    self._listening = set(self.products_to_listen)
+
+  def add_authentication(self, api_key, api_secret, passphrase):
+    self.api_key, self.api_secret, self.passphrase = api_key, api_secret, passphrase
+
+  def subscribe(self):
+    self.subscribed_channels = [channel for channel in self.channels_to_function
+                                if channel not in _UNSUBSCRIBABLE_CHANNELS] + self.extra_channels
+    self._listening = set(self.products_to_listen)
+    self._unsubscribed = {message_type: product_ids - self._listening
+                          for message_type, product_ids in self._unsubscribed.items()}
+
+  def unsubscribe(self, product_ids: list[Text], channels: list[Text]):
+    """Stops delivering the messages of channels for product_ids, like Coinbase's unsubscribe message.
+
+    subscribe() resubscribes the products that are still in products_to_listen.
+    """
+    for channel in channels:
+      for message_type in _CHANNEL_MESSAGE_TYPES.get(channel, (channel,)):
+        self._unsubscribed[message_type] = self._unsubscribed.get(message_type, set()) | set(product_ids)
+
+  def wait_for_open(self):
+    self.ws_opened.wait()
+
+  def start_websocket(self):
+    pass
+
+  def start_websocket_in_thread(self):
+    pass
+
+  def close_websocket(self):
+    pass
+
+  def publish(self, message: dict):
+    """Delivers a (parsed json) message to the channel functions, as if it was received from the feed."""
+    product_id = message.get('product_id')
+    message_type = message.get('type')
+    if product_id is not None and (product_id not in self._listening or
+                                   product_id in self._unsubscribed.get(message_type, ())):
+      return
+    functions = self.channels_to_function
+    if message_type in functions:
+      for function in functions[message_type]:
+        function(message)
+    if 'full' in functions and message_type in _FULL_CHANNELS:
+      for function in functions['full']:
+        function(message)
+    if 'matches' in functions and message_type == 'match':
+      for function in functions['matches']:
+        function(message)
+    if 'all_messages' in functions:
+      for function in functions['all_messages']:
+        function(message)
+
+
+class LocalPublicClient:
+  """A stand-in for zcoinbase's PublicClient that serves product metadata from memory."""
+
+  def __init__(self, products: list[dict] = None):
+    """
+    Args:
+      products: Product json in the format of Coinbase's /products endpoint, at least 'id', 'base_currency' and
+        'quote_currency' are required.
+    """
+    self._products = {product['id']: product for product in products or []}
+
+  def add_product(self, product: dict):
+    self._products[product['id']] = product
+
+  def get_products(self):
+    return list(self._products.values())
+
+  def get_product(self, product_id: Text):
+    if product_id not in self._products:
+      raise RuntimeError('ErrorCode: 404 Message: NotFound\nGET Request to products/{} FAILED'.format(product_id))
+    return self._products[product_id]
+
+
+class LocalAuthenticatedClient(LocalPublicClient):
+  """A stand-in for zcoinbase's AuthenticatedClient that accepts orders and cancels against in-memory accounts.
+
+  Accepted orders place a hold on the account they spend from and stay open until cancelled, nothing is ever filled.
+  Rejected requests return Coinbase's error bodies (with http_code added, like zcoinbase) instead of raising. Every
+  order and cancel request is recorded in requests, as (time.monotonic(), method, args).
+  """
+
+  def __init__(self, products: list[dict] = None, balances: dict = None, request_latency: float = 0.0):
+    """
+    Args:
+      products: Product json, see LocalPublicClient.
+      balances: The starting balance of each account, keyed by currency.
+      request_latency: The number of seconds each order and cancel request takes.
+    """
+    super().__init__(products)
+    self.request_latency = request_latency
+    self.requests = []
+    self._lock = threading.Lock()
+    self._accounts = {currency: {'id': 'account-{}'.format(currency), 'currency': currency, 'balance': float(balance),
+                                 'hold': 0.0}
+                      for currency, balance in (balances or {}).items()}
+    self._orders = {}  # order_id -> (order json, currency held, amount held), for open orders.
+
+  def _request(self, method: Text, *args):
+    with self._lock:
+      self.requests.append((time.monotonic(), method, args))
+    if self.request_latency:
+      time.sleep(self.request_latency)
+
+  @staticmethod
+  def _account_json(account: dict) -> dict:
+    return {'id': account['id'], 'currency': account['currency'], 'balance': str(account['balance']),
+            'hold': str(account['hold']), 'available': str(account['balance'] - account['hold'])}
+
+  def get_all_accounts(self):
+    with self._lock:
+      return [self._account_json(account) for account in self._accounts.values()]
+
+  def get_account(self, account_id):
+    with self._lock:
+      for account in self._accounts.values():
+        if account['id'] == account_id:
+          return self._account_json(account)
+    raise RuntimeError('ErrorCode: 404 Message: NotFound\nGET Request to accounts/{} FAILED'.format(account_id))
+
+  def _place(self, product_id: Text, side: Text, order: dict, currency: Text, amount: float) -> dict:
+    """Holds amount of currency for the order, returns the order json or an error body."""
+    if product_id not in self._products:
+      return {'message': 'Product not found', 'http_code': 400}
+    with self._lock:
+      account = self._accounts.get(currency)
+      if account is None or account['balance'] - account['hold'] < amount:
+        return {'message': 'Insufficient funds', 'http_code': 400}
+      account['hold'] += amount
+      order_id = str(uuid.uuid4())
+      order.update(id=order_id, product_id=product_id, side=side, status='pending', filled_size='0',
+                   executed_value='0', fill_fees='0', client_oid=str(uuid.uuid4()),
+                   created_at=datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+      self._orders[order_id] = (order, currency, amount)
+      return dict(order, http_code=200)
+
+  def limit_order(self, side, product_id, price, size, **kwargs):
+    side = getattr(side, 'value', side)
+    self._request('limit_order', side, product_id, price, size)
+    product = self._products.get(product_id, {})
+    if side == 'buy':
+      currency, amount = product.get('quote_currency'), float(price) * float(size)
+    else:
+      currency, amount = product.get('base_currency'), float(size)
+    return self._place(product_id, side, {'type': 'limit', 'price': str(price), 'size': str(size)}, currency, amount)
+
+  def market_order(self, side, product_id, size=None, funds=None, **kwargs):
+    side = getattr(side, 'value', side)
+    self._request('market_order', side, product_id, size, funds)
+    product = self._products.get(product_id, {})
+    order = {'type': 'market'}
+    if size is not None:
+      order['size'] = str(size)
+    if funds is not None:
+      order['specified_funds'] = str(funds)
+    if side == 'buy':
+      currency, amount = product.get('quote_currency'), float(funds) if funds is not None else 0.0
+    else:
+      currency, amount = product.get('base_currency'), float(size) if size is not None else 0.0
+    return self._place(product_id, side, order, currency, amount)
+
+  def cancel_order(self, order_id, is_client_oid=False, product_id=None):
+    self._request('cancel_order', order_id, product_id)
+    with self._lock:
+      entry = self._orders.get(order_id)
+      if entry is None or (product_id is not None and entry[0]['product_id'] != product_id):
+        return {'message': 'order not found', 'http_code': 404}
+      del self._orders[order_id]
+      _, currency, amount = entry
+      self._accounts[currency]['hold'] -= amount
+    return order_id  # Coinbase responds with the id of the cancelled order.
+
+  def get_open_orders(self) -> list[dict]:
+    with self._lock:
+      return [dict(order) for order, _, _ in self._orders.values()]
@@ -0,0 +1,214 @@
+# This file contains a recorder and replayer for the Coinbase websocket feed.
+#
+# Log format: the file starts with MAGIC, followed by records of
+#   <float64 receive time (seconds since the epoch)> <uint8 record type> <uint32 payload length> <payload>
+# all little-endian, where payload is compact utf-8 json. The file is append-only, so a recorder can be restarted on the
+# same file.
+from __future__ import annotations
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from typing import Iterable, Text
+
+from zcoins.feeds.local_feed import LocalPublicClient, LocalWebsocket
+
+MAGIC = b'ZCFEED1\n'
+_RECORD_HEADER = struct.Struct('<dBI')
+
+# Record types.
+PRODUCT_RECORD = 0  # Product metadata json, in the format of Coinbase's /products endpoint.
+TICKER_RECORD = 1
+SNAPSHOT_RECORD = 2
+L2UPDATE_RECORD = 3
+OTHER_RECORD = 255
+_RECORD_TYPES = {'ticker': TICKER_RECORD, 'snapshot': SNAPSHOT_RECORD, 'l2update': L2UPDATE_RECORD}
+
+
+class FeedRecorder:
+  """Appends the ticker and level2 messages received by a websocket to a compact binary log.
+
+  Usage:
+    recorder = FeedRecorder(exchange.websocket, 'feed.zcf', product_info=exchange)
+    ...
+    recorder.close()
+  """
+
+  def __init__(self, websocket, path: Text, message_types: Iterable[Text] = ('ticker', 'snapshot', 'l2update'),
+               product_info=None, flush_every: int = 1000):
+    """
+    Args:
+      websocket: A CoinbaseWebsocket (or stand-in), messages it receives of message_types are recorded.
+      path: The file to append to, created if it doesn't exist.
+      message_types: The 'type's of message to record.
+      product_info: An optional CoinbaseExchangeProductInfo, the metadata of each recorded product is looked up and
+        recorded the first time the product is seen, so the log can be replayed without REST access.
+      flush_every: Flush the file after this many records.
+    """
+    self.path = path
+    self.message_types = frozenset(message_types)
+    self.product_info = product_info
+    self.flush_every = flush_every
+    self.records_written = 0
+    self._recorded_products = set()
+    self._lock = threading.Lock()
+    self._file = open(path, 'ab')
+    if self._file.tell() == 0:
+      self._file.write(MAGIC)
+    self._closed = False
+    websocket.add_channel_function('all_messages', self._on_message, refresh_subscriptions=False)
+
+  def _on_message(self, message):
+    if self._closed or not isinstance(message, dict) or message.get('type') not in self.message_types:
+      return
+    product_id = message.get('product_id')
+    if self.product_info is not None and product_id is not None and product_id not in self._recorded_products:
+      self._recorded_products.add(product_id)
+      product = self.product_info.get_product(product_id)
+      self.write(PRODUCT_RECORD, {'id': product.product_id, 'base_currency': product.base_currency,
+                                  'quote_currency': product.quote_currency})
+    self.write(_RECORD_TYPES.get(message['type'], OTHER_RECORD), message)
+
+  def write(self, record_type: int, message: dict, receive_time: float = None):
+    """Appends a single record to the log."""
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    header = _RECORD_HEADER.pack(time.time() if receive_time is None else receive_time, record_type, len(payload))
+    with self._lock:
+      if self._closed:
+        return
+      self._file.write(header)
+      self._file.write(payload)
+      self.records_written += 1
+      if self.records_written % self.flush_every == 0:
+        self._file.flush()
+
+  def close(self):
+    with self._lock:
+      if not self._closed:
+        self._closed = True
+        self._file.close()
+
+
+class FeedReplayer(LocalWebsocket):
+  """Replays a log written by FeedRecorder, standing in for the websocket of CoinbaseExchange and
+  CoinbaseMultiProductOrderBook.
+
+  The log is read through a memory map. speed controls the pace of replay: 1.0 replays in real-time, N replays N times
+  faster and None replays as fast as possible.
+
+  Usage:
+    replayer = FeedReplayer('feed.zcf', speed=10.0)
+    exchange = CoinbaseExchange(product_ids=replayer.get_product_ids(), websocket=replayer,
+                                client=replayer.get_public_client())
+    replayer.run()
+  """
+
+  def __init__(self, path: Text, speed: float = None, products_to_listen: list[Text] = None):
+    """
+    Args:
+      path: A log written by FeedRecorder.
+      speed: The replay speed, see the class docstring.
+      products_to_listen: The products to deliver messages for, usually added by the exchange/order-book.
+    """
+    super().__init__(products_to_listen)
+    self.path = path
+    self.speed = speed
+    self._file = open(path, 'rb')
+    size = os.fstat(self._file.fileno()).st_size
+    self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+    if self._mmap[:len(MAGIC)] != MAGIC:
+      self.close()
+      raise ValueError('{} is not a feed log.'.format(path))
+    self._times, self._offsets, products = self._build_index()
+    self._public_client = LocalPublicClient(products)
+    self._position = 0  # Index into _times/_offsets of the next record to replay.
+    self._stop = threading.Event()
+    self._thread = None
+
+  def _build_index(self):
+    """Reads every record header, returns the receive times, record offsets and recorded product metadata."""
+    times, offsets, products = [], [], []
+    data, offset, end = self._mmap, len(MAGIC), len(self._mmap)
+    while offset + _RECORD_HEADER.size <= end:
+      receive_time, record_type, length = _RECORD_HEADER.unpack_from(data, offset)
+      if offset + _RECORD_HEADER.size + length > end:
+        break  # A partially written record at the end of the log.
+      if record_type == PRODUCT_RECORD:
+        start = offset + _RECORD_HEADER.size
+        products.append(json.loads(bytes(data[start:start + length])))
+      else:
+        times.append(receive_time)
+        offsets.append(offset)
+      offset += _RECORD_HEADER.size + length
+    return times, offsets, products
+
+  def __len__(self):
+    return len(self._offsets)
+
+  def get_public_client(self) -> LocalPublicClient:
+    """Returns a stand-in PublicClient serving the product metadata recorded in the log."""
+    return self._public_client
+
+  def get_product_ids(self) -> list[Text]:
+    return [product['id'] for product in self._public_client.get_products()]
+
+  def get_start_time(self):
+    return self._times[0] if self._times else None
+
+  def get_end_time(self):
+    return self._times[-1] if self._times else None
+
+  def seek(self, timestamp: float):
+    """Moves to the first record received at or after timestamp."""
+    self._position = bisect.bisect_left(self._times, timestamp)
+
+  def tell(self) -> float:
+    """Returns the receive time of the next record to be replayed, None if the replay is finished."""
+    return self._times[self._position] if self._position < len(self._times) else None
+
+  def read_messages(self, start: int = None, stop: int = None):
+    """Yields (receive_time, message) for the records in [start, stop), without delivering them."""
+    data = self._mmap
+    for idx in range(self._position if start is None else start, len(self._offsets) if stop is None else stop):
+      offset = self._offsets[idx] + _RECORD_HEADER.size
+      length = _RECORD_HEADER.unpack_from(data, self._offsets[idx])[2]
+      yield self._times[idx], json.loads(bytes(data[offset:offset + length]))
+
+  def run(self, until: float = None):
+    """Delivers records from the current position until the end of the log (or the receive time until)."""
+    self._stop.clear()
+    stop = len(self._times) if until is None else bisect.bisect_right(self._times, until)
+    wall_start = time.monotonic()
+    log_start = self.tell()
+    for receive_time, message in self.read_messages(stop=stop):
+      if self._stop.is_set():
+        return
+      if self.speed:
+        delay = (receive_time - log_start) / self.speed - (time.monotonic() - wall_start)
+        if delay > 0:
+          time.sleep(delay)
+      self._position += 1
+      self.publish(message)
+
+  def start_websocket(self):
+    self.run()
+
+  def start_websocket_in_thread(self):
+    self._thread = threading.Thread(target=self.run, daemon=True)
+    self._thread.start()
+
+  def close_websocket(self):
+    self._stop.set()
+    if self._thread is not None and self._thread is not threading.current_thread():
+      self._thread.join()
+
+  def close(self):
+    self.close_websocket()
+    if isinstance(self._mmap, mmap.mmap):
+      self._mmap.close()
+    self._file.close()
@@ -1,3 +1,34 @@
 # This package contains the exchanges that can be accessed on the zcoins trading platform.
-from zcoins.order_books.order_book import SingleProductOrderBook, MultiProductOrderBook
-from zcoins.order_books.coinbase_order_book import CoinbaseMultiProductOrderBook
+import importlib
+
+from zcoins.order_books.order_book import SingleProductOrderBook, MultiProductOrderBook, OrderBookSnapshot
+from zcoins.order_books.arbitrage import TriangularArbitrageScanner, ArbitrageOpportunity, ArbitrageLeg
+from zcoins.order_books.book_events import BookSubscription, BookSubscriptionGroup, DepthEvent, DepthSubscription, \
+  TopOfBookEvent, TopOfBookSubscription
+from zcoins.order_books.consolidated_order_book import ConsolidatedLevel, ConsolidatedOrderBook, \
+  ConsolidatedMultiProductOrderBook
+
+# Exchange adapters (and modules with heavy dependencies) are only imported when one of their names is first used, so
+# importing this package doesn't import zcoinbase or numpy.
+_LAZY_NAMES = {
+  'ArraySingleProductOrderBook': 'zcoins.order_books.array_order_book',
+  'ArrayOrderBookSnapshot': 'zcoins.order_books.array_order_book',
+  'ExecutionCostEstimator': 'zcoins.order_books.execution_cost',
+  'ExecutionEstimate': 'zcoins.order_books.execution_cost',
+  'CoinbaseMultiProductOrderBook': 'zcoins.order_books.coinbase_order_book',
+  'BinanceMultiProductOrderBook': 'zcoins.order_books.binance_order_book',
+  'SharedMemoryBookPublisher': 'zcoins.order_books.shared_memory',
+  'SharedMemoryMultiProductOrderBook': 'zcoins.order_books.shared_memory',
+}
+
+
+def __getattr__(name):
+  if name not in _LAZY_NAMES:
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+  value = getattr(importlib.import_module(_LAZY_NAMES[name]), name)
+  globals()[name] = value
+  return value
+
+
+def __dir__():
+  return sorted(list(globals()) + list(_LAZY_NAMES))
@@ -0,0 +1,158 @@
+# This file contains a scanner for cyclic (e.g. triangular) arbitrage over the products of a MultiProductOrderBook.
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Text
+
+from zcoins.exchanges import OrderSide
+from zcoins.order_books.order_book import MultiProductOrderBook, SingleProductOrderBook
+
+
+@dataclass(frozen=True)
+class ArbitrageLeg:
+  product_id: Text
+  order_side: OrderSide  # BUY converts quote_currency into base_currency at the best ask, SELL does the opposite.
+  price: float
+
+
+@dataclass(frozen=True)
+class ArbitrageOpportunity:
+  currencies: tuple  # The currencies visited, starting and ending with the same one, e.g. ('BTC', 'ETH', 'USD', 'BTC')
+  legs: tuple  # The ArbitrageLegs that make up the cycle, in order.
+  edge: float  # The fractional gain from trading around the cycle at top-of-book, after fees.
+
+
+@dataclass(frozen=True)
+class _Cycle:
+  currencies: tuple
+  legs: tuple  # (product_id, OrderSide) pairs.
+
+
+class TriangularArbitrageScanner:
+  """Finds cycles of trades over a MultiProductOrderBook's currency graph that end with more than they started with.
+
+  Every tracked product is an edge in both directions between its base_currency and quote_currency. All cycles of 3
+  (and optionally 4) currencies are enumerated up-front and indexed by product, so when a product's top-of-book
+  changes only the cycles that trade that product are re-evaluated.
+
+  Opportunities are found at the top-of-book only, the size available at the best bid/ask is not considered.
+  """
+
+  def __init__(self, order_books: MultiProductOrderBook,
+               callback: Callable[[ArbitrageOpportunity], None] = None,
+               fee_rate: float = 0.0,
+               min_edge: float = 0.0,
+               max_cycle_length: int = 3):
+    """
+    Args:
+      order_books: The order-books to scan, call refresh() after adding order-books to it.
+      callback: Called with every ArbitrageOpportunity found while the scanner is started.
+      fee_rate: The fee paid on each leg, as a fraction of the amount traded (e.g. 0.005 for 0.5%).
+      min_edge: Only opportunities with an edge (after fees) greater than this are reported.
+      max_cycle_length: 3 for triangular cycles only, or 4 to also scan cycles of four currencies.
+    """
+    if max_cycle_length not in (3, 4):
+      raise ValueError('max_cycle_length must be 3 or 4.')
+    self.order_books = order_books
+    self.callback = callback
+    self.fee_rate = fee_rate
+    self.min_edge = min_edge
+    self.max_cycle_length = max_cycle_length
+    self._cycles = []
+    self._cycles_by_product = defaultdict(list)
+    self._top_of_book = {}  # product_id -> (best_bid_price, best_ask_price)
+    self._update_callback_ids = {}  # product_id -> (SingleProductOrderBook, identifier)
+    self.refresh()
+
+  def get_cycles(self) -> list:
+    """Returns every cycle being scanned, as tuples of currencies."""
+    return [cycle.currencies for cycle in self._cycles]
+
+  def refresh(self):
+    """Rebuilds the currency graph and cycles from the products currently tracked by the order-books."""
+    adjacency = defaultdict(list)  # currency -> [(next_currency, product_id, OrderSide)]
+    for product_id in list(self.order_books.get_tracked_products()):
+      order_book = self.order_books.get_order_book(product_id)
+      adjacency[order_book.quote_currency].append((order_book.base_currency, product_id, OrderSide.BUY))
+      adjacency[order_book.base_currency].append((order_book.quote_currency, product_id, OrderSide.SELL))
+    cycles = []
+    for start in sorted(adjacency):
+      self._find_cycles(adjacency, start, [start], [], cycles)
+    cycles_by_product = defaultdict(list)
+    for cycle in cycles:
+      for product_id in {product_id for product_id, _ in cycle.legs}:
+        cycles_by_product[product_id].append(cycle)
+    self._cycles, self._cycles_by_product = cycles, cycles_by_product
+    if self._update_callback_ids:
+      self.start()
+
+  def _find_cycles(self, adjacency, start, currencies: list, legs: list, cycles: list):
+    """Depth-first search for cycles back to start, only visiting currencies that sort after start.
+
+    Requiring start to be the smallest currency in the cycle means each cycle is found exactly once per direction.
+    """
+    for next_currency, product_id, side in adjacency[currencies[-1]]:
+      if next_currency == start and len(currencies) >= 3:
+        cycles.append(_Cycle(currencies=tuple(currencies) + (start,), legs=tuple(legs) + ((product_id, side),)))
+      elif next_currency > start and next_currency not in currencies and len(currencies) < self.max_cycle_length:
+        currencies.append(next_currency)
+        legs.append((product_id, side))
+        self._find_cycles(adjacency, start, currencies, legs, cycles)
+        currencies.pop()
+        legs.pop()
+
+  def start(self):
+    """Starts re-evaluating cycles whenever a tracked order-book changes."""
+    self.stop()
+    for product_id in self._cycles_by_product:
+      order_book = self.order_books.get_order_book(product_id)
+      self._update_top_of_book(order_book)
+      self._update_callback_ids[product_id] = (order_book, order_book.add_update_callback(self._on_update))
+
+  def stop(self):
+    for order_book, identifier in self._update_callback_ids.values():
+      order_book.remove_update_callback(identifier)
+    self._update_callback_ids.clear()
+
+  def scan(self) -> list[ArbitrageOpportunity]:
+    """Evaluates every cycle against the current top-of-book and returns the opportunities found."""
+    for product_id in self._cycles_by_product:
+      self._update_top_of_book(self.order_books.get_order_book(product_id))
+    return [opportunity for opportunity in map(self._evaluate, self._cycles) if opportunity is not None]
+
+  def _on_update(self, order_book: SingleProductOrderBook):
+    if not self._update_top_of_book(order_book):
+      return
+    for cycle in self._cycles_by_product.get(order_book.product_id, ()):
+      opportunity = self._evaluate(cycle)
+      if opportunity is not None and self.callback is not None:
+        self.callback(opportunity)
+
+  def _update_top_of_book(self, order_book: SingleProductOrderBook) -> bool:
+    """Caches the best bid and ask prices of order_book, returns True if they changed."""
+    best_bid, best_ask = order_book.get_best_bid(), order_book.get_best_ask()
+    top_of_book = (float(best_bid[0]) if best_bid else None, float(best_ask[0]) if best_ask else None)
+    if self._top_of_book.get(order_book.product_id) == top_of_book:
+      return False
+    self._top_of_book[order_book.product_id] = top_of_book
+    return True
+
+  def _evaluate(self, cycle: _Cycle):
+    """Returns an ArbitrageOpportunity if trading around cycle beats min_edge, otherwise None."""
+    amount = 1.0
+    prices = []
+    for product_id, side in cycle.legs:
+      best_bid, best_ask = self._top_of_book.get(product_id, (None, None))
+      price = best_ask if side is OrderSide.BUY else best_bid
+      if not price:
+        return None
+      amount *= (1.0 / price if side is OrderSide.BUY else price) * (1.0 - self.fee_rate)
+      prices.append(price)
+    edge = amount - 1.0
+    if edge <= self.min_edge:
+      return None
+    return ArbitrageOpportunity(currencies=cycle.currencies,
+                                legs=tuple(ArbitrageLeg(product_id=product_id, order_side=side, price=price)
+                                           for (product_id, side), price in zip(cycle.legs, prices)),
+                                edge=edge)
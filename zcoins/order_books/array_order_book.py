@@ -0,0 +1,230 @@
+# This file contains a SingleProductOrderBook that keeps its price levels in sorted numpy arrays.
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple, Text
+
+import numpy as np
+
+from zcoins.exchanges import OrderSide
+from zcoins.order_books.order_book import SingleProductOrderBook
+
+_EMPTY = np.empty(0, dtype=np.float64)
+_EMPTY.flags.writeable = False
+
+
+def _make_side(levels: Iterable) -> tuple:
+  """Makes a (prices, sizes) pair sorted by ascending price from (price, size) pairs, dropping empty levels."""
+  levels = np.array([(float(price), float(size)) for price, size in levels], dtype=np.float64).reshape(-1, 2)
+  levels = levels[levels[:, 1] != 0]
+  levels = levels[np.argsort(levels[:, 0], kind='stable')]
+  return _freeze(np.ascontiguousarray(levels[:, 0])), _freeze(np.ascontiguousarray(levels[:, 1]))
+
+
+def _freeze(array: np.ndarray) -> np.ndarray:
+  array.flags.writeable = False
+  return array
+
+
+def _update_side(side: tuple, price: float, size: float) -> tuple:
+  """Returns a new (prices, sizes) pair with the level at price set to size (or removed if size is 0)."""
+  prices, sizes = side
+  idx = int(np.searchsorted(prices, price))
+  found = idx < len(prices) and prices[idx] == price
+  if size == 0:
+    if not found:
+      return side
+    return _freeze(np.concatenate((prices[:idx], prices[idx + 1:]))), \
+        _freeze(np.concatenate((sizes[:idx], sizes[idx + 1:])))
+  if found:
+    new_sizes = sizes.copy()
+    new_sizes[idx] = size
+    return prices, _freeze(new_sizes)
+  new_prices = np.empty(len(prices) + 1, dtype=np.float64)
+  new_prices[:idx] = prices[:idx]
+  new_prices[idx] = price
+  new_prices[idx + 1:] = prices[idx:]
+  new_sizes = np.empty(len(sizes) + 1, dtype=np.float64)
+  new_sizes[:idx] = sizes[:idx]
+  new_sizes[idx] = size
+  new_sizes[idx + 1:] = sizes[idx:]
+  return _freeze(new_prices), _freeze(new_sizes)
+
+
+def _vwap(prices: np.ndarray, sizes: np.ndarray, size: float):
+  """VWAP of taking size from levels sorted best-first, None if there isn't enough depth."""
+  cumulative = np.cumsum(sizes)
+  idx = int(np.searchsorted(cumulative, size))
+  if size <= 0 or idx >= len(cumulative):
+    return None
+  filled_before = cumulative[idx - 1] if idx else 0.0
+  notional = np.dot(prices[:idx], sizes[:idx]) + (size - filled_before) * prices[idx]
+  return float(notional / size)
+
+
+class _ArrayBookState(NamedTuple):
+  version: int
+  bids: tuple  # (prices, sizes) sorted by ascending price.
+  asks: tuple  # (prices, sizes) sorted by ascending price.
+
+
+_EMPTY_STATE = _ArrayBookState(version=0, bids=(_EMPTY, _EMPTY), asks=(_EMPTY, _EMPTY))
+
+
+class _ArrayOrderBookView(SingleProductOrderBook):
+  """The read-only part of an array-backed order-book, every query reads self._state exactly once."""
+
+  def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text,
+               state: _ArrayBookState = _EMPTY_STATE):
+    super().__init__(product_id, base_currency, quote_currency)
+    self._state = state
+
+  def get_version(self) -> int:
+    return self._state.version
+
+  def get_snapshot(self, top_n: int = None):
+    """Returns an immutable view of the whole book, this is O(1) and top_n is ignored."""
+    return ArrayOrderBookSnapshot(self.product_id, self.base_currency, self.quote_currency, self._state)
+
+  def get_bid_arrays(self, top_n: int = None) -> tuple:
+    """Returns a (prices, sizes) pair of read-only array views of the bids, sorted from high-to-low by price."""
+    prices, sizes = self._state.bids
+    return prices[::-1][:top_n], sizes[::-1][:top_n]
+
+  def get_ask_arrays(self, top_n: int = None) -> tuple:
+    """Returns a (prices, sizes) pair of read-only array views of the asks, sorted from low-to-high by price."""
+    prices, sizes = self._state.asks
+    return prices[:top_n], sizes[:top_n]
+
+  def get_bids(self, top_n: int = None):
+    return list(zip(*(array.tolist() for array in self.get_bid_arrays(top_n))))
+
+  def get_asks(self, top_n: int = None):
+    return list(zip(*(array.tolist() for array in self.get_ask_arrays(top_n))))
+
+  def get_book(self, top_n: int = None):
+    snapshot = self.get_snapshot()  # Both sides come from the same state.
+    return {
+      'bids': snapshot.get_bids(top_n=top_n),
+      'asks': snapshot.get_asks(top_n=top_n)
+    }
+
+  def get_best_bid(self):
+    prices, sizes = self._state.bids
+    return (float(prices[-1]), float(sizes[-1])) if len(prices) else None
+
+  def get_best_ask(self):
+    prices, sizes = self._state.asks
+    return (float(prices[0]), float(sizes[0])) if len(prices) else None
+
+  def get_mid_price(self):
+    state = self._state
+    if not len(state.bids[0]) or not len(state.asks[0]):
+      return None
+    return (float(state.bids[0][-1]) + float(state.asks[0][0])) / 2
+
+  def get_spread(self):
+    state = self._state
+    if not len(state.bids[0]) or not len(state.asks[0]):
+      return None
+    return float(state.asks[0][0]) - float(state.bids[0][-1])
+
+  def get_cumulative_bid_depth(self, top_n: int = None) -> tuple:
+    """Returns a (prices, cumulative_sizes) pair for the bids, sorted from high-to-low by price."""
+    prices, sizes = self.get_bid_arrays(top_n)
+    return prices, np.cumsum(sizes)
+
+  def get_cumulative_ask_depth(self, top_n: int = None) -> tuple:
+    """Returns a (prices, cumulative_sizes) pair for the asks, sorted from low-to-high by price."""
+    prices, sizes = self.get_ask_arrays(top_n)
+    return prices, np.cumsum(sizes)
+
+  def get_vwap(self, side: OrderSide, size: float):
+    """Returns the volume-weighted average price of taking size from the book.
+
+    A BUY takes from the asks and a SELL takes from the bids. Returns None if the book isn't deep enough.
+    """
+    prices, sizes = self.get_ask_arrays() if side is OrderSide.BUY else self.get_bid_arrays()
+    return _vwap(prices, sizes, size)
+
+
+class ArrayOrderBookSnapshot(_ArrayOrderBookView):
+  """An immutable view of an ArraySingleProductOrderBook at a given version."""
+
+  def get_snapshot(self, top_n: int = None):
+    return self
+
+
+class ArraySingleProductOrderBook(_ArrayOrderBookView):
+  """A SingleProductOrderBook backed by sorted, contiguous numpy arrays of prices and sizes.
+
+  Each side is stored as a (prices, sizes) pair of read-only float64 arrays sorted by ascending price. Updates never
+  modify an array in-place, they build new arrays and swap in a new state holding both sides and the version. So the
+  views returned by get_bid_arrays and get_ask_arrays are never changed by later updates, and get_snapshot is O(1) and
+  never blocks (or is blocked by) the thread applying updates.
+
+  The book is maintained from level2 data with set_bids/set_asks (for snapshots) and update_bid/update_ask/apply_updates
+  (for changes), sizes of 0 remove a level.
+  """
+
+  def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text, max_depth: int = None):
+    """
+    Args:
+      max_depth: If set, only the best max_depth levels of each side are kept. Once levels have been discarded, the
+        worst price kept is remembered and updates beyond it are ignored until the side is replaced, so each side is
+        always an exact prefix of the full book (it may hold fewer than max_depth levels after removals).
+    """
+    super().__init__(product_id, base_currency, quote_currency)
+    if max_depth is not None and max_depth < 1:
+      raise ValueError('max_depth must be at least 1.')
+    self.max_depth = max_depth
+    # The worst price kept on each side after levels beyond max_depth were discarded, None if none were discarded.
+    self._bid_floor = None
+    self._ask_ceiling = None
+
+  def set_bids(self, levels: Iterable):
+    """Replaces all bids with the given (price, size) pairs."""
+    self._bid_floor = None
+    self._publish(self._state.version + 1, _make_side(levels), self._state.asks)
+
+  def set_asks(self, levels: Iterable):
+    """Replaces all asks with the given (price, size) pairs."""
+    self._ask_ceiling = None
+    self._publish(self._state.version + 1, self._state.bids, _make_side(levels))
+
+  def set_book(self, bids: Iterable, asks: Iterable):
+    """Replaces both sides of the book as a single update."""
+    self._bid_floor = self._ask_ceiling = None
+    self._publish(self._state.version + 1, _make_side(bids), _make_side(asks))
+
+  def update_bid(self, price: float, size: float):
+    self.apply_updates(bid_updates=((price, size),))
+
+  def update_ask(self, price: float, size: float):
+    self.apply_updates(ask_updates=((price, size),))
+
+  def apply_updates(self, bid_updates: Iterable = (), ask_updates: Iterable = ()):
+    """Applies (price, size) changes to both sides of the book as a single update."""
+    state = self._state
+    bids, asks = state.bids, state.asks
+    bid_floor, ask_ceiling = self._bid_floor, self._ask_ceiling
+    for price, size in bid_updates:
+      if bid_floor is None or price >= bid_floor:  # Levels below the floor were discarded, so they stay discarded.
+        bids = _update_side(bids, price, size)
+    for price, size in ask_updates:
+      if ask_ceiling is None or price <= ask_ceiling:
+        asks = _update_side(asks, price, size)
+    self._publish(state.version + 1, bids, asks)
+
+  def _publish(self, version: int, bids: tuple, asks: tuple):
+    max_depth = self.max_depth
+    if max_depth is not None:
+      # Trimmed sides are copied, so the discarded levels' memory is freed. The best bids are at the end.
+      if len(bids[0]) > max_depth:
+        bids = _freeze(bids[0][-max_depth:].copy()), _freeze(bids[1][-max_depth:].copy())
+        self._bid_floor = float(bids[0][0])
+      if len(asks[0]) > max_depth:
+        asks = _freeze(asks[0][:max_depth].copy()), _freeze(asks[1][:max_depth].copy())
+        self._ask_ceiling = float(asks[0][-1])
+    self._state = _ArrayBookState(version=version, bids=bids, asks=asks)
+    for callback in list(self._update_callbacks.values()):
+      callback(self)
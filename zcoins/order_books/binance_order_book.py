@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Text
+
+from zcoins.exchanges import ExchangeProductInfo
+from zcoins.order_books.array_order_book import ArraySingleProductOrderBook
+from zcoins.order_books.order_book import MultiProductOrderBook, SingleProductOrderBook
+
+
+class BinanceMultiProductOrderBook(MultiProductOrderBook):
+  # The depths Binance publishes partial book depth streams for.
+  DEPTHS = (5, 10, 20)
+
+  def __init__(self, exchange: ExchangeProductInfo,
+               websocket_manager=None,
+               product_ids: list[Text] = None,
+               depth: int = 20,
+               update_interval_ms: int = 100):
+    """Initializes the MultiProductOrderBook tracking Binance symbols.
+
+    Each symbol is an ArraySingleProductOrderBook holding the top depth levels of each side, replaced by every message
+    of the symbol's partial book depth stream.
+
+    Args:
+      exchange: Used to look up the base and quote currency of each symbol.
+      websocket_manager: A started ThreadedWebsocketManager (or stand-in, like
+        zcoins.feeds.LocalBinanceWebsocketManager), a new one is created and started if None.
+      product_ids: The symbols to track.
+      depth: The number of levels of each side to track, one of DEPTHS.
+      update_interval_ms: How often Binance publishes each symbol's book, 100 or 1000.
+    """
+    if depth not in self.DEPTHS:
+      raise ValueError('depth must be one of {}.'.format(self.DEPTHS))
+    self.exchange = exchange
+    self.depth = depth
+    self.update_interval_ms = update_interval_ms
+    if websocket_manager is None:
+      from binance import ThreadedWebsocketManager  # python-binance is only needed when connecting to Binance.
+      websocket_manager = ThreadedWebsocketManager()
+      websocket_manager.start()
+    self.websocket_manager = websocket_manager
+    self._streams = {}  # product_id -> depth stream name.
+    super().__init__(product_ids=product_ids)
+    self._post_subclass_init()
+
+  def make_single_product_order_book(self, product_id: Text) -> SingleProductOrderBook:
+    return self.make_multiple_product_order_book([product_id])[0]
+
+  def make_multiple_product_order_book(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
+    order_books = []
+    for product in self.exchange.get_products(product_ids):
+      order_book = ArraySingleProductOrderBook(product.product_id, product.base_currency, product.quote_currency)
+      self._streams[product.product_id] = self.websocket_manager.start_depth_socket(
+        callback=lambda message, order_book=order_book: self._consume_depth(order_book, message),
+        symbol=product.product_id, depth=self.depth, interval=self.update_interval_ms)
+      order_books.append(order_book)
+    return order_books
+
+  @staticmethod
+  def _consume_depth(order_book: ArraySingleProductOrderBook, message: dict):
+    if 'bids' in message and 'asks' in message:
+      order_book.set_book(bids=message['bids'], asks=message['asks'])
+
+  def _release_order_books(self, order_books: list[SingleProductOrderBook]):
+    for order_book in order_books:
+      stream = self._streams.pop(order_book.product_id, None)
+      if stream is not None:
+        self.websocket_manager.stop_socket(stream)
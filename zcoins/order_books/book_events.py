@@ -0,0 +1,180 @@
+# This file contains push-based subscriptions to changes in an order-book's top of book and near-mid depth.
+from __future__ import annotations
+
+import logging
+import time
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from threading import Lock, Timer
+from typing import Callable, Text
+
+
+@dataclass(slots=True)
+class TopOfBookEvent:
+  product_id: Text
+  best_bid: tuple  # (price, size), None if there are no bids.
+  best_ask: tuple  # (price, size), None if there are no asks.
+  version: int  # The version of the order-book the event was computed from.
+
+
+@dataclass(slots=True)
+class DepthEvent:
+  product_id: Text
+  percent: float  # The depth is summed over the levels within this percent of the mid price.
+  mid_price: float
+  bid_depth: float  # The total size (in base_currency) of the bids priced >= mid_price * (1 - percent / 100).
+  ask_depth: float  # The total size (in base_currency) of the asks priced <= mid_price * (1 + percent / 100).
+  version: int
+
+
+class BookSubscription(ABC):
+  """Watches an order-book, calling callback with an event whenever the watched quantity changes.
+
+  If min_interval is set, events are conflated: at most one event is delivered per min_interval seconds, and an event
+  that arrives sooner is held back (replacing any event already held back) and delivered from a timer thread once
+  the interval has passed. A held back event is dropped if it's equal to the last event delivered.
+
+  Subclasses implement _compute, which returns the watched quantity as an event, and _key.
+  """
+
+  def __init__(self, order_book, callback: Callable, min_interval: float = None):
+    self.order_book = order_book
+    self.callback = callback
+    self.min_interval = min_interval
+    self._lock = Lock()
+    self._last_value = None  # The last value computed from the order-book.
+    self._last_delivered = None
+    self._last_delivery_time = float('-inf')
+    self._pending = None
+    self._timer = None
+    self._closed = False
+    self._identifier = order_book.add_update_callback(self._on_update)
+
+  @staticmethod
+  @abstractmethod
+  def _key(event):
+    """The part of an event that is compared to decide whether the watched quantity changed."""
+
+  @abstractmethod
+  def _compute(self, order_book):
+    """Returns the watched quantity of order_book as an event."""
+
+  def _on_update(self, order_book):
+    event = self._compute(order_book)
+    key = self._key(event)
+    if key == self._last_value:
+      return
+    self._last_value = key
+    if not self.min_interval:
+      self._deliver(event)
+      return
+    with self._lock:
+      now = time.monotonic()
+      wait = self._last_delivery_time + self.min_interval - now
+      if self._timer is None and wait <= 0:
+        self._last_delivery_time = now
+      else:
+        self._pending = event
+        if self._timer is None:
+          self._timer = Timer(wait, self._deliver_pending)
+          self._timer.daemon = True
+          self._timer.start()
+        return
+    self._deliver(event)
+
+  def _deliver_pending(self):
+    with self._lock:
+      event, self._pending, self._timer = self._pending, None, None
+      self._last_delivery_time = time.monotonic()
+    if event is not None and self._key(event) != self._key(self._last_delivered):
+      self._deliver(event)
+
+  def _deliver(self, event):
+    if self._closed:
+      return
+    self._last_delivered = event
+    try:
+      self.callback(event)
+    except Exception:
+      logging.exception('Order-book subscriber raised an exception.')
+
+  def close(self):
+    """Stops delivering events, including any that are held back."""
+    self._closed = True
+    self.order_book.remove_update_callback(self._identifier)
+    with self._lock:
+      if self._timer is not None:
+        self._timer.cancel()
+      self._pending, self._timer = None, None
+
+
+class TopOfBookSubscription(BookSubscription):
+  """Delivers a TopOfBookEvent whenever the best bid or best ask (price or size) changes."""
+
+  @staticmethod
+  def _key(event: TopOfBookEvent):
+    return (event.best_bid, event.best_ask) if event is not None else None
+
+  def _compute(self, order_book) -> TopOfBookEvent:
+    return TopOfBookEvent(order_book.product_id, order_book.get_best_bid(), order_book.get_best_ask(),
+                          order_book.get_version())
+
+
+class DepthSubscription(BookSubscription):
+  """Delivers a DepthEvent whenever the depth on either side within percent of the mid price changes."""
+
+  # The number of levels first requested from order-books without array access, doubled until the band is covered.
+  _INITIAL_LEVELS = 16
+
+  def __init__(self, order_book, callback: Callable, percent: float, min_interval: float = None):
+    if percent <= 0:
+      raise ValueError('percent must be positive.')
+    self.percent = percent
+    super().__init__(order_book, callback, min_interval=min_interval)
+
+  @staticmethod
+  def _key(event: DepthEvent):
+    return (event.bid_depth, event.ask_depth) if event is not None else None
+
+  def _compute(self, order_book) -> DepthEvent:
+    version = order_book.get_version()
+    mid_price = order_book.get_mid_price()
+    if mid_price is None:
+      return DepthEvent(order_book.product_id, self.percent, None, 0.0, 0.0, version)
+    bid_limit, ask_limit = mid_price * (1 - self.percent / 100), mid_price * (1 + self.percent / 100)
+    if hasattr(order_book, 'get_bid_arrays'):
+      bid_prices, bid_sizes = order_book.get_bid_arrays()
+      ask_prices, ask_sizes = order_book.get_ask_arrays()
+      bid_depth = float(bid_sizes[bid_prices >= bid_limit].sum())
+      ask_depth = float(ask_sizes[ask_prices <= ask_limit].sum())
+    else:
+      bid_depth = self._sum_within(order_book.get_bids, lambda price: price >= bid_limit)
+      ask_depth = self._sum_within(order_book.get_asks, lambda price: price <= ask_limit)
+    return DepthEvent(order_book.product_id, self.percent, mid_price, bid_depth, ask_depth, version)
+
+  @classmethod
+  def _sum_within(cls, get_levels: Callable, within: Callable) -> float:
+    """Sums the sizes of the leading levels within the band, requesting more levels only while they are needed."""
+    top_n = cls._INITIAL_LEVELS
+    while True:
+      levels = get_levels(top_n=top_n)
+      total = 0.0
+      for price, size in levels:
+        if not within(float(price)):
+          return total
+        total += float(size)
+      if len(levels) < top_n:
+        return total
+      top_n *= 2
+
+
+class BookSubscriptionGroup:
+  """A set of BookSubscriptions (usually one per product) that are closed together."""
+
+  def __init__(self, subscriptions: list[BookSubscription]):
+    self.subscriptions = subscriptions
+
+  def close(self):
+    for subscription in self.subscriptions:
+      subscription.close()
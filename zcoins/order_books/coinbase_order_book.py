@@ -1,14 +1,22 @@
+import json
+import logging
+
 from typing import Text
+from websocket import WebSocketConnectionClosedException  # websocket-client, which zcoinbase's websocket runs on.
 from zcoinbase import ProductOrderBook, CoinbaseOrderBook, CoinbaseWebsocket, PublicClient
 
 from zcoins.exchanges import ExchangeProductInfo
-from zcoins.order_books import SingleProductOrderBook, MultiProductOrderBook
+from zcoins.order_books.array_order_book import ArraySingleProductOrderBook
+from zcoins.order_books.order_book import OrderBookSnapshot, SingleProductOrderBook, MultiProductOrderBook
 
 
 class _CoinbaseSingleProductOrderBook(SingleProductOrderBook):
   def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text, product_order_book: ProductOrderBook):
     super().__init__(product_id, base_currency, quote_currency)
     self.product_order_book = product_order_book
+    # The worst price kept on each side after _trim discarded levels, None if none were discarded, see _trim.
+    self._bid_floor = None
+    self._ask_ceiling = None
 
   def get_bids(self, top_n: int = None):
     return self.product_order_book.get_bids(top_n)
@@ -16,37 +24,231 @@ class _CoinbaseSingleProductOrderBook(SingleProductOrderBook):
   def get_asks(self, top_n: int = None):
     return self.product_order_book.get_asks(top_n)
 
+  def _read_snapshot_blocking(self, top_n: int = None):
+    # Changes are applied under the side locks, so holding both stops any change being applied during the read.
+    book = self.product_order_book
+    with book._bids_lock, book._asks_lock:
+      bids = tuple(ProductOrderBook._make_slice(book._bids, stop=top_n))
+      asks = tuple(ProductOrderBook._make_slice(book._asks, stop=top_n))
+      version = self._sequence >> 1
+    return OrderBookSnapshot(self.product_id, self.base_currency, self.quote_currency, version=version, bids=bids,
+                             asks=asks)
+
+  def _reset_discarded(self):
+    """Called before a snapshot replaces the book, which brings back the discarded levels."""
+    self._bid_floor = self._ask_ceiling = None
+
+  def _drop_discarded_changes(self, message: dict):
+    """Drops the changes in an l2update beyond the levels _trim kept.
+
+    Those levels were discarded, so applying changes to them would leave gaps (and ProductOrderBook can't delete them).
+    """
+    bid_floor, ask_ceiling = self._bid_floor, self._ask_ceiling
+    if bid_floor is None and ask_ceiling is None:
+      return
+    message['changes'] = [change for change in message['changes']
+                          if (bid_floor is None or float(change[1]) >= bid_floor if change[0] == 'buy'
+                              else ask_ceiling is None or float(change[1]) <= ask_ceiling)]
+
+  def _trim(self, max_depth: int):
+    """Discards the levels beyond max_depth on each side, remembering the worst price kept."""
+    book = self.product_order_book
+    for levels, lock, is_bids in ((book._bids, book._bids_lock, True), (book._asks, book._asks_lock, False)):
+      if len(levels) > max_depth:
+        with lock:
+          while len(levels) > max_depth:
+            levels.popitem()  # Both sides are sorted best-first.
+          worst_price = float(levels.peekitem()[0])
+        if is_bids:
+          self._bid_floor = worst_price
+        else:
+          self._ask_ceiling = worst_price
+
 
 class CoinbaseMultiProductOrderBook(MultiProductOrderBook):
   def __init__(self, exchange: ExchangeProductInfo,
                websocket_addr=CoinbaseWebsocket.PROD_ADDRESS,
                websocket: CoinbaseWebsocket = None,
-               product_ids: list[Text] = None):
+               product_ids: list[Text] = None,
+               array_backed: bool = False,
+               max_depth: int = None):
     """Initializes the MultiProductOrderBook tracking Coinbase products.
 
     If a websocket is supplied, this class *expects* that websocket will already be open, or this class will wait until
     it is Open.
+
+    If array_backed is True, the order-books are ArraySingleProductOrderBooks maintained directly from the level2
+    channel, instead of wrapping zcoinbase's ProductOrderBook.
+
+    If max_depth is set, each order-book only keeps the best max_depth levels of each side, levels beyond it are
+    discarded after every update and later changes beyond the worst price kept are ignored (until the next snapshot).
+    This bounds the memory and update cost of each order-book, each side is always an exact prefix of the full book but
+    may hold fewer than max_depth levels once levels near the top are removed.
+
+    Removed order-books are unsubscribed from the level2 channel only, see MultiProductOrderBook.remove_order_books.
     """
     self.exchange = exchange
+    self.array_backed = array_backed
+    if max_depth is not None and max_depth < 1:
+      raise ValueError('max_depth must be at least 1.')
+    self.max_depth = max_depth
     if product_ids is None:
       product_ids = []
     super().__init__(product_ids=product_ids)
-    if websocket is not None:
-      self.internal_order_book = CoinbaseOrderBook(websocket)
-      websocket.wait_for_open()
+    # Products whose order-books were removed. They stay in the websocket's products_to_listen, as its other channels
+    # (e.g. ticker) may still use them, but are unsubscribed from level2 again whenever the websocket resubscribes.
+    self._level2_released = set()
+    # The order-books updated from the websocket are created before their products are subscribed, so that every update
+    # (including the first snapshot) is applied to, or bracketed for, a registered order-book.
+    if array_backed:
+      self.internal_order_book = None
+      self._array_order_books = {}
+      self.websocket = self._init_array_backed_websocket(websocket, websocket_addr, product_ids)
     else:
-      self.internal_order_book = CoinbaseOrderBook.make_order_book(product_ids=product_ids,
-                                                                   websocket_addr=websocket_addr)
+      self._coinbase_order_books = {}  # The order-books wrapping internal_order_book's, keyed by product_id.
+      self.websocket = self._init_internal_order_book(websocket, websocket_addr, product_ids)
     self._post_subclass_init()
 
+  def _init_internal_order_book(self, websocket: CoinbaseWebsocket, websocket_addr, product_ids: list[Text]):
+    """Creates the zcoinbase CoinbaseOrderBook, bracketing each of its updates with _begin_update/_end_update.
+
+    Channel functions run in the order they were added, so the hooks added before and after the CoinbaseOrderBook
+    is created run before and after it applies a message.
+    """
+    start_websocket = websocket is None
+    if start_websocket:
+      websocket = CoinbaseWebsocket(websocket_addr=websocket_addr, products_to_listen=product_ids, autostart=False)
+    for channel in ('snapshot', 'l2update'):
+      websocket.add_channel_function(channel, self._begin_product_update, refresh_subscriptions=False)
+    self.internal_order_book = CoinbaseOrderBook(websocket)
+    for channel in ('snapshot', 'l2update'):
+      websocket.add_channel_function(channel, self._end_product_update, refresh_subscriptions=False)
+    websocket.add_channel_function('open_websocket', self._on_websocket_open, refresh_subscriptions=False)
+    self._create_coinbase_order_books(self.exchange.get_products(product_ids))
+    if start_websocket:
+      websocket.start_websocket_in_thread()
+    websocket.wait_for_open()
+    return websocket
+
+  def _begin_product_update(self, message: dict):
+    order_book = self._coinbase_order_books.get(message['product_id'])
+    if order_book is not None:
+      order_book._begin_update()
+      if self.max_depth is not None:
+        if message['type'] == 'l2update':
+          order_book._drop_discarded_changes(message)
+        else:
+          order_book._reset_discarded()
+
+  def _end_product_update(self, message: dict):
+    order_book = self._coinbase_order_books.get(message['product_id'])
+    if order_book is not None:
+      if self.max_depth is not None:
+        order_book._trim(self.max_depth)
+      order_book._end_update()
+
+  def _init_array_backed_websocket(self, websocket: CoinbaseWebsocket, websocket_addr, product_ids: list[Text]):
+    """Subscribes to the level2 channel, feeding updates straight into the array-backed order-books."""
+    start_websocket = websocket is None
+    if start_websocket:
+      websocket = CoinbaseWebsocket(websocket_addr=websocket_addr, products_to_listen=list(product_ids),
+                                    autostart=False)
+    if 'level2' not in websocket.extra_channels:
+      websocket.add_channel('level2')
+    websocket.add_channel_function('snapshot', self._consume_snapshot, refresh_subscriptions=False)
+    websocket.add_channel_function('l2update', self._consume_l2update, refresh_subscriptions=False)
+    websocket.add_channel_function('open_websocket', self._on_websocket_open, refresh_subscriptions=False)
+    self._create_array_order_books(websocket, self.exchange.get_products(product_ids))
+    if start_websocket:
+      websocket.start_websocket_in_thread()
+    websocket.wait_for_open()
+    return websocket
+
+  def _consume_snapshot(self, message: dict):
+    order_book = self._array_order_books.get(message['product_id'])
+    if order_book is not None:
+      order_book.set_book(bids=message['bids'], asks=message['asks'])
+
+  def _consume_l2update(self, message: dict):
+    order_book = self._array_order_books.get(message['product_id'])
+    if order_book is not None:
+      changes = message['changes']
+      order_book.apply_updates(
+        bid_updates=[(float(price), float(size)) for side, price, size in changes if side == 'buy'],
+        ask_updates=[(float(price), float(size)) for side, price, size in changes if side == 'sell'])
+
   def make_single_product_order_book(self, product_id: Text) -> SingleProductOrderBook:
     return self.make_multiple_product_order_book([product_id])[0]
 
   def make_multiple_product_order_book(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
-    self.internal_order_book.add_order_books(product_ids)
-    order_books = []
-    for product_id in product_ids:
-      order_books.append(_CoinbaseSingleProductOrderBook(product_id, self.exchange.get_base_currency(product_id),
-                                                         self.exchange.get_quote_currency(product_id),
-                                                         self.internal_order_book.get_order_book(product_id)))
+    if self.array_backed:
+      return self._make_array_order_books(product_ids)
+    order_books = self._create_coinbase_order_books(self.exchange.get_products(product_ids))
+    self._subscribe(product_ids)
     return order_books
+
+  def _create_coinbase_order_books(self, products: list) -> list[SingleProductOrderBook]:
+    """Wraps the zcoinbase ProductOrderBooks of products (creating them if needed) without subscribing to them."""
+    self.internal_order_book.add_order_books([product.product_id for product in products], refresh_subscriptions=False)
+    for product in products:
+      if product.product_id not in self._coinbase_order_books:
+        self._coinbase_order_books[product.product_id] = _CoinbaseSingleProductOrderBook(
+          product.product_id, product.base_currency, product.quote_currency,
+          self.internal_order_book.get_order_book(product.product_id))
+    return [self._coinbase_order_books[product.product_id] for product in products]
+
+  def _make_array_order_books(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
+    order_books = self._create_array_order_books(self.websocket, self.exchange.get_products(product_ids))
+    self._subscribe(product_ids)
+    return order_books
+
+  def _create_array_order_books(self, websocket: CoinbaseWebsocket, products: list) -> list[SingleProductOrderBook]:
+    """Creates the array-backed order-books of products (if needed) and adds them to the websocket's products."""
+    for product in products:
+      if product.product_id not in self._array_order_books:
+        self._array_order_books[product.product_id] = ArraySingleProductOrderBook(
+          product.product_id, product.base_currency, product.quote_currency, max_depth=self.max_depth)
+        websocket.add_product(product.product_id, refresh_subscriptions=False)
+    return [self._array_order_books[product.product_id] for product in products]
+
+  def _subscribe(self, product_ids: list[Text]):
+    """Subscribes the websocket's products, which resubscribes every product to level2, even released ones."""
+    self._level2_released.difference_update(product_ids)
+    self.websocket.subscribe()
+    if self._level2_released:
+      self._release_level2(list(self._level2_released))
+
+  def _on_websocket_open(self, _):
+    # The websocket resubscribed every product when it (re)connected.
+    if self._level2_released:
+      self._release_level2(list(self._level2_released))
+
+  def _release_order_books(self, order_books: list[SingleProductOrderBook]):
+    product_ids = [order_book.product_id for order_book in order_books]
+    for product_id in product_ids:
+      if self.array_backed:
+        self._array_order_books.pop(product_id, None)
+      else:
+        self._coinbase_order_books.pop(product_id, None)
+    self._level2_released.update(product_ids)
+    self._release_level2(product_ids)
+
+  def _release_level2(self, product_ids: list[Text]):
+    """Stops zcoinbase maintaining the order-books of product_ids, and unsubscribes them from the level2 channel.
+
+    zcoinbase has no API for either, so this depends on its internals: CoinbaseOrderBook._order_books holds the
+    ProductOrderBooks it updates, and CoinbaseWebsocket.ws is the websocket-client WebSocketApp it sends on. If the
+    socket isn't open, the unsubscribe is skipped, it is sent again when the socket reopens (see _on_websocket_open).
+    The products' other channels (e.g. ticker) are unaffected. Idempotent.
+    """
+    if self.internal_order_book is not None:
+      for product_id in product_ids:
+        self.internal_order_book._order_books.pop(product_id, None)
+    unsubscribe = getattr(self.websocket, 'unsubscribe', None)
+    if unsubscribe is not None:
+      unsubscribe(product_ids, ['level2'])
+      return
+    try:
+      self.websocket.ws.send(json.dumps({'type': 'unsubscribe', 'product_ids': product_ids, 'channels': ['level2']}))
+    except WebSocketConnectionClosedException:
+      logging.info('Websocket closed, level2 of %s will be unsubscribed when it reopens.', product_ids)
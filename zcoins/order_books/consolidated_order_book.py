@@ -0,0 +1,171 @@
+# This file contains order-books that consolidate the order-books of the same product on several exchanges (venues).
+from __future__ import annotations
+
+import heapq
+
+from itertools import islice
+from threading import Lock
+from typing import NamedTuple, Text
+
+from zcoins.order_books.order_book import MultiProductOrderBook, SingleProductOrderBook
+
+
+class ConsolidatedLevel(NamedTuple):
+  price: float
+  size: float
+  venue: Text  # The name of the exchange the level is on.
+
+
+def _bid_key(level: ConsolidatedLevel):
+  return -level.price
+
+
+def _ask_key(level: ConsolidatedLevel):
+  return level.price
+
+
+class ConsolidatedOrderBook(SingleProductOrderBook):
+  """Consolidates the order-books of one product on several venues.
+
+  The top depth levels of each venue's book are cached (as ConsolidatedLevels), and only the cache of a venue that
+  updates is refreshed. Queries merge the cached, already sorted, per-venue levels lazily with a heap, so asking for
+  the top n levels costs O(n log venues) regardless of the depth of the books. Levels at the same price on different
+  venues are kept separate, so each level is attributed to its venue.
+  """
+
+  def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text, venue_books: dict,
+               depth: int = 50):
+    """
+    Args:
+      product_id: The consolidated product_id.
+      venue_books: SingleProductOrderBooks of this product keyed by venue name.
+      depth: The number of levels of each side cached per venue, which bounds the depth of the consolidated book.
+    """
+    super().__init__(product_id, base_currency, quote_currency)
+    self.depth = depth
+    self.venue_books = dict(venue_books)
+    self._lock = Lock()
+    self._levels = {}  # venue -> (bids, asks), each a tuple of ConsolidatedLevels sorted best-first.
+    self._callback_ids = {}
+    for venue, order_book in self.venue_books.items():
+      self._refresh_venue(venue, order_book)
+      self._callback_ids[venue] = order_book.add_update_callback(
+        lambda updated_book, venue=venue: self._on_venue_update(venue, updated_book))
+
+  def _refresh_venue(self, venue: Text, order_book: SingleProductOrderBook):
+    bids = tuple(ConsolidatedLevel(float(price), float(size), venue)
+                 for price, size in order_book.get_bids(top_n=self.depth))
+    asks = tuple(ConsolidatedLevel(float(price), float(size), venue)
+                 for price, size in order_book.get_asks(top_n=self.depth))
+    self._levels = {**self._levels, venue: (bids, asks)}  # Replaced, never mutated, so readers need no lock.
+
+  def _on_venue_update(self, venue: Text, order_book: SingleProductOrderBook):
+    with self._lock:
+      self._begin_update()
+      self._refresh_venue(venue, order_book)
+      self._end_update()
+
+  def _read_snapshot_blocking(self, top_n: int = None):
+    with self._lock:  # Held while venues are refreshed.
+      return self._try_read_snapshot(top_n)
+
+  def get_attributed_bids(self, top_n: int = None) -> list[ConsolidatedLevel]:
+    """Returns the bids of all venues as ConsolidatedLevels, sorted from high-to-low by price."""
+    levels = self._levels
+    return list(islice(heapq.merge(*(bids for bids, _ in levels.values()), key=_bid_key), top_n))
+
+  def get_attributed_asks(self, top_n: int = None) -> list[ConsolidatedLevel]:
+    """Returns the asks of all venues as ConsolidatedLevels, sorted from low-to-high by price."""
+    levels = self._levels
+    return list(islice(heapq.merge(*(asks for _, asks in levels.values()), key=_ask_key), top_n))
+
+  def get_bids(self, top_n: int = None):
+    return [(level.price, level.size) for level in self.get_attributed_bids(top_n)]
+
+  def get_asks(self, top_n: int = None):
+    return [(level.price, level.size) for level in self.get_attributed_asks(top_n)]
+
+  def get_best_bid_venue(self) -> Text:
+    """Returns the venue with the highest bid, None if there are no bids."""
+    bids = self.get_attributed_bids(1)
+    return bids[0].venue if bids else None
+
+  def get_best_ask_venue(self) -> Text:
+    """Returns the venue with the lowest ask, None if there are no asks."""
+    asks = self.get_attributed_asks(1)
+    return asks[0].venue if asks else None
+
+  def close(self):
+    """Stops following the venues' order-books."""
+    for venue, callback_id in self._callback_ids.items():
+      self.venue_books[venue].remove_update_callback(callback_id)
+    self._callback_ids.clear()
+
+
+class ConsolidatedMultiProductOrderBook(MultiProductOrderBook):
+  """Consolidates the order-books of several exchanges by base and quote currency.
+
+  Consolidated product ids are '{base_currency}-{quote_currency}', each venue's product id is found with its
+  make_product_id. Only venues already tracking the product contribute, unless add_order_books is True.
+
+  Usage:
+    books = ConsolidatedMultiProductOrderBook({'coinbase': coinbase, 'binance': binance}, product_ids=['BTC-USDT'])
+    books.get_order_book('BTC-USDT').get_attributed_bids(10)
+  """
+
+  def __init__(self, venues: dict, product_ids: list[Text] = None, depth: int = 50, add_order_books: bool = False):
+    """
+    Args:
+      venues: Exchanges keyed by venue name.
+      product_ids: Consolidated product ids, e.g. 'BTC-USD'.
+      depth: The number of levels of each side cached per venue, see ConsolidatedOrderBook.
+      add_order_books: If True, venues that list a product but don't track it start tracking it.
+    """
+    self.venues = dict(venues)
+    self.depth = depth
+    self.add_venue_order_books = add_order_books
+    super().__init__(product_ids=product_ids)
+    self._post_subclass_init()
+
+  @classmethod
+  def make_product_id(cls, base_currency: Text, quote_currency: Text) -> Text:
+    return '{}-{}'.format(base_currency.upper(), quote_currency.upper())
+
+  def add_order_books(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
+    return super().add_order_books([self.make_product_id(*product_id.split('-')) for product_id in product_ids])
+
+  def get_order_book(self, product_id) -> SingleProductOrderBook:
+    return super().get_order_book(product_id.upper())
+
+  def _get_venue_order_book(self, exchange, base_currency: Text, quote_currency: Text) -> SingleProductOrderBook:
+    """Returns the exchange's order-book of base_currency/quote_currency, None if it doesn't have (or track) one."""
+    product_id = exchange.make_product_id(base_currency=base_currency, quote_currency=quote_currency)
+    order_books = exchange.get_all_order_books()
+    if product_id in order_books.get_tracked_products():
+      return order_books.get_order_book(product_id)
+    if not self.add_venue_order_books:
+      return None
+    try:
+      exchange.get_product(product_id)
+    except Exception:
+      return None  # The venue doesn't list the product.
+    return exchange.add_order_book(product_id)
+
+  def make_single_product_order_book(self, product_id: Text) -> SingleProductOrderBook:
+    base_currency, quote_currency = product_id.split('-')
+    venue_books = {}
+    for venue, exchange in self.venues.items():
+      order_book = self._get_venue_order_book(exchange, base_currency, quote_currency)
+      if order_book is not None:
+        venue_books[venue] = order_book
+    if not venue_books:
+      raise KeyError('no venue tracks {}.'.format(product_id))
+    return ConsolidatedOrderBook(product_id, base_currency, quote_currency, venue_books, depth=self.depth)
+
+  def _release_order_books(self, order_books: list[SingleProductOrderBook]):
+    for order_book in order_books:
+      order_book.close()
+
+  def close(self):
+    for order_book in self._order_books.values():
+      order_book.close()
@@ -0,0 +1,170 @@
+# This file contains an estimator for the cost of executing market orders against an order-book.
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Text
+
+import numpy as np
+
+from zcoins.exchanges import OrderSide
+from zcoins.order_books.array_order_book import ArrayOrderBookSnapshot
+from zcoins.order_books.order_book import SingleProductOrderBook
+
+
+@dataclass
+class ExecutionEstimate:
+  """The expected result of a market order, estimated by walking the current order-book."""
+  product_id: Text
+  order_side: OrderSide
+  filled_size: float  # The size (in base_currency) that would be filled.
+  funds: float  # The funds (in quote_currency) that would be spent (BUY) or received (SELL).
+  average_price: float  # None if nothing would be filled.
+  best_price: float  # The price of the first level consumed, None if the book is empty.
+  worst_price: float  # The price of the last level consumed, None if nothing would be filled.
+  levels_consumed: int
+  fully_filled: bool  # False if the book isn't deep enough to fill the whole order.
+
+  @property
+  def slippage(self):
+    """The fraction by which average_price is worse than best_price, None if nothing would be filled."""
+    if self.average_price is None or not self.best_price:
+      return None
+    if self.order_side is OrderSide.BUY:
+      return (self.average_price - self.best_price) / self.best_price
+    return (self.best_price - self.average_price) / self.best_price
+
+
+def _extend_cumsum(previous: np.ndarray, start: int, values: np.ndarray) -> np.ndarray:
+  """Returns the cumulative sum of values, reusing previous (the cumulative sum of values that match up to start)."""
+  if not start:
+    return np.cumsum(values)
+  # Summing on from previous[start - 1] adds in the same order as np.cumsum, so the result is identical.
+  return np.concatenate((previous[:start], np.cumsum(np.concatenate((previous[start - 1:start], values[start:])))[1:]))
+
+
+class _CumulativeSide:
+  """Prefix sums of one side of an order-book (best price first) at a given version."""
+  __slots__ = ['version', 'prices', 'sizes', 'cumulative_sizes', 'cumulative_funds']
+
+  def __init__(self, version: int, prices: np.ndarray, sizes: np.ndarray, previous: _CumulativeSide = None):
+    """
+    Args:
+      previous: The same side at an earlier version, its prefix sums are reused up to the first level that changed.
+    """
+    self.version = version
+    self.prices = prices
+    self.sizes = sizes
+    start = 0 if previous is None else previous._first_change(prices, sizes)
+    self.cumulative_sizes = _extend_cumsum(previous.cumulative_sizes if start else None, start, sizes)
+    self.cumulative_funds = _extend_cumsum(previous.cumulative_funds if start else None, start, prices * sizes)
+
+  def _first_change(self, prices: np.ndarray, sizes: np.ndarray) -> int:
+    """Returns the index of the first level that differs from prices and sizes."""
+    n = min(len(self.prices), len(prices))
+    changed = np.flatnonzero((self.prices[:n] != prices[:n]) | (self.sizes[:n] != sizes[:n]))
+    return int(changed[0]) if len(changed) else n
+
+  def estimate(self, product_id: Text, order_side: OrderSide, size: float = None, funds: float = None):
+    # Find the level that completes the order, everything before it is consumed entirely.
+    if size is not None:
+      idx = int(np.searchsorted(self.cumulative_sizes, size))
+    else:
+      idx = int(np.searchsorted(self.cumulative_funds, funds))
+    return self.estimate_at(idx, product_id, order_side, size=size, funds=funds)
+
+  def estimate_at(self, idx: int, product_id: Text, order_side: OrderSide, size: float = None, funds: float = None):
+    """Returns the estimate of an order completed by level idx, the searchsorted index of size or funds."""
+    if len(self.prices) == 0:
+      return ExecutionEstimate(product_id=product_id, order_side=order_side, filled_size=0.0, funds=0.0,
+                               average_price=None, best_price=None, worst_price=None, levels_consumed=0,
+                               fully_filled=False)
+    if idx >= len(self.prices):
+      filled_size, spent = float(self.cumulative_sizes[-1]), float(self.cumulative_funds[-1])
+      fully_filled, levels_consumed = False, len(self.prices)
+    else:
+      size_before = float(self.cumulative_sizes[idx - 1]) if idx else 0.0
+      funds_before = float(self.cumulative_funds[idx - 1]) if idx else 0.0
+      price = float(self.prices[idx])
+      if size is not None:
+        filled_size, spent = size, funds_before + (size - size_before) * price
+      else:
+        filled_size, spent = size_before + (funds - funds_before) / price, funds
+      fully_filled, levels_consumed = True, idx + 1
+    return ExecutionEstimate(product_id=product_id, order_side=order_side, filled_size=filled_size, funds=spent,
+                             average_price=spent / filled_size if filled_size else None,
+                             best_price=float(self.prices[0]),
+                             worst_price=float(self.prices[levels_consumed - 1]) if filled_size else None,
+                             levels_consumed=levels_consumed if filled_size else 0, fully_filled=fully_filled)
+
+
+class ExecutionCostEstimator:
+  """Estimates the average fill price, worst price and levels consumed of market orders.
+
+  The cumulative size and funds of each side of a book are computed once per book version and cached, so repeated
+  estimates against a book that hasn't changed are O(log levels). When a book changes, the cached sums are kept up to
+  the first level that changed and only the levels from there on are summed again.
+  """
+
+  def __init__(self, max_depth: int = None):
+    """
+    Args:
+      max_depth (int): Only consider this many levels of each book, None considers the entire book.
+    """
+    self.max_depth = max_depth
+    self._cumulative_sides = {}  # (product_id, OrderSide) -> _CumulativeSide
+
+  def estimate(self, order_book: SingleProductOrderBook, side: OrderSide, size: float = None,
+               funds: float = None) -> ExecutionEstimate:
+    """Estimates a market order of size (in base_currency) or funds (in quote_currency).
+
+    A BUY takes from the asks and a SELL takes from the bids, exactly one of size and funds must be specified.
+    """
+    if (size is None) == (funds is None):
+      raise ValueError('exactly one of size and funds must be specified.')
+    return self._get_cumulative_side(order_book, side).estimate(order_book.product_id, side, size=size, funds=funds)
+
+  def estimate_many(self, order_books: list[SingleProductOrderBook], side: OrderSide, size: float = None,
+                    funds: float = None) -> dict:
+    """Estimates the same market order against every book, returns a dict of ExecutionEstimate keyed by product_id.
+
+    The completing level of every book is found in one pass over the books' concatenated prefix sums, rather than a
+    search per book; the prefix sums of books that changed are still brought up to date one book at a time.
+    """
+    if (size is None) == (funds is None):
+      raise ValueError('exactly one of size and funds must be specified.')
+    cumulative_sides = [self._get_cumulative_side(order_book, side) for order_book in order_books]
+    if not cumulative_sides:
+      return {}
+    target = size if size is not None else funds
+    cumulative = np.concatenate([cumulative_side.cumulative_sizes if size is not None
+                                 else cumulative_side.cumulative_funds for cumulative_side in cumulative_sides])
+    # Prefix sums are non-decreasing, so the number of levels below the target is searchsorted's (left) index.
+    levels_below = np.concatenate(([0], np.cumsum(cumulative < target)))
+    ends = np.cumsum([len(cumulative_side.prices) for cumulative_side in cumulative_sides])
+    starts = np.concatenate(([0], ends[:-1]))
+    indices = levels_below[ends] - levels_below[starts]
+    return {order_book.product_id: cumulative_side.estimate_at(int(idx), order_book.product_id, side, size=size,
+                                                               funds=funds)
+            for order_book, cumulative_side, idx in zip(order_books, cumulative_sides, indices)}
+
+  def forget(self, product_id: Text):
+    """Drops the cached sides of product_id, e.g. once its order-book is no longer tracked."""
+    for side in OrderSide:
+      self._cumulative_sides.pop((product_id, side), None)
+
+  def _get_cumulative_side(self, order_book: SingleProductOrderBook, side: OrderSide) -> _CumulativeSide:
+    key = (order_book.product_id, side)
+    cumulative_side = self._cumulative_sides.get(key)
+    if cumulative_side is not None and not order_book.has_changed_since(cumulative_side.version):
+      return cumulative_side
+    snapshot = order_book.get_snapshot(top_n=self.max_depth)
+    if isinstance(snapshot, ArrayOrderBookSnapshot):
+      prices, sizes = snapshot.get_ask_arrays(self.max_depth) if side is OrderSide.BUY \
+        else snapshot.get_bid_arrays(self.max_depth)
+    else:
+      levels = snapshot.get_asks(self.max_depth) if side is OrderSide.BUY else snapshot.get_bids(self.max_depth)
+      levels = np.array(levels, dtype=np.float64).reshape(-1, 2)
+      prices, sizes = levels[:, 0], levels[:, 1]
+    cumulative_side = _CumulativeSide(snapshot.get_version(), prices, sizes, previous=cumulative_side)
+    self._cumulative_sides[key] = cumulative_side
+    return cumulative_side
@@ -1,9 +1,15 @@
 # This file contains the interfaces that can be used for any order-book on the zcoins platform.
 
+import time
+import uuid
+
 from abc import ABC, abstractmethod
-from collections import defaultdict
-from typing import Text
+from collections import defaultdict, OrderedDict
+from threading import Event, RLock, Thread
+from typing import Callable, Text
 
+# The number of optimistic reads get_snapshot attempts before falling back to _read_snapshot_blocking.
+_MAX_SNAPSHOT_ATTEMPTS = 100
 
 class SingleProductOrderBook(ABC):
   """Contains the order-book for a single product."""
@@ -18,6 +24,9 @@ class SingleProductOrderBook(ABC):
     self.product_id = product_id
     self.base_currency = base_currency
     self.quote_currency = quote_currency
+    # Seqlock-style sequence number, odd while an update is being applied. The version is half of this.
+    self._sequence = 0
+    self._update_callbacks = {}
 
   @abstractmethod
   def get_bids(self, top_n: int = None):
@@ -64,6 +73,153 @@ class SingleProductOrderBook(ABC):
       'asks': self.get_asks(top_n=top_n)
     }
 
+  def get_version(self) -> int:
+    """Returns the version of this order-book, which increases every time an update is applied."""
+    return self._sequence >> 1
+
+  def has_changed_since(self, version: int) -> bool:
+    """Returns True if the order-book has been updated since get_version() returned version."""
+    return self.get_version() != version
+
+  def get_snapshot(self, top_n: int = None):
+    """Returns an immutable SingleProductOrderBook with a consistent view of the bids and asks.
+
+    The snapshot is taken optimistically: the bids and asks are read and the read is retried if an update was applied
+    in the meantime, so readers usually don't block the thread applying updates. If updates keep landing during the
+    read, it falls back to _read_snapshot_blocking after _MAX_SNAPSHOT_ATTEMPTS reads.
+
+    Args:
+      top_n (int): Controls the depth of the snapshot.
+    """
+    for _ in range(_MAX_SNAPSHOT_ATTEMPTS):
+      snapshot = self._try_read_snapshot(top_n)
+      if snapshot is not None:
+        return snapshot
+      time.sleep(0)  # Let the writer finish its update.
+    return self._read_snapshot_blocking(top_n)
+
+  def _try_read_snapshot(self, top_n: int = None):
+    """Returns an OrderBookSnapshot, None if an update was applied during the read."""
+    sequence = self._sequence
+    if sequence & 1:
+      return None
+    bids = tuple(self.get_bids(top_n=top_n))
+    asks = tuple(self.get_asks(top_n=top_n))
+    if sequence != self._sequence:
+      return None
+    return OrderBookSnapshot(self.product_id, self.base_currency, self.quote_currency, version=sequence >> 1,
+                             bids=bids, asks=asks)
+
+  def _read_snapshot_blocking(self, top_n: int = None):
+    """Takes a snapshot once optimistic reads keep failing.
+
+    Implementations should read under the locks the writer holds while applying updates, by default reads are retried
+    with an increasing back-off, so the writer gets time to finish its update.
+    """
+    delay = 0.0001
+    while True:
+      snapshot = self._try_read_snapshot(top_n)
+      if snapshot is not None:
+        return snapshot
+      time.sleep(delay)
+      delay = min(delay * 2, 0.01)
+
+  def add_update_callback(self, callback: Callable) -> Text:
+    """Adds a callback that is called with this order-book after every update.
+
+    Returns:
+      A unique identifier (str) that can be used to remove the callback in the future.
+    """
+    identifier = str(uuid.uuid4())
+    self._update_callbacks[identifier] = callback
+    return identifier
+
+  def remove_update_callback(self, identifier: Text):
+    """Removes the callback by it's identifier."""
+    self._update_callbacks.pop(identifier, None)
+
+  def subscribe_top_of_book(self, callback: Callable, min_interval: float = None):
+    """Calls callback with a TopOfBookEvent whenever the best bid or ask of this order-book changes.
+
+    Args:
+      callback: Called with each TopOfBookEvent, on the thread applying updates (or a timer thread, if conflated).
+      min_interval: If set, events are conflated to at most one per min_interval seconds, see BookSubscription.
+
+    Returns:
+      A BookSubscription, close it to unsubscribe.
+    """
+    from zcoins.order_books.book_events import TopOfBookSubscription
+    return TopOfBookSubscription(self, callback, min_interval=min_interval)
+
+  def subscribe_depth(self, callback: Callable, percent: float, min_interval: float = None):
+    """Calls callback with a DepthEvent whenever the depth within percent of the mid price changes, on either side.
+
+    Args:
+      callback: Called with each DepthEvent, on the thread applying updates (or a timer thread, if conflated).
+      percent: The width of the band around the mid price, e.g. 0.5 watches the levels within 0.5% of the mid.
+      min_interval: If set, events are conflated to at most one per min_interval seconds, see BookSubscription.
+
+    Returns:
+      A BookSubscription, close it to unsubscribe.
+    """
+    from zcoins.order_books.book_events import DepthSubscription
+    return DepthSubscription(self, callback, percent, min_interval=min_interval)
+
+  def _begin_update(self):
+    """Must be called by implementations before they start applying an update."""
+    if not self._sequence & 1:
+      self._sequence += 1
+
+  def _end_update(self):
+    """Must be called by implementations once they finish applying an update."""
+    if self._sequence & 1:
+      self._sequence += 1
+      for callback in list(self._update_callbacks.values()):
+        callback(self)
+
+  def get_best_bid(self):
+    """Returns the highest (price, size) bid, or None if there are no bids."""
+    bids = self.get_bids(top_n=1)
+    return tuple(bids[0]) if bids else None
+
+  def get_best_ask(self):
+    """Returns the lowest (price, size) ask, or None if there are no asks."""
+    asks = self.get_asks(top_n=1)
+    return tuple(asks[0]) if asks else None
+
+  def get_mid_price(self):
+    """Returns the price half-way between the best bid and best ask, or None if either side is empty."""
+    best_bid, best_ask = self.get_best_bid(), self.get_best_ask()
+    if best_bid is None or best_ask is None:
+      return None
+    return (float(best_bid[0]) + float(best_ask[0])) / 2
+
+  def get_spread(self):
+    """Returns the best ask price minus the best bid price, or None if either side is empty."""
+    best_bid, best_ask = self.get_best_bid(), self.get_best_ask()
+    if best_bid is None or best_ask is None:
+      return None
+    return float(best_ask[0]) - float(best_bid[0])
+
+
+class OrderBookSnapshot(SingleProductOrderBook):
+  """An immutable copy of a SingleProductOrderBook at a given version."""
+  def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text, version: int, bids: tuple,
+               asks: tuple):
+    super().__init__(product_id, base_currency, quote_currency)
+    self._sequence = version << 1
+    self.bids = bids
+    self.asks = asks
+
+  def get_bids(self, top_n: int = None):
+    return list(self.bids[:top_n])
+
+  def get_asks(self, top_n: int = None):
+    return list(self.asks[:top_n])
+
+  def get_snapshot(self, top_n: int = None):
+    return self
+
 
 class MultiProductOrderBook(ABC):
   """Contains the order-books for many products on the same exchange."""
@@ -73,7 +229,14 @@ class MultiProductOrderBook(ABC):
     self._order_books = {}
     self._order_books_by_quote_currency = defaultdict(list)
     self._order_books_by_base_currency = defaultdict(list)
+    self._execution_cost_estimator = None
     self.product_ids = product_ids
+    self._lock = RLock()  # Guards adding, removing and evicting order-books.
+    # Eviction policy, see set_eviction_policy. _last_read is None unless a policy is set, otherwise it holds the
+    # monotonic time each product was last read, least recently read first.
+    self._last_read = None
+    self._max_books = None
+    self._idle_timeout = None
 
   def _post_subclass_init(self):
     self.add_order_books(self.product_ids)
@@ -82,16 +245,135 @@ class MultiProductOrderBook(ABC):
     return self.add_order_books([product_id])[0]
 
   def add_order_books(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
-    books = self.make_multiple_product_order_book(product_ids)
-    for idx in range(len(books)):
-      product_id = product_ids[idx]
-      ob = books[idx]
-      self._order_books[product_id] = ob
-      self._order_books_by_base_currency[ob.base_currency].append(ob)
-      self._order_books_by_quote_currency[ob.quote_currency].append(ob)
+    """Starts tracking product_ids, returns their order-books.
+
+    The added order-books are never evicted to make room for themselves, so if max_books (see set_eviction_policy) is
+    smaller than len(product_ids), more than max_books order-books are tracked until the next eviction.
+    """
+    with self._lock:
+      new_product_ids = [product_id for product_id in dict.fromkeys(product_ids) if product_id not in self._order_books]
+      books = self.make_multiple_product_order_book(new_product_ids) if new_product_ids else []
+      for idx in range(len(books)):
+        product_id = new_product_ids[idx]
+        ob = books[idx]
+        self._order_books[product_id] = ob
+        self._order_books_by_base_currency[ob.base_currency].append(ob)
+        self._order_books_by_quote_currency[ob.quote_currency].append(ob)
+      books = [self._order_books[product_id] for product_id in product_ids]
+      if self._last_read is not None:
+        for product_id in product_ids:
+          self._record_read(product_id)
+        if self._max_books is not None and len(self._order_books) > self._max_books:
+          self.evict_order_books(keep=product_ids)
     return books
 
+  def remove_order_book(self, product_id) -> SingleProductOrderBook:
+    """Stops tracking product_id, returns its order-book or None if it wasn't tracked."""
+    removed = self.remove_order_books([product_id])
+    return removed[0] if removed else None
+
+  def remove_order_books(self, product_ids: list[Text]) -> list[SingleProductOrderBook]:
+    """Stops tracking product_ids, returns the removed order-books. Products that aren't tracked are ignored.
+
+    The order-books stop updating (see _release_order_books), and are removed from the base and quote currency indexes.
+    """
+    with self._lock:
+      removed = []
+      for product_id in product_ids:
+        ob = self._order_books.pop(product_id, None)
+        if ob is None:
+          continue
+        for index, currency in ((self._order_books_by_base_currency, ob.base_currency),
+                                (self._order_books_by_quote_currency, ob.quote_currency)):
+          index[currency].remove(ob)
+          if not index[currency]:
+            del index[currency]
+        if self._last_read is not None:
+          self._last_read.pop(product_id, None)
+        if self._execution_cost_estimator is not None:
+          self._execution_cost_estimator.forget(product_id)
+        removed.append(ob)
+      if removed:
+        self._release_order_books(removed)
+    return removed
+
+  def _release_order_books(self, order_books: list[SingleProductOrderBook]):
+    """Called with order-books that were removed, implementations should stop updating them (e.g. unsubscribe)."""
+
+  def set_eviction_policy(self, max_books: int = None, idle_timeout: float = None):
+    """Evicts (removes) order-books that nobody has read recently, pass no arguments to stop evicting.
+
+    Reads are calls to get_order_book, get_snapshot and get_snapshots. Order-books with update callbacks (e.g. book
+    subscriptions, consolidated books or shared memory publishers) are in use, and are never evicted.
+
+    Args:
+      max_books: When adding order-books takes the number tracked over max_books, the least recently read are evicted.
+      idle_timeout: evict_order_books also evicts order-books that haven't been read for idle_timeout seconds, call
+        it periodically (e.g. with evict_periodically).
+    """
+    with self._lock:
+      self._max_books = max_books
+      self._idle_timeout = idle_timeout
+      if max_books is None and idle_timeout is None:
+        self._last_read = None
+      elif self._last_read is None:
+        now = time.monotonic()
+        self._last_read = OrderedDict((product_id, now) for product_id in self._order_books)
+    return self.evict_order_books()
+
+  def _record_read(self, product_id):
+    last_read = self._last_read
+    if last_read is not None and product_id in self._order_books:
+      last_read[product_id] = time.monotonic()
+      last_read.move_to_end(product_id)
+
+  def evict_order_books(self, keep: list[Text] = ()) -> list[Text]:
+    """Removes the order-books the eviction policy says to evict, returns their product_ids.
+
+    Args:
+      keep: product_ids that must not be evicted.
+    """
+    keep = set(keep)
+    with self._lock:
+      last_read = self._last_read
+      if last_read is None:
+        return []
+      evictable = []  # (product_id, read_at) least recently read first, so idle order-books are a prefix.
+      for product_id, read_at in list(last_read.items()):
+        order_book = self._order_books.get(product_id)
+        if order_book is None:
+          last_read.pop(product_id, None)  # It was read while being removed.
+        elif not order_book._update_callbacks and product_id not in keep:
+          evictable.append((product_id, read_at))
+      evict = []
+      if self._idle_timeout is not None:
+        idle_since = time.monotonic() - self._idle_timeout
+        evict = [product_id for product_id, read_at in evictable if read_at <= idle_since]
+      if self._max_books is not None:
+        excess = len(self._order_books) - len(evict) - self._max_books
+        if excess > 0:
+          evict.extend(product_id for product_id, _ in evictable[len(evict):len(evict) + excess])
+      self.remove_order_books(evict)
+    return evict
+
+  def evict_periodically(self, interval: float) -> Event:
+    """Calls evict_order_books every interval seconds, returns an Event, set it to stop evicting."""
+    stop = Event()
+
+    def evict():
+      while not stop.wait(interval):
+        self.evict_order_books()
+
+    Thread(target=evict, daemon=True, name='{}-eviction'.format(type(self).__name__)).start()
+    return stop
+
+  def find_order_book(self, product_id) -> SingleProductOrderBook:
+    """Returns the order-book for product_id, None if it isn't tracked. This doesn't count as a read for eviction."""
+    return self._order_books.get(product_id)
+
   def get_order_book(self, product_id) -> SingleProductOrderBook:
+    if self._last_read is not None:
+      self._record_read(product_id)
     return self._order_books[product_id]
 
   def get_order_books_by_quote_currency(self, quote_currency) -> list[SingleProductOrderBook]:
@@ -103,6 +385,83 @@ class MultiProductOrderBook(ABC):
   def get_tracked_products(self):
     return self._order_books.keys()
 
+  def get_snapshot(self, product_id, top_n: int = None) -> SingleProductOrderBook:
+    """Returns an immutable, consistent view of the order-book for product_id, see SingleProductOrderBook."""
+    if self._last_read is not None:
+      self._record_read(product_id)
+    return self._order_books[product_id].get_snapshot(top_n=top_n)
+
+  def get_snapshots(self, product_ids: list[Text] = None, top_n: int = None) -> dict:
+    """Returns a dict of snapshots keyed by product_id, for product_ids or all tracked products."""
+    if product_ids is None:
+      product_ids = list(self._order_books.keys())
+    return {product_id: self.get_snapshot(product_id, top_n=top_n) for product_id in product_ids}
+
+  def get_versions(self) -> dict:
+    """Returns the current version of every tracked order-book keyed by product_id."""
+    return {product_id: order_book.get_version() for product_id, order_book in list(self._order_books.items())}
+
+  def get_changed_products(self, versions: dict) -> list[Text]:
+    """Returns the product_ids that changed since versions (as returned by get_versions) was taken.
+
+    Products that are missing from versions are always considered changed.
+    """
+    return [product_id for product_id, order_book in list(self._order_books.items())
+            if product_id not in versions or order_book.has_changed_since(versions[product_id])]
+
+  def subscribe_top_of_book(self, callback: Callable, product_ids: list[Text] = None, min_interval: float = None):
+    """Subscribes callback to the top of book of product_ids (or all tracked products), see SingleProductOrderBook.
+
+    Returns:
+      A BookSubscriptionGroup, close it to unsubscribe from every product.
+    """
+    from zcoins.order_books.book_events import BookSubscriptionGroup
+    if product_ids is None:
+      product_ids = list(self._order_books.keys())
+    return BookSubscriptionGroup([self._order_books[product_id].subscribe_top_of_book(callback, min_interval)
+                                  for product_id in product_ids])
+
+  def subscribe_depth(self, callback: Callable, percent: float, product_ids: list[Text] = None,
+                      min_interval: float = None):
+    """Subscribes callback to the depth near the mid of product_ids (or all tracked products), see
+    SingleProductOrderBook.
+
+    Returns:
+      A BookSubscriptionGroup, close it to unsubscribe from every product.
+    """
+    from zcoins.order_books.book_events import BookSubscriptionGroup
+    if product_ids is None:
+      product_ids = list(self._order_books.keys())
+    return BookSubscriptionGroup([self._order_books[product_id].subscribe_depth(callback, percent, min_interval)
+                                  for product_id in product_ids])
+
+  def get_execution_cost_estimator(self):
+    """Returns the ExecutionCostEstimator shared by estimate_execution and estimate_executions_by_quote_currency."""
+    if self._execution_cost_estimator is None:
+      from zcoins.order_books.execution_cost import ExecutionCostEstimator
+      self._execution_cost_estimator = ExecutionCostEstimator()
+    return self._execution_cost_estimator
+
+  def estimate_execution(self, product_id, side, size: float = None, funds: float = None):
+    """Estimates the average fill price, worst price and levels consumed of a market order for product_id.
+
+    Args:
+      product_id: The product to estimate the order for.
+      side (OrderSide): A BUY takes from the asks and a SELL takes from the bids.
+      size (float): The size of the order in base_currency.
+      funds (float): The funds of the order in quote_currency, exactly one of size and funds must be specified.
+
+    Returns:
+      An ExecutionEstimate.
+    """
+    return self.get_execution_cost_estimator().estimate(self._order_books[product_id], side, size=size, funds=funds)
+
+  def estimate_executions_by_quote_currency(self, quote_currency, side, size: float = None,
+                                            funds: float = None) -> dict:
+    """Estimates the same market order for every order-book using quote_currency, keyed by product_id."""
+    return self.get_execution_cost_estimator().estimate_many(self.get_order_books_by_quote_currency(quote_currency),
+                                                             side, size=size, funds=funds)
+
   @abstractmethod
   def make_single_product_order_book(self, product_id: Text) -> SingleProductOrderBook:
     """Create a SingleProductOrderBook for the given product_id."""
@@ -0,0 +1,298 @@
+# This file contains a publisher that writes order-books into shared memory, and a MultiProductOrderBook that reads them
+# from another process.
+#
+# Segment layout:
+#   _HEADER_DTYPE, then a _DIRECTORY_DTYPE entry per product, then (64 byte aligned) a slot per product. Each slot holds
+#   the top depth levels of each side and the latest tick of its product, guarded by a seqlock: the publisher makes the
+#   slot's sequence odd before writing it and even again afterwards, readers retry reads that saw an odd sequence or a
+#   sequence that changed while they were reading.
+from __future__ import annotations
+
+import time
+
+from multiprocessing import shared_memory
+from typing import Text
+
+import numpy as np
+
+from zcoins.exchanges import OrderSide, Product, TickerMessage, TickerTimeFormat
+from zcoins.order_books.order_book import MultiProductOrderBook, OrderBookSnapshot, SingleProductOrderBook
+
+MAGIC = b'ZCBOOK2\n'
+# tracker_pid is the pid of the publisher's multiprocessing resource tracker, see _attach.
+_HEADER_DTYPE = np.dtype([('magic', 'S8'), ('depth', '<u4'), ('n_products', '<u4'), ('tracker_pid', '<i8')])
+_DIRECTORY_DTYPE = np.dtype([('product_id', 'S32'), ('base_currency', 'S16'), ('quote_currency', 'S16')])
+# Seconds a read waits for the publisher to finish a write, before assuming it died mid-write, see _read.
+_READ_TIMEOUT = 1.0
+_TICK_FIELDS = ('epoch_time', 'price', 'size', 'side', 'best_bid', 'best_ask')  # side is 1 for buys, -1 for sells.
+
+
+def _slot_dtype(depth: int) -> np.dtype:
+  return np.dtype([('sequence', '<u8'),
+                   ('version', '<u8'),  # The version of the publisher's order-book.
+                   ('n_bids', '<u4'),
+                   ('n_asks', '<u4'),
+                   ('bids', '<f8', (depth, 2)),  # (price, size) rows, sorted from high-to-low by price.
+                   ('asks', '<f8', (depth, 2)),  # (price, size) rows, sorted from low-to-high by price.
+                   ('tick_count', '<u8'),  # The number of ticks published, 0 if tick is unset.
+                   ('tick', '<f8', (len(_TICK_FIELDS),))], align=True)
+
+
+def _slots_offset(n_products: int) -> int:
+  offset = _HEADER_DTYPE.itemsize + n_products * _DIRECTORY_DTYPE.itemsize
+  return (offset + 63) // 64 * 64
+
+
+def _tracker_pid() -> int:
+  """Returns the pid of this process's multiprocessing resource tracker, 0 if it isn't running.
+
+  Processes started by multiprocessing share their parent's resource tracker.
+  """
+  from multiprocessing import resource_tracker
+  return getattr(resource_tracker._resource_tracker, '_pid', None) or 0
+
+
+def _attach(name: Text) -> shared_memory.SharedMemory:
+  """Attaches to an existing segment without registering it with this process's resource tracker, which would
+  otherwise unlink it when this process exits."""
+  try:
+    return shared_memory.SharedMemory(name=name, track=False)
+  except TypeError:  # track was added in Python 3.13.
+    pass
+  from multiprocessing import resource_tracker
+  segment = shared_memory.SharedMemory(name=name)  # Registers the segment with this process's resource tracker.
+  header = np.ndarray(1, dtype=_HEADER_DTYPE, buffer=segment.buf)[0]
+  # If the publisher shares this process's resource tracker (e.g. it is this process or its parent), the registration
+  # is the publisher's own: unregistering it would make the publisher's unlink fail in the tracker.
+  shared_tracker = header['magic'] == MAGIC and int(header['tracker_pid']) == _tracker_pid()
+  del header  # The segment can't be closed while views of it exist.
+  if not shared_tracker:
+    resource_tracker.unregister(segment._name, 'shared_memory')
+  return segment
+
+
+class SharedMemoryBookPublisher:
+  """Writes the top depth levels of every order-book in a MultiProductOrderBook (and optionally the latest tick of
+  each product) into a shared memory segment, after every update.
+
+  Other processes read the segment with SharedMemoryMultiProductOrderBook(name). Only the products tracked when the
+  publisher is created are published.
+
+  Usage:
+    exchange = CoinbaseExchange(product_ids=[...])
+    publisher = SharedMemoryBookPublisher(exchange.get_all_order_books(), name='coinbase-books', exchange=exchange)
+    ...
+    publisher.close()
+  """
+
+  def __init__(self, order_books: MultiProductOrderBook, name: Text = None, depth: int = 10, exchange=None):
+    """
+    Args:
+      order_books: The order-books to publish.
+      name: The name of the shared memory segment, a random name is chosen if None.
+      depth: The number of levels of each side to publish.
+      exchange: If set, the latest tick of each product is also published, from this Exchange's ticker callbacks.
+    """
+    self.depth = depth
+    self._order_books = [order_books.get_order_book(product_id) for product_id in order_books.get_tracked_products()]
+    for order_book in self._order_books:
+      for field in _DIRECTORY_DTYPE.names:
+        value = getattr(order_book, field)
+        if len(value.encode()) > _DIRECTORY_DTYPE[field].itemsize:
+          raise ValueError('{} {} is longer than the {} bytes published.'.format(
+            field, value, _DIRECTORY_DTYPE[field].itemsize))
+    n_products = len(self._order_books)
+    slot_dtype = _slot_dtype(depth)
+    size = _slots_offset(n_products) + n_products * slot_dtype.itemsize
+    self.shared_memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+    self.name = self.shared_memory.name
+    buffer = self.shared_memory.buf
+    header = np.ndarray(1, dtype=_HEADER_DTYPE, buffer=buffer)
+    directory = np.ndarray(n_products, dtype=_DIRECTORY_DTYPE, buffer=buffer, offset=_HEADER_DTYPE.itemsize)
+    self._slots = np.ndarray(n_products, dtype=slot_dtype, buffer=buffer, offset=_slots_offset(n_products))
+    self._slots[:] = np.zeros(n_products, dtype=slot_dtype)
+    self._slot_by_product = {}
+    for idx, order_book in enumerate(self._order_books):
+      directory[idx] = (order_book.product_id.encode(), order_book.base_currency.encode(),
+                        order_book.quote_currency.encode())
+      self._slot_by_product[order_book.product_id] = self._slots[idx:idx + 1]
+    header[0] = (MAGIC, depth, n_products, _tracker_pid())
+    self._callback_ids = [(order_book, order_book.add_update_callback(self._publish_book))
+                          for order_book in self._order_books]
+    for order_book in self._order_books:
+      self._publish_book(order_book)
+    self.exchange = exchange
+    self._ticker_id = None
+    if exchange is not None:
+      self._ticker_id = exchange.add_ticker_callback(self._publish_tick, time_format=TickerTimeFormat.EPOCH)
+
+  def _levels(self, order_book: SingleProductOrderBook, bids: bool) -> np.ndarray:
+    if hasattr(order_book, 'get_bid_arrays'):
+      prices, sizes = order_book.get_bid_arrays(self.depth) if bids else order_book.get_ask_arrays(self.depth)
+      return np.column_stack((prices, sizes))
+    levels = order_book.get_bids(top_n=self.depth) if bids else order_book.get_asks(top_n=self.depth)
+    return np.array(levels, dtype=np.float64).reshape(-1, 2)
+
+  def _publish_book(self, order_book: SingleProductOrderBook):
+    slot = self._slot_by_product.get(order_book.product_id)
+    if slot is None:
+      return
+    bids, asks = self._levels(order_book, bids=True), self._levels(order_book, bids=False)
+    slot['sequence'] += 1
+    slot['version'] = order_book.get_version()
+    slot['n_bids'] = len(bids)
+    slot['n_asks'] = len(asks)
+    slot['bids'][0, :len(bids)] = bids
+    slot['asks'][0, :len(asks)] = asks
+    slot['sequence'] += 1
+
+  def _publish_tick(self, exchange, ticker_message: TickerMessage):
+    slot = self._slot_by_product.get(ticker_message.product.product_id)
+    if slot is None:
+      return
+    slot['sequence'] += 1
+    slot['tick'] = (ticker_message.epoch_time, ticker_message.price, ticker_message.last_size,
+                    1 if ticker_message.order_side is OrderSide.BUY else -1, ticker_message.best_bid,
+                    ticker_message.best_ask)
+    slot['tick_count'] += 1
+    slot['sequence'] += 1
+
+  def close(self, unlink: bool = True):
+    """Stops publishing, and (by default) removes the segment. Readers should be closed first."""
+    for order_book, callback_id in self._callback_ids:
+      order_book.remove_update_callback(callback_id)
+    if self._ticker_id is not None:
+      self.exchange.remove_ticker_callback(self._ticker_id)
+    del self._slots, self._slot_by_product  # The segment can't be closed while views of it exist.
+    self.shared_memory.close()
+    if unlink:
+      self.shared_memory.unlink()
+
+
+class _SharedMemorySingleProductOrderBook(SingleProductOrderBook):
+  def __init__(self, product_id: Text, base_currency: Text, quote_currency: Text, slot: np.ndarray):
+    super().__init__(product_id, base_currency, quote_currency)
+    self._slot = slot  # A length 1 view of this product's slot.
+    self._product = Product(product_id=product_id, base_currency=base_currency, quote_currency=quote_currency)
+
+  def _read(self, read):
+    """Calls read until it completes without a concurrent write, and returns its result.
+
+    Raises TimeoutError if reads keep overlapping writes for _READ_TIMEOUT seconds, e.g. if the publisher died in the
+    middle of a write.
+    """
+    slot = self._slot
+    deadline = time.monotonic() + _READ_TIMEOUT
+    delay = 0.0
+    while True:
+      sequence = int(slot['sequence'][0])
+      if not sequence & 1:
+        result = read(slot[0])
+        if sequence == int(slot['sequence'][0]):
+          return result
+      if time.monotonic() > deadline:
+        raise TimeoutError('{} was being written for over {} seconds, the publisher may have died mid-write.'.format(
+          self.product_id, _READ_TIMEOUT))
+      time.sleep(delay)  # Let the publisher finish its write.
+      delay = min(delay * 2 or 0.0001, 0.01)
+
+  def get_bids(self, top_n: int = None):
+    return self._read(lambda slot: [tuple(level) for level in slot['bids'][:slot['n_bids']][:top_n].tolist()])
+
+  def get_asks(self, top_n: int = None):
+    return self._read(lambda slot: [tuple(level) for level in slot['asks'][:slot['n_asks']][:top_n].tolist()])
+
+  def get_bid_arrays(self, top_n: int = None) -> tuple:
+    """Returns a (prices, sizes) pair of views of the bids in shared memory, sorted from high-to-low by price.
+
+    The views aren't copied, so they change as the publisher writes, use get_snapshot for a consistent copy.
+    """
+    bids = self._slot['bids'][0][:int(self._slot['n_bids'][0])][:top_n]
+    return bids[:, 0], bids[:, 1]
+
+  def get_ask_arrays(self, top_n: int = None) -> tuple:
+    """Returns a (prices, sizes) pair of views of the asks in shared memory, sorted from low-to-high by price.
+
+    The views aren't copied, so they change as the publisher writes, use get_snapshot for a consistent copy.
+    """
+    asks = self._slot['asks'][0][:int(self._slot['n_asks'][0])][:top_n]
+    return asks[:, 0], asks[:, 1]
+
+  def get_version(self) -> int:
+    return int(self._slot['version'][0])
+
+  def get_snapshot(self, top_n: int = None):
+    def read(slot):
+      return (int(slot['version']), tuple(tuple(level) for level in slot['bids'][:slot['n_bids']][:top_n].tolist()),
+              tuple(tuple(level) for level in slot['asks'][:slot['n_asks']][:top_n].tolist()))
+
+    version, bids, asks = self._read(read)
+    return OrderBookSnapshot(self.product_id, self.base_currency, self.quote_currency, version=version, bids=bids,
+                             asks=asks)
+
+  def get_book(self, top_n: int = None):
+    snapshot = self.get_snapshot(top_n)  # Both sides come from the same write.
+    return {'bids': list(snapshot.bids), 'asks': list(snapshot.asks)}
+
+  def get_latest_tick(self) -> TickerMessage:
+    """Returns the latest published tick (with only epoch_time set), None if none has been published."""
+    tick_count, tick = self._read(lambda slot: (int(slot['tick_count']), slot['tick'].tolist()))
+    if not tick_count:
+      return None
+    fields = dict(zip(_TICK_FIELDS, tick))
+    return TickerMessage(product=self._product, time=None,
+                         order_side=OrderSide.BUY if fields['side'] > 0 else OrderSide.SELL,
+                         last_size=fields['size'], price=fields['price'], best_bid=fields['best_bid'],
+                         best_ask=fields['best_ask'], epoch_time=fields['epoch_time'])
+
+
+class SharedMemoryMultiProductOrderBook(MultiProductOrderBook):
+  """Serves the order-books written by a SharedMemoryBookPublisher in another process.
+
+  The order-books are read-only and have no update callbacks, use get_version/get_changed_products to detect changes.
+  """
+
+  def __init__(self, name: Text, product_ids: list[Text] = None):
+    """
+    Args:
+      name: The name of the publisher's shared memory segment.
+      product_ids: The products to serve, defaults to every published product.
+    """
+    self.shared_memory = _attach(name)
+    buffer = self.shared_memory.buf
+    header = np.ndarray(1, dtype=_HEADER_DTYPE, buffer=buffer)[0]
+    if header['magic'] != MAGIC:
+      self.shared_memory.close()
+      raise ValueError('{} is not an order-book segment.'.format(name))
+    n_products = int(header['n_products'])
+    self.depth = int(header['depth'])
+    directory = np.ndarray(n_products, dtype=_DIRECTORY_DTYPE, buffer=buffer, offset=_HEADER_DTYPE.itemsize)
+    self._slots = np.ndarray(n_products, dtype=_slot_dtype(self.depth), buffer=buffer,
+                             offset=_slots_offset(n_products))
+    self._directory = {entry['product_id'].decode(): (idx, entry['base_currency'].decode(),
+                                                      entry['quote_currency'].decode())
+                       for idx, entry in enumerate(directory)}
+    super().__init__(product_ids=list(self._directory) if product_ids is None else product_ids)
+    self._post_subclass_init()
+
+  def get_published_products(self) -> list[Text]:
+    return list(self._directory)
+
+  def make_single_product_order_book(self, product_id: Text) -> SingleProductOrderBook:
+    if product_id not in self._directory:
+      raise KeyError('{} is not published.'.format(product_id))
+    idx, base_currency, quote_currency = self._directory[product_id]
+    return _SharedMemorySingleProductOrderBook(product_id, base_currency, quote_currency, self._slots[idx:idx + 1])
+
+  def get_latest_tick(self, product_id: Text) -> TickerMessage:
+    return self.get_order_book(product_id).get_latest_tick()
+
+  def close(self):
+    """Detaches from the segment, the order-books can't be used afterwards."""
+    for order_book in self._order_books.values():
+      order_book._slot = None
+    self._order_books.clear()
+    self._order_books_by_base_currency.clear()
+    self._order_books_by_quote_currency.clear()
+    del self._slots
+    self.shared_memory.close()